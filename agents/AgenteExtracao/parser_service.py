@@ -1,34 +1,56 @@
-import fitz
 import shutil
 
-try:
-    import pytesseract
-    from PIL import Image
+_FITZ_MODULE = None  # Lazy-loaded on first use
+_OCR_MODULES = None  # (pytesseract, PIL.Image) ou False quando o OCR não está disponível
 
-    _tesseract_bin = shutil.which("tesseract")
-    OCR_DISPONIVEL = _tesseract_bin is not None
-    if not OCR_DISPONIVEL:
-        # Evita tentar OCR quando o binário do tesseract não está disponível
-        print("Aviso: 'tesseract' não encontrado no PATH. OCR será desabilitado.")
-except ImportError:
-    OCR_DISPONIVEL = False
+
+def _ensure_fitz():
+    """Lazy load PyMuPDF only when a PDF is actually parsed."""
+    global _FITZ_MODULE
+    if _FITZ_MODULE is None:
+        import fitz
+        _FITZ_MODULE = fitz
+    return _FITZ_MODULE
+
+
+def _ensure_ocr():
+    """Carrega pytesseract/Pillow e verifica o binário do tesseract no primeiro uso."""
+    global _OCR_MODULES
+    if _OCR_MODULES is None:
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError:
+            _OCR_MODULES = False
+        else:
+            if shutil.which("tesseract") is None:
+                # Evita tentar OCR quando o binário do tesseract não está disponível
+                print("Aviso: 'tesseract' não encontrado no PATH. OCR será desabilitado.")
+                _OCR_MODULES = False
+            else:
+                _OCR_MODULES = (pytesseract, Image)
+    return _OCR_MODULES or None
 
 
 def extrair_texto_pdf(file_stream):
     try:
+        fitz = _ensure_fitz()
         doc = fitz.open(stream=file_stream.read(), filetype="pdf")
         texto = ""
         for page in doc:
             texto += page.get_text()
-        if not texto.strip() and OCR_DISPONIVEL:
-            texto = ""
-            for page in doc:
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                texto += pytesseract.image_to_string(img)
-        elif not texto.strip() and not OCR_DISPONIVEL:
-            # Sem texto embutido e sem OCR disponível: informar claramente no log
-            print("Observação: PDF sem texto extraível e OCR desabilitado por ausência do 'tesseract'.")
+        if not texto.strip():
+            ocr = _ensure_ocr()
+            if ocr:
+                pytesseract, Image = ocr
+                texto = ""
+                for page in doc:
+                    pix = page.get_pixmap()
+                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                    texto += pytesseract.image_to_string(img)
+            else:
+                # Sem texto embutido e sem OCR disponível: informar claramente no log
+                print("Observação: PDF sem texto extraível e OCR desabilitado por ausência do 'tesseract'.")
         return texto
     except Exception as e:
         print(f"Erro ao extrair texto PDF: {e}")
@@ -0,0 +1,177 @@
+"""Cache em memória dos IDs de pessoas e classificações usados nos lançamentos.
+
+As mesmas dezenas de fornecedores e categorias aparecem em quase toda nota, e
+cada verificação ou lançamento consultava o banco para descobrir seus IDs. O
+cache guarda ``documento -> idPessoas`` e ``descrição em minúsculas ->
+idClassificacao``, inclusive a ausência (cache negativo), com limite de
+tamanho (LRU) e validade (TTL).
+
+Cada entrada guarda o contador de ``tabela_versoes`` lido antes da consulta e
+só é devolvida enquanto ele não mudar, então escritas de outros workers
+também a invalidam. Um ID encontrado depende de
+``rows_changed_key(tabela)``, que só muda quando linhas da tabela são
+alteradas ou excluídas (documento editado, duplicados unificados). Cadastros
+novos não o alteram, e uma importação em massa não esvazia o cache. Uma
+ausência depende do contador da própria tabela, que muda a cada cadastro. Os
+contadores são lidos uma vez por transação (:func:`versoes_da_sessao`).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.versioning import on_tables_committed, rows_changed_key, table_versions
+
+_AUSENTE = object()
+_PENDENTES = "cache_identidades_pendentes"
+_VERSOES = "cache_identidades_versoes"
+
+_caches: "weakref.WeakSet[CacheIdentidades]" = weakref.WeakSet()
+
+
+class CacheIdentidades:
+    """LRU com TTL e cache negativo, seguro para uso entre threads."""
+
+    def __init__(
+        self,
+        tamanho: Optional[int] = None,
+        ttl: Optional[float] = None,
+        relogio: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.tamanho = tamanho if tamanho is not None else int(os.getenv("CACHE_IDENTIDADES_TAMANHO", "4096"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("CACHE_IDENTIDADES_TTL", "300"))
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[Tuple[str, Hashable], Tuple[Any, float, Optional[int]]]" = OrderedDict()
+        self._estatisticas: Dict[str, Dict[str, int]] = {}
+        self.observador: Optional[Callable[[str, str], None]] = None
+        _caches.add(self)
+
+    def obter(self, tabela: str, chave: Hashable, versoes: Mapping[str, int]) -> Tuple[bool, Optional[int]]:
+        """Retorna ``(encontrado, id)``; ``(True, None)`` indica ausência já conhecida.
+
+        A entrada só é devolvida quando o contador de que ela depende tem em
+        ``versoes`` o mesmo valor guardado com ela; senão conta como miss.
+        """
+
+        with self._lock:
+            entrada = self._entradas.get((tabela, chave))
+            if entrada is not None and (
+                entrada[1] <= self._relogio() or versoes.get(_contador(tabela, entrada[0])) != entrada[2]
+            ):
+                del self._entradas[(tabela, chave)]
+                entrada = None
+            if entrada is None:
+                resultado = "miss"
+            else:
+                self._entradas.move_to_end((tabela, chave))
+                resultado = "negativo" if entrada[0] is _AUSENTE else "hit"
+            contadores = self._estatisticas.setdefault(tabela, {"hit": 0, "negativo": 0, "miss": 0})
+            contadores[resultado] += 1
+        if self.observador is not None:
+            self.observador(tabela, resultado)
+        if entrada is None:
+            return False, None
+        return True, None if entrada[0] is _AUSENTE else entrada[0]
+
+    def guardar(
+        self,
+        tabela: str,
+        chave: Hashable,
+        valor: Optional[int],
+        versoes: Mapping[str, int],
+        *,
+        session: Optional[Session] = None,
+    ) -> None:
+        """Guarda o ID (ou ``None`` para ausência) de ``chave``.
+
+        ``versoes`` são os contadores lidos *antes* da consulta que achou o
+        valor. Com ``session``, a entrada só vale depois do commit dessa
+        sessão: o SELECT pode ter visto uma linha que a transação ainda pode
+        desfazer.
+        """
+
+        versao = versoes.get(_contador(tabela, valor))
+        if versao is None:
+            return
+        if session is not None:
+            session.info.setdefault(_PENDENTES, []).append((self, tabela, chave, valor, versao))
+            return
+        self._inserir(tabela, chave, valor, versao)
+
+    def _inserir(self, tabela: str, chave: Hashable, valor: Optional[int], versao: int) -> None:
+        with self._lock:
+            self._entradas[(tabela, chave)] = (
+                _AUSENTE if valor is None else valor,
+                self._relogio() + self.ttl,
+                versao,
+            )
+            self._entradas.move_to_end((tabela, chave))
+            while len(self._entradas) > self.tamanho:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, tabela: Optional[str] = None) -> None:
+        with self._lock:
+            if tabela is None:
+                self._entradas.clear()
+                return
+            for chave in [chave for chave in self._entradas if chave[0] == tabela]:
+                del self._entradas[chave]
+
+    def estatisticas(self) -> Dict[str, Dict[str, Any]]:
+        """Contadores por tabela e a taxa de acerto (hits positivos e negativos)."""
+
+        with self._lock:
+            resumo: Dict[str, Dict[str, Any]] = {}
+            for tabela, contadores in self._estatisticas.items():
+                total = sum(contadores.values())
+                acertos = contadores["hit"] + contadores["negativo"]
+                resumo[tabela] = {**contadores, "taxa_acerto": round(acertos / total, 4) if total else 0.0}
+            resumo["_entradas"] = {"total": len(self._entradas), "limite": self.tamanho}
+            return resumo
+
+
+def _contador(tabela: str, valor: Any) -> str:
+    """Contador de ``tabela_versoes`` de que depende uma entrada com ``valor``."""
+
+    return tabela if valor is None or valor is _AUSENTE else rows_changed_key(tabela)
+
+
+def versoes_da_sessao(session: Session, tabelas: Iterable[str]) -> Dict[str, int]:
+    """Contadores de que dependem as entradas de ``tabelas``, lidos uma vez por transação de ``session``."""
+
+    versoes = session.info.get(_VERSOES)
+    if versoes is None:
+        nomes = [nome for tabela in tabelas for nome in (tabela, rows_changed_key(tabela))]
+        versoes = session.info[_VERSOES] = table_versions(session, nomes)
+    return versoes
+
+
+@on_tables_committed
+def _invalidar_tabelas_alteradas(tabelas: set[str]) -> None:
+    # Cadastros novos não invalidam nada; alterações e exclusões do próprio
+    # processo saem do cache já no commit, sem esperar a releitura das versões
+    for cache in list(_caches):
+        for tabela in {tabela for tabela in tabelas if rows_changed_key(tabela) in tabelas}:
+            cache.invalidar(tabela)
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_pendentes(session: Session) -> None:
+    session.info.pop(_VERSOES, None)
+    for cache, tabela, chave, valor, versao in session.info.pop(_PENDENTES, ()):
+        cache._inserir(tabela, chave, valor, versao)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_pendentes(session: Session, _transacao) -> None:
+    session.info.pop(_VERSOES, None)
+    session.info.pop(_PENDENTES, None)
@@ -0,0 +1,121 @@
+"""Registro das extrações já realizadas, para não reprocessar o mesmo documento.
+
+Um PDF é reconhecido pelo SHA-256 do conteúdo ou, quando o arquivo difere (outra
+impressão do DANFE, por exemplo), pela chave de acesso de 44 dígitos da NF-e.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from database.connection import SessionLocal
+from database.dialects import supports_upsert, upsert_insert
+from database.models import ExtracaoDocumento
+
+# A chave costuma ser impressa em 11 blocos de 4 dígitos separados por espaço
+_CHAVE_NO_TEXTO = re.compile(r"(?<!\d)\d{4}(?:[ .]?\d{4}){10}(?!\d)")
+
+
+class RegistroExtracoes:
+    """Consulta e grava extrações indexadas por hash do arquivo e chave de acesso."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self._session_factory = session_factory
+
+    @staticmethod
+    def hash_conteudo(conteudo: bytes) -> str:
+        return hashlib.sha256(conteudo).hexdigest()
+
+    @staticmethod
+    def normalizar_chave(valor: Any) -> Optional[str]:
+        """Retorna a chave só com dígitos, ou ``None`` se não tiver 44 dígitos."""
+        digitos = re.sub(r"\D", "", str(valor or ""))
+        return digitos if len(digitos) == 44 else None
+
+    @classmethod
+    def localizar_chave_no_texto(cls, texto: str | None) -> Optional[str]:
+        encontrada = _CHAVE_NO_TEXTO.search(texto or "")
+        return cls.normalizar_chave(encontrada.group(0)) if encontrada else None
+
+    def buscar(
+        self,
+        *,
+        hash_conteudo: Optional[str] = None,
+        chave_acesso: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Procura uma extração anterior pelo hash e, em seguida, pela chave de acesso."""
+
+        with self._session_factory() as session:
+            extracao = None
+            if hash_conteudo:
+                extracao = session.execute(
+                    select(ExtracaoDocumento).where(ExtracaoDocumento.hash_conteudo == hash_conteudo)
+                ).scalar_one_or_none()
+            if extracao is None and chave_acesso:
+                extracao = session.execute(
+                    select(ExtracaoDocumento)
+                    .where(ExtracaoDocumento.chave_acesso == chave_acesso)
+                    .order_by(ExtracaoDocumento.id.desc())
+                    .limit(1)
+                ).scalar_one_or_none()
+            if extracao is None:
+                return None
+            return {
+                "id": extracao.id,
+                "dados": dict(extracao.dados),
+                "movimento_id": extracao.movimento_id,
+                "criado_em": extracao.criado_em.isoformat() if extracao.criado_em else None,
+            }
+
+    def registrar(self, hash_conteudo: str, chave_acesso: Optional[str], dados: Dict[str, Any]) -> Dict[str, Any]:
+        """Grava (ou substitui, no caso de reextração) a extração do arquivo ``hash_conteudo``.
+
+        Retorna ``id`` e ``movimento_id``; uma reextração mantém o movimento já vinculado.
+        """
+
+        tabela = ExtracaoDocumento.__table__
+        with self._session_factory() as session:
+            if supports_upsert(session):
+                stmt = upsert_insert(session, tabela).values(
+                    hash_conteudo=hash_conteudo,
+                    chave_acesso=chave_acesso,
+                    dados=dados,
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[tabela.c.hash_conteudo],
+                    set_={"chave_acesso": chave_acesso, "dados": dados, "atualizado_em": func.current_timestamp()},
+                ).returning(tabela.c.idExtracaoDocumento, tabela.c.MovimentoContas_idMovimentoContas)
+                extracao_id, movimento_id = session.execute(stmt).one()
+            else:
+                extracao = session.execute(
+                    select(ExtracaoDocumento).where(ExtracaoDocumento.hash_conteudo == hash_conteudo)
+                ).scalar_one_or_none()
+                if extracao is None:
+                    extracao = ExtracaoDocumento(hash_conteudo=hash_conteudo)
+                    session.add(extracao)
+                extracao.chave_acesso = chave_acesso
+                extracao.dados = dados
+                session.flush()
+                extracao_id, movimento_id = extracao.id, extracao.movimento_id
+            session.commit()
+            return {"id": extracao_id, "movimento_id": movimento_id}
+
+    def vincular_movimento(self, extracao_id: int, movimento_id: int) -> bool:
+        """Associa a extração ao movimento lançado a partir dela.
+
+        Um vínculo existente nunca é substituído; retorna ``False`` nesse caso.
+        """
+
+        with self._session_factory() as session:
+            vinculadas = session.execute(
+                update(ExtracaoDocumento)
+                .where(ExtracaoDocumento.id == extracao_id, ExtracaoDocumento.movimento_id.is_(None))
+                .values(movimento_id=movimento_id)
+            ).rowcount
+            session.commit()
+            return bool(vinculadas)
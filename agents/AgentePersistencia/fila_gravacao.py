@@ -0,0 +1,208 @@
+"""Fila de gravação que agrupa lançamentos concorrentes numa mesma transação.
+
+Com muitas notas chegando ao mesmo tempo, cada ``lancar_conta_pagar`` abre e
+confirma a própria transação e o tempo do fsync de cada commit domina. A
+``FilaGravacao`` recebe os lançamentos de várias threads, junta os que chegam
+dentro de uma janela curta (ou até completar o grupo) e os grava com um único
+``lancar_contas_em_lote``; cada chamador recebe um ``Future`` resolvido com os
+IDs da sua nota.
+
+A fila é limitada: quando cheia, ``enviar`` espera por espaço (ou desiste com
+``FilaCheia`` após o ``timeout``), o que segura os produtores em vez de
+acumular notas em memória. ``encerrar`` grava o que já foi aceito antes de
+parar a thread de gravação.
+
+Notas sem número ou sem fornecedor não entram no lote: ``lancar_conta_pagar``
+as procura só pelo número e atualiza o movimento encontrado, enquanto o lote
+as lançaria sempre como novas. Elas são gravadas uma a uma, com a mesma
+semântica de quando a fila está desligada.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agents.AgentePersistencia.processador import PersistenciaAgent
+
+logger = logging.getLogger(__name__)
+
+_FIM = object()
+
+
+class FilaCheia(RuntimeError):
+    """A fila não abriu espaço para a nota dentro do ``timeout`` pedido."""
+
+
+class FilaEncerrada(RuntimeError):
+    """A fila já foi encerrada e não aceita novos lançamentos."""
+
+
+class FilaGravacao:
+    """Escritor assíncrono com commit em grupo sobre um :class:`PersistenciaAgent`."""
+
+    def __init__(
+        self,
+        agent: PersistenciaAgent,
+        *,
+        lote: Optional[int] = None,
+        janela: Optional[float] = None,
+        capacidade: Optional[int] = None,
+    ) -> None:
+        self._agent = agent
+        self.lote = max(lote if lote is not None else int(os.getenv("FILA_GRAVACAO_LOTE", "100")), 1)
+        self.janela = janela if janela is not None else float(os.getenv("FILA_GRAVACAO_JANELA", "0.02"))
+        capacidade = capacidade if capacidade is not None else int(os.getenv("FILA_GRAVACAO_CAPACIDADE", "1000"))
+        self._fila: "queue.Queue[Any]" = queue.Queue(maxsize=max(capacidade, 1))
+        # _envio serializa a entrada na fila (pode esperar por espaço); _lock só protege os contadores
+        self._envio = threading.Lock()
+        self._lock = threading.Lock()
+        self._encerrada = False
+        self._estatisticas = {"grupos": 0, "notas": 0, "falhas": 0, "tempo_gravando": 0.0}
+        # Chamado após cada grupo com (notas confirmadas, duração em segundos, notas na fila)
+        self.observador: Optional[Callable[[int, float, int], None]] = None
+        self._thread = threading.Thread(target=self._executar, name="fila-gravacao", daemon=True)
+        self._thread.start()
+
+    def enviar(self, dados_json: Dict[str, Any], *, timeout: Optional[float] = None) -> "Future[Dict[str, Any]]":
+        """Enfileira a nota e devolve o ``Future`` com o resultado do lançamento."""
+
+        future: "Future[Dict[str, Any]]" = Future()
+        # Impede que uma nota entre na fila depois do marcador de encerramento
+        with self._envio:
+            if self._encerrada:
+                raise FilaEncerrada("a fila de gravação foi encerrada")
+            try:
+                self._fila.put((dados_json, future), timeout=timeout)
+            except queue.Full as exc:
+                raise FilaCheia(f"fila de gravação cheia ({self._fila.maxsize} notas)") from exc
+        return future
+
+    def lancar(self, dados_json: Dict[str, Any], *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Atalho síncrono: enfileira e espera o resultado, como ``lancar_conta_pagar``."""
+
+        return self.enviar(dados_json, timeout=timeout).result(timeout)
+
+    def encerrar(self, timeout: Optional[float] = None) -> None:
+        """Para de aceitar notas, grava as que já estão na fila e encerra a thread."""
+
+        with self._envio:
+            if not self._encerrada:
+                self._encerrada = True
+                self._fila.put(_FIM)
+        self._thread.join(timeout)
+
+    def __enter__(self) -> "FilaGravacao":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.encerrar()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Grupos e notas confirmados, notas por segundo de gravação e profundidade atual."""
+
+        with self._lock:
+            resumo: Dict[str, Any] = dict(self._estatisticas)
+        tempo = resumo.pop("tempo_gravando")
+        resumo["notas_por_segundo"] = round(resumo["notas"] / tempo, 2) if tempo else 0.0
+        resumo["pendentes"] = self._fila.qsize()
+        resumo["capacidade"] = self._fila.maxsize
+        return resumo
+
+    def _executar(self) -> None:
+        proximo = None
+        encerrar = False
+        while not encerrar:
+            item = proximo if proximo is not None else self._fila.get()
+            proximo = None
+            if item is _FIM:
+                break
+            grupo = [item]
+            try:
+                chaves = {self._chave(item[0])}
+                limite = time.monotonic() + self.janela
+                while len(grupo) < self.lote:
+                    restante = limite - time.monotonic()
+                    try:
+                        item = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _FIM:
+                        encerrar = True
+                        break
+                    chave = self._chave(item[0])
+                    if chave is not None and chave in chaves:
+                        # A mesma nota duas vezes no lote conta como repetida: ela abre o próximo grupo
+                        proximo = item
+                        break
+                    chaves.add(chave)
+                    grupo.append(item)
+                self._gravar(grupo)
+            except Exception as exc:
+                # Um erro fora do lançamento (observador, contadores) falha só este grupo;
+                # a thread de gravação continua atendendo a fila
+                logger.exception("Falha ao gravar um grupo da fila de gravação")
+                for _, future in grupo:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _chave(self, dados_json: Any) -> Optional[Tuple[str, str]]:
+        """``(número, documento do fornecedor)`` da nota, ou ``None`` se faltar algum dos dois."""
+
+        try:
+            numero = dados_json.get("numeroNotaFiscal")
+            fornecedor = self._agent._pessoa_do_payload(dados_json.get("fornecedor"), "FORNECEDOR")
+            chave = (numero, fornecedor["documento"]) if numero and fornecedor else None
+            hash(chave)
+        except Exception:
+            # Payload malformado: o erro aparece no lançamento, no future da própria nota
+            return None
+        return chave
+
+    def _gravar(self, grupo: List[Tuple[Dict[str, Any], Future]]) -> None:
+        # Futures cancelados por quem esperava não entram no grupo
+        ativos = [(dados, future) for dados, future in grupo if future.set_running_or_notify_cancel()]
+        if not ativos:
+            return
+
+        em_lote: List[Tuple[Dict[str, Any], Future]] = []
+        avulsas: List[Tuple[Dict[str, Any], Future]] = []
+        for dados, future in ativos:
+            sem_chave = isinstance(dados, dict) and dados and self._chave(dados) is None
+            (avulsas if sem_chave else em_lote).append((dados, future))
+
+        inicio = time.monotonic()
+        confirmadas = 0
+        if em_lote:
+            try:
+                resultado = self._agent.lancar_contas_em_lote([dados for dados, _ in em_lote])
+            except Exception:
+                # Um erro do banco desfaz o grupo inteiro; cada nota é gravada sozinha
+                # para que só a que causou o erro falhe
+                avulsas = em_lote + avulsas
+            else:
+                for lancada in resultado["lancadas"]:
+                    em_lote[lancada.pop("indice")][1].set_result(lancada)
+                for erro in resultado["erros"]:
+                    em_lote[erro["indice"]][1].set_exception(ValueError(erro["motivo"]))
+                confirmadas = len(resultado["lancadas"])
+        for dados, future in avulsas:
+            try:
+                future.set_result(self._agent.lancar_conta_pagar(dados))
+                confirmadas += 1
+            except Exception as exc:
+                future.set_exception(exc)
+        duracao = time.monotonic() - inicio
+
+        with self._lock:
+            self._estatisticas["grupos"] += 1
+            self._estatisticas["notas"] += confirmadas
+            self._estatisticas["falhas"] += len(ativos) - confirmadas
+            self._estatisticas["tempo_gravando"] += duracao
+        if self.observador is not None:
+            self.observador(confirmadas, duracao, self._fila.qsize())
@@ -0,0 +1,275 @@
+"""Importação em massa de pessoas e classificações a partir de CSV.
+
+As linhas válidas são carregadas numa tabela temporária (via ``COPY`` no
+PostgreSQL) e mescladas no cadastro com um único ``INSERT ... SELECT ... ON
+CONFLICT`` sobre as chaves únicas de documento e de ``lower(descricao)``,
+independentemente do número de linhas. O ``SELECT`` já junta o cadastro atual,
+então campos vazios no arquivo mantêm o valor gravado e só as linhas novas
+recebem os padrões. Linhas com algum campo maior que a coluna são rejeitadas
+antes da carga, já que um único valor longo demais abortaria o ``COPY``.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, Callable, Dict, Iterable, List, Optional, TextIO
+
+from sqlalchemy import Column, MetaData, Select, String, Table, case, func, select, true
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from agents.AgentePersistencia.processador import PersistenciaAgent
+from database.connection import SessionLocal
+from database.dialects import upsert_insert
+from database.models import Classificacao, Pessoas
+from database.versioning import bump_table_versions
+
+_staging_metadata = MetaData()
+
+_staging_pessoas = Table(
+    "stg_importacao_pessoas",
+    _staging_metadata,
+    Column("tipo", String(45)),
+    Column("razaosocial", String(150)),
+    Column("fantasia", String(150)),
+    Column("documento", String(45)),
+    Column("status", String(45)),
+    prefixes=["TEMPORARY"],
+)
+
+_staging_classificacoes = Table(
+    "stg_importacao_classificacoes",
+    _staging_metadata,
+    Column("tipo", String(45)),
+    Column("descricao", String(150)),
+    Column("status", String(45)),
+    prefixes=["TEMPORARY"],
+)
+
+_ALIASES_PESSOA = {
+    "tipo": ("tipo", "categoria"),
+    "razaosocial": ("razaosocial", "razao_social", "razaoSocial", "nome", "nomeCompleto"),
+    "fantasia": ("fantasia", "nome_fantasia", "nomeFantasia"),
+    "documento": ("documento", "cnpj", "cpf"),
+    "status": ("status",),
+}
+
+_ALIASES_CLASSIFICACAO = {
+    "tipo": ("tipo",),
+    "descricao": ("descricao", "descrição", "nome"),
+    "status": ("status",),
+}
+
+
+def _mesclado(existe, novo, atual, padrao: Optional[str] = None):
+    """Valor do arquivo; vazio, mantém o gravado (linha existente) ou usa ``padrao`` (linha nova)."""
+
+    if padrao is None:
+        return func.coalesce(novo, atual)
+    return case((existe, func.coalesce(novo, atual)), else_=func.coalesce(novo, padrao))
+
+
+def _campo_excedido(staging: Table, valores: Dict[str, Any]) -> Optional[str]:
+    """Coluna cujo valor não cabe na tabela temporária (no PostgreSQL, abortaria o ``COPY`` inteiro)."""
+
+    for coluna, valor in valores.items():
+        comprimento = staging.c[coluna].type.length
+        if isinstance(valor, str) and comprimento and len(valor) > comprimento:
+            return coluna
+    return None
+
+
+class ImportadorCadastros:
+    """Carga em massa dos cadastros auxiliares usados nos lançamentos."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self._session_factory = session_factory
+
+    def importar_pessoas(self, arquivo: TextIO) -> Dict[str, Any]:
+        """Insere ou atualiza pessoas pelo documento normalizado."""
+
+        rejeitadas: List[Dict[str, Any]] = []
+        por_documento: Dict[str, tuple[int, Dict[str, Any]]] = {}
+        for numero, registro in self._ler_csv(arquivo, _ALIASES_PESSOA):
+            documento = PersistenciaAgent._sanitize_documento(registro["documento"])
+            if not documento:
+                rejeitadas.append({"linha": numero, "motivo": "documento ausente ou inválido"})
+                continue
+            valores = {
+                "tipo": (registro["tipo"] or "").upper() or None,
+                "razaosocial": registro["razaosocial"],
+                "fantasia": registro["fantasia"],
+                "documento": documento,
+                "status": (registro["status"] or "").upper() or None,
+            }
+            campo = _campo_excedido(_staging_pessoas, valores)
+            if campo:
+                rejeitadas.append({"linha": numero, "motivo": f"campo '{campo}' excede o tamanho permitido"})
+                continue
+            if documento in por_documento:
+                # A última ocorrência do documento no arquivo prevalece
+                rejeitadas.append({"linha": por_documento[documento][0], "motivo": "documento repetido no arquivo"})
+            por_documento[documento] = (numero, valores)
+        linhas = [linha for _, linha in por_documento.values()]
+
+        destino = Pessoas.__table__
+        stg = _staging_pessoas
+        atual = destino.alias("atual")
+        mesmo_documento = atual.c.documento == stg.c.documento
+        existe = atual.c.idPessoas.is_not(None)
+        origem = select(
+            _mesclado(existe, stg.c.tipo, atual.c.tipo),
+            _mesclado(existe, stg.c.razaosocial, atual.c.razaosocial),
+            _mesclado(existe, stg.c.fantasia, atual.c.fantasia),
+            stg.c.documento,
+            _mesclado(existe, stg.c.status, atual.c.status, "ATIVO"),
+        ).select_from(stg.outerjoin(atual, mesmo_documento))
+        return self._mesclar(
+            stg,
+            linhas,
+            rejeitadas,
+            destino,
+            origem,
+            colunas=["tipo", "razaosocial", "fantasia", "documento", "status"],
+            chave=[destino.c.documento],
+            atualizar=["tipo", "razaosocial", "fantasia", "status"],
+            existentes=select(func.count()).select_from(stg.join(atual, mesmo_documento)),
+        )
+
+    def importar_classificacoes(self, arquivo: TextIO) -> Dict[str, Any]:
+        """Insere ou atualiza classificações pela descrição (sem diferenciar caixa)."""
+
+        rejeitadas: List[Dict[str, Any]] = []
+        por_descricao: Dict[str, tuple[int, Dict[str, Any]]] = {}
+        for numero, registro in self._ler_csv(arquivo, _ALIASES_CLASSIFICACAO):
+            descricao = PersistenciaAgent._extrair_descricao_classificacao(registro["descricao"] or "")
+            if not descricao:
+                rejeitadas.append({"linha": numero, "motivo": "descrição ausente"})
+                continue
+            valores = {
+                "tipo": (registro["tipo"] or "").upper() or None,
+                "descricao": descricao,
+                "status": (registro["status"] or "").upper() or None,
+            }
+            campo = _campo_excedido(_staging_classificacoes, valores)
+            if campo:
+                rejeitadas.append({"linha": numero, "motivo": f"campo '{campo}' excede o tamanho permitido"})
+                continue
+            chave = descricao.lower()
+            if chave in por_descricao:
+                rejeitadas.append({"linha": por_descricao[chave][0], "motivo": "descrição repetida no arquivo"})
+            por_descricao[chave] = (numero, valores)
+        linhas = [linha for _, linha in por_descricao.values()]
+
+        destino = Classificacao.__table__
+        stg = _staging_classificacoes
+        atual = destino.alias("atual")
+        mesma_descricao = func.lower(atual.c.descricao) == func.lower(stg.c.descricao)
+        existe = atual.c.idClassificacao.is_not(None)
+        origem = select(
+            _mesclado(existe, stg.c.tipo, atual.c.tipo, "DESPESA"),
+            stg.c.descricao,
+            _mesclado(existe, stg.c.status, atual.c.status, "ATIVO"),
+        ).select_from(stg.outerjoin(atual, mesma_descricao))
+        return self._mesclar(
+            stg,
+            linhas,
+            rejeitadas,
+            destino,
+            origem,
+            colunas=["tipo", "descricao", "status"],
+            chave=[func.lower(destino.c.descricao)],
+            atualizar=["tipo", "status"],
+            existentes=select(func.count()).select_from(stg.join(atual, mesma_descricao)),
+        )
+
+    def _mesclar(
+        self,
+        staging: Table,
+        linhas: List[Dict[str, Any]],
+        rejeitadas: List[Dict[str, Any]],
+        destino: Table,
+        origem: Select,
+        *,
+        colunas: List[str],
+        chave: List[Any],
+        atualizar: List[str],
+        existentes: Select,
+    ) -> Dict[str, Any]:
+        resultado = {"inseridos": 0, "atualizados": 0, "rejeitados": len(rejeitadas), "erros": rejeitadas}
+        if not linhas:
+            return resultado
+
+        session = self._session_factory()
+        try:
+            connection = session.connection()
+            # checkfirst/delete cobrem uma tabela temporária que sobrou de uma carga
+            # interrompida na mesma conexão (o SQLite não desfaz DDL no rollback)
+            staging.create(connection, checkfirst=True)
+            connection.execute(staging.delete())
+            self._carregar_staging(connection, staging, linhas)
+            resultado["atualizados"] = connection.execute(existentes).scalar_one()
+            stmt = upsert_insert(connection, destino)
+            # O WHERE desfaz a ambiguidade do SQLite entre o ON do JOIN e o ON CONFLICT
+            stmt = stmt.from_select(colunas, origem.where(true())).on_conflict_do_update(
+                index_elements=chave,
+                set_={coluna: stmt.excluded[coluna] for coluna in atualizar},
+            )
+            # O rowcount do upsert soma as linhas inseridas e as atualizadas
+            resultado["inseridos"] = connection.execute(stmt).rowcount - resultado["atualizados"]
+            staging.drop(connection)
+            bump_table_versions(session, [destino.name])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        return resultado
+
+    @staticmethod
+    def _carregar_staging(connection: Connection, staging: Table, linhas: List[Dict[str, Any]]) -> None:
+        colunas = [coluna.name for coluna in staging.columns]
+        if connection.dialect.name != "postgresql":
+            connection.execute(staging.insert(), linhas)
+            return
+
+        # COPY ... FORMAT csv lê campos vazios sem aspas como NULL
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for linha in linhas:
+            writer.writerow([linha[coluna] for coluna in colunas])
+        buffer.seek(0)
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {staging.name} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _ler_csv(arquivo: TextIO, aliases: Dict[str, Iterable[str]]):
+        """Itera ``(número da linha, registro normalizado)`` aceitando ``,`` ou ``;``."""
+
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;")
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.DictReader(arquivo, dialect=dialeto)
+        cabecalho = {(nome or "").strip().lower(): nome for nome in leitor.fieldnames or []}
+
+        mapa: Dict[str, Optional[str]] = {}
+        for campo, nomes in aliases.items():
+            mapa[campo] = next((cabecalho[nome.lower()] for nome in nomes if nome.lower() in cabecalho), None)
+
+        for numero, bruto in enumerate(leitor, start=2):
+            registro = {}
+            for campo, origem in mapa.items():
+                valor = bruto.get(origem) if origem else None
+                registro[campo] = (valor.strip() or None) if isinstance(valor, str) else None
+            yield numero, registro
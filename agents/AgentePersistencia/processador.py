@@ -6,20 +6,46 @@ import re
 from contextlib import contextmanager
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
-from typing import Any, Callable, Dict, Iterable, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
 
-from sqlalchemy import func, select
+from sqlalchemy import delete, func, insert, select, tuple_, update
 from sqlalchemy.orm import Session
 
+from agents.AgentePersistencia.cache import CacheIdentidades, versoes_da_sessao
 from database.connection import SessionLocal
-from database.models import Classificacao, MovimentoContas, ParcelasContas, Pessoas
+from database.dialects import upsert_insert
+from database.models import (
+    Classificacao,
+    MovimentoContas,
+    ParcelasContas,
+    Pessoas,
+    movimento_classificacao_association,
+)
+from database.rollups import track_movements
+from database.versioning import bump_table_versions
+
+_CAMPOS_PARCELA = (
+    "identificacao",
+    "data_vencimento",
+    "valor_parcela",
+    "valor_pago",
+    "valor_saldo",
+    "status_parcela",
+)
+# Tabelas cujos IDs passam pelo CacheIdentidades
+_TABELAS_EM_CACHE = (Pessoas.__tablename__, Classificacao.__tablename__)
 
 
 class PersistenciaAgent:
     """Camada de orquestração das operações de persistência via SQLAlchemy."""
 
-    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        cache: Optional[CacheIdentidades] = None,
+    ) -> None:
         self._session_factory = session_factory
+        self.cache = cache if cache is not None else CacheIdentidades()
 
     @contextmanager
     def _session_scope(self) -> Iterable[Session]:
@@ -49,41 +75,45 @@ class PersistenciaAgent:
         if not dados_pessoa:
             return None
 
+        documento = self._sanitize_documento(
+            dados_pessoa.get("documento")
+            or dados_pessoa.get("cnpj")
+            or dados_pessoa.get("cpf")
+        )
+        if not documento:
+            return None
+
         manage_session = session is None
         session = session or self._session_factory()
 
         try:
-            documento = self._sanitize_documento(
-                dados_pessoa.get("documento")
-                or dados_pessoa.get("cnpj")
-                or dados_pessoa.get("cpf")
-            )
-            if not documento:
-                return None
-
-            stmt = select(Pessoas).where(Pessoas.documento == documento)
-            pessoa = session.execute(stmt).scalar_one_or_none()
-            if pessoa:
-                return pessoa.id
-            if not criar_se_ausente:
-                return None
-
-            pessoa = Pessoas(
-                tipo=tipo_padrao or self._inferir_tipo_pessoa(dados_pessoa),
-                razaosocial=dados_pessoa.get("razaoSocial") or dados_pessoa.get("nomeCompleto"),
-                fantasia=dados_pessoa.get("fantasia"),
-                documento=documento,
-                status=dados_pessoa.get("status") or "ATIVO",
-            )
-            session.add(pessoa)
-            session.flush()
+            if criar_se_ausente:
+                valores = self._valores_pessoa(dados_pessoa, documento, tipo_padrao)
+                pessoa_id = self._resolver_pessoas(session, {documento: valores})[documento]
+            else:
+                stmt = select(Pessoas.id).where(Pessoas.documento == documento)
+                pessoa_id = self._consultar_id(session, Pessoas.__tablename__, documento, stmt)
             if manage_session:
                 session.commit()
-            return pessoa.id
+            return pessoa_id
         finally:
             if manage_session:
                 session.close()
 
+    def _valores_pessoa(
+        self,
+        dados_pessoa: Dict[str, Any],
+        documento: str,
+        tipo_padrao: Optional[str],
+    ) -> Dict[str, Any]:
+        return {
+            "tipo": tipo_padrao or self._inferir_tipo_pessoa(dados_pessoa),
+            "razaosocial": dados_pessoa.get("razaoSocial") or dados_pessoa.get("nomeCompleto"),
+            "fantasia": dados_pessoa.get("fantasia"),
+            "documento": documento,
+            "status": dados_pessoa.get("status") or "ATIVO",
+        }
+
     def get_or_create_classificacao(
         self,
         dados_classificacao: Any,
@@ -97,27 +127,20 @@ class PersistenciaAgent:
         if not descricao:
             return None
 
+        chave = descricao.lower()
         manage_session = session is None
         session = session or self._session_factory()
 
         try:
-            stmt = select(Classificacao).where(func.lower(Classificacao.descricao) == descricao.lower())
-            classificacao = session.execute(stmt).scalar_one_or_none()
-            if classificacao:
-                return classificacao.id
-            if not criar_se_ausente:
-                return None
-
-            classificacao = Classificacao(
-                tipo=self._extrair_tipo_classificacao(dados_classificacao),
-                descricao=descricao,
-                status="ATIVO",
-            )
-            session.add(classificacao)
-            session.flush()
+            if criar_se_ausente:
+                entrada = (descricao, self._extrair_tipo_classificacao(dados_classificacao))
+                class_id = self._resolver_classificacoes(session, [entrada])[chave]
+            else:
+                stmt = select(Classificacao.id).where(func.lower(Classificacao.descricao) == chave)
+                class_id = self._consultar_id(session, Classificacao.__tablename__, chave, stmt)
             if manage_session:
                 session.commit()
-            return classificacao.id
+            return class_id
         finally:
             if manage_session:
                 session.close()
@@ -129,45 +152,358 @@ class PersistenciaAgent:
             raise ValueError("dados_json vazio")
 
         with self._session_scope() as session:
-            fornecedor_id = self.get_or_create_pessoa(
-                dados_json.get("fornecedor", {}),
-                tipo_padrao="FORNECEDOR",
-                session=session,
-            )
-            faturado_id = self.get_or_create_pessoa(
-                dados_json.get("faturado", {}),
-                tipo_padrao="FATURADO",
-                session=session,
-            )
-
-            movimento = self._upsert_movimento(
+            fornecedor = self._pessoa_do_payload(dados_json.get("fornecedor"), "FORNECEDOR")
+            faturado = self._pessoa_do_payload(dados_json.get("faturado"), "FATURADO")
+            # Fornecedor e faturado numa só instrução, na mesma ordem de bloqueio de qualquer outro lançamento
+            pessoas_ids = self._resolver_pessoas(session, self._pessoas_por_documento([fornecedor, faturado]))
+            fornecedor_id = pessoas_ids[fornecedor["documento"]] if fornecedor else None
+            faturado_id = pessoas_ids[faturado["documento"]] if faturado else None
+
+            movimento_id = self._upsert_movimento(
                 session,
                 dados_json,
                 fornecedor_id,
                 faturado_id,
             )
 
-            self._sincronizar_classificacoes(
+            classificacao_ids = self._sincronizar_classificacoes(
                 session,
-                movimento,
+                movimento_id,
                 dados_json.get("classificacaoDespesa") or ["Outros"],
             )
-            self._sincronizar_parcelas(
-                movimento,
-                dados_json.get("parcelas") or [],
-            )
-
-            session.flush()
-            session.refresh(movimento)
+            parcelas = [
+                self._valores_parcela(parcela_raw, indice)
+                for indice, parcela_raw in enumerate(dados_json.get("parcelas") or [], start=1)
+            ]
+            parcelas_ids = self._sincronizar_parcelas(session, {movimento_id: parcelas})
 
             return {
-                "movimento_id": movimento.id,
-                "parcelas_ids": [parcela.id for parcela in movimento.parcelas],
-                "classificacao_ids": [cls.id for cls in movimento.classificacoes],
+                "movimento_id": movimento_id,
+                "parcelas_ids": parcelas_ids.get(movimento_id, []),
+                "classificacao_ids": classificacao_ids,
                 "fornecedor_id": fornecedor_id,
                 "faturado_id": faturado_id,
             }
 
+    def lancar_contas_em_lote(self, notas: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """Lança várias notas numa única transação, com um número fixo de instruções.
+
+        Pessoas e classificações são resolvidas com um ``IN`` cada e as ausentes
+        inseridas de uma vez; os movimentos entram por ``INSERT ... ON CONFLICT``
+        na chave (número da nota, fornecedor) e, de parcelas e vínculos de
+        classificação, só a diferença é escrita. Notas inválidas vão para ``erros``
+        com o índice no lote, sem impedir o lançamento das demais. Diferente de
+        :meth:`lancar_conta_pagar`, uma nota sem número ou sem fornecedor é
+        sempre lançada como um movimento novo.
+        """
+
+        erros: List[Dict[str, Any]] = []
+        por_chave: Dict[Any, Dict[str, Any]] = {}
+        for indice, dados_json in enumerate(notas):
+            if not isinstance(dados_json, dict) or not dados_json:
+                erros.append({"indice": indice, "motivo": "nota vazia ou inválida"})
+                continue
+            item = self._preparar_nota_lote(indice, dados_json)
+            if item.get("motivo"):
+                erros.append({"indice": indice, "motivo": item["motivo"]})
+                continue
+            numero = item["movimento"]["numero_nota_fiscal"]
+            fornecedor = item["fornecedor"]
+            chave = (numero, fornecedor["documento"]) if numero and fornecedor else ("sem-chave", indice)
+            if chave in por_chave:
+                # A última ocorrência da nota no lote prevalece, como em reenvios sucessivos
+                erros.append({"indice": por_chave[chave]["indice"], "motivo": "nota repetida no lote"})
+            por_chave[chave] = item
+        itens = sorted(por_chave.values(), key=lambda item: item["indice"])
+
+        resultado: Dict[str, Any] = {"lancadas": [], "erros": sorted(erros, key=lambda erro: erro["indice"])}
+        if not itens:
+            return resultado
+
+        with self._session_scope() as session:
+            pessoas_ids = self._resolver_pessoas(
+                session,
+                self._pessoas_por_documento(item[papel] for item in itens for papel in ("fornecedor", "faturado")),
+            )
+            classificacoes_ids = self._resolver_classificacoes(
+                session, [entrada for item in itens for entrada in item["classificacoes"]]
+            )
+
+            for item in itens:
+                fornecedor, faturado = item["fornecedor"], item["faturado"]
+                item["fornecedor_id"] = pessoas_ids[fornecedor["documento"]] if fornecedor else None
+                item["faturado_id"] = pessoas_ids[faturado["documento"]] if faturado else None
+            # Um só rastreio para movimentos e vínculos: o estado final do lote é lido uma vez
+            with track_movements(session):
+                movimento_ids = self._gravar_movimentos(
+                    session,
+                    [
+                        {**item["movimento"], "fornecedor_id": item["fornecedor_id"], "faturado_id": item["faturado_id"]}
+                        for item in itens
+                    ],
+                )
+
+                vinculos, parcelas = {}, {}
+                for item, movimento_id in zip(itens, movimento_ids):
+                    item["classificacao_ids"] = list(
+                        dict.fromkeys(classificacoes_ids[descricao.lower()] for descricao, _ in item["classificacoes"])
+                    )
+                    vinculos[movimento_id] = item["classificacao_ids"]
+                    parcelas[movimento_id] = item["parcelas"]
+                self._sincronizar_vinculos(session, vinculos)
+            parcelas_por_movimento = self._sincronizar_parcelas(session, parcelas)
+
+            for item, movimento_id in zip(itens, movimento_ids):
+                resultado["lancadas"].append(
+                    {
+                        "indice": item["indice"],
+                        "movimento_id": movimento_id,
+                        "parcelas_ids": parcelas_por_movimento.get(movimento_id, []),
+                        "classificacao_ids": item["classificacao_ids"],
+                        "fornecedor_id": item["fornecedor_id"],
+                        "faturado_id": item["faturado_id"],
+                    }
+                )
+        return resultado
+
+    @staticmethod
+    def _gravar_movimentos(session: Session, linhas: List[Dict[str, Any]]) -> List[int]:
+        """Insere ou atualiza os movimentos e devolve os IDs na ordem de ``linhas``.
+
+        Os que têm número e fornecedor passam por ``INSERT ... ON CONFLICT DO NOTHING``
+        na chave única (nota, fornecedor), então dois workers gravando a mesma nota
+        ao mesmo tempo caem na mesma linha; as que já existiam são bloqueadas e
+        atualizadas em seguida, o que deixa os resumos do RAG saberem o que cada
+        uma somava antes. Os demais são sempre inseridos.
+        """
+
+        com_chave = [linha for linha in linhas if linha["numero_nota_fiscal"] and linha["fornecedor_id"]]
+        sem_chave = [linha for linha in linhas if not (linha["numero_nota_fiscal"] and linha["fornecedor_id"])]
+
+        ids_por_chave: Dict[tuple, int] = {}
+        ids_sem_chave: List[int] = []
+        with track_movements(session) as rastreio:
+            if com_chave:
+                tabela = MovimentoContas.__table__
+                chave = tuple_(tabela.c.numeronotafiscal, tabela.c.Pessoas_idFornecedorCliente)
+                # A ordenação pela chave mantém a mesma ordem de bloqueio entre transações concorrentes
+                por_chave = {
+                    (linha["numero_nota_fiscal"], linha["fornecedor_id"]): linha
+                    for linha in sorted(com_chave, key=lambda linha: (linha["numero_nota_fiscal"], linha["fornecedor_id"]))
+                }
+                stmt = upsert_insert(session, MovimentoContas).on_conflict_do_nothing(
+                    index_elements=[tabela.c.numeronotafiscal, tabela.c.Pessoas_idFornecedorCliente]
+                )
+                # Só as linhas inseridas voltam no RETURNING; as demais já existiam
+                gravados = session.execute(
+                    stmt.returning(MovimentoContas.id, MovimentoContas.numero_nota_fiscal, MovimentoContas.fornecedor_id),
+                    list(por_chave.values()),
+                )
+                ids_por_chave = {(numero, fornecedor_id): movimento_id for movimento_id, numero, fornecedor_id in gravados}
+                rastreio.inserted(ids_por_chave.values())
+
+                existentes = [item for item in por_chave if item not in ids_por_chave]
+                if existentes:
+                    for movimento_id, numero, fornecedor_id in session.execute(
+                        select(tabela.c.idMovimentoContas, *chave.clauses).where(chave.in_(existentes))
+                    ):
+                        ids_por_chave[(numero, fornecedor_id)] = movimento_id
+                    rastreio.lock(ids_por_chave[item] for item in existentes)
+                    session.execute(
+                        update(MovimentoContas),
+                        [{"id": ids_por_chave[item], **por_chave[item]} for item in existentes],
+                    )
+            if sem_chave:
+                ids_sem_chave = list(
+                    session.scalars(
+                        insert(MovimentoContas).returning(MovimentoContas.id, sort_by_parameter_order=True),
+                        sem_chave,
+                    )
+                )
+                rastreio.inserted(ids_sem_chave)
+        bump_table_versions(session, [MovimentoContas.__tablename__])
+
+        pendentes = iter(ids_sem_chave)
+        return [
+            ids_por_chave[(linha["numero_nota_fiscal"], linha["fornecedor_id"])]
+            if linha["numero_nota_fiscal"] and linha["fornecedor_id"]
+            else next(pendentes)
+            for linha in linhas
+        ]
+
+    def _preparar_nota_lote(self, indice: int, dados_json: Dict[str, Any]) -> Dict[str, Any]:
+        """Normaliza uma nota do lote; ``motivo`` indica por que ela não pode ser lançada."""
+
+        item: Dict[str, Any] = {"indice": indice}
+        for papel, tipo_padrao in (("fornecedor", "FORNECEDOR"), ("faturado", "FATURADO")):
+            item[papel] = self._pessoa_do_payload(dados_json.get(papel), tipo_padrao)
+
+        item["classificacoes"] = self._entradas_classificacao(dados_json.get("classificacaoDespesa") or ["Outros"])
+        item["movimento"] = self._valores_movimento(dados_json)
+        item["parcelas"] = [
+            self._valores_parcela(parcela_raw, posicao)
+            for posicao, parcela_raw in enumerate(dados_json.get("parcelas") or [], start=1)
+            if isinstance(parcela_raw, dict)
+        ]
+
+        # O PostgreSQL rejeitaria a instrução inteira; aqui só a nota é recusada
+        verificacoes = [(MovimentoContas, item["movimento"])]
+        verificacoes += [(Pessoas, item[papel]) for papel in ("fornecedor", "faturado") if item[papel]]
+        verificacoes += [(Classificacao, {"descricao": descricao}) for descricao, _ in item["classificacoes"]]
+        verificacoes += [(ParcelasContas, parcela) for parcela in item["parcelas"]]
+        for modelo, valores in verificacoes:
+            campo = self._campo_excedido(modelo, valores)
+            if campo:
+                item["motivo"] = f"campo '{campo}' excede o tamanho permitido"
+                break
+        return item
+
+    @staticmethod
+    def _campo_excedido(modelo, valores: Dict[str, Any]) -> Optional[str]:
+        colunas = modelo.__mapper__.columns
+        for atributo, valor in valores.items():
+            comprimento = getattr(colunas[atributo].type, "length", None)
+            if isinstance(valor, str) and comprimento and len(valor) > comprimento:
+                return atributo
+        return None
+
+    def _pessoa_do_payload(self, dados_pessoa: Any, tipo_padrao: str) -> Optional[Dict[str, Any]]:
+        """Valores de cadastro da pessoa do payload, ou ``None`` se ela não tiver documento."""
+
+        if not isinstance(dados_pessoa, dict):
+            return None
+        documento = self._sanitize_documento(
+            dados_pessoa.get("documento")
+            or dados_pessoa.get("cnpj")
+            or dados_pessoa.get("cpf")
+        )
+        return self._valores_pessoa(dados_pessoa, documento, tipo_padrao) if documento else None
+
+    @staticmethod
+    def _pessoas_por_documento(pessoas: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Agrupa os valores por documento; a primeira ocorrência de cada um prevalece."""
+
+        por_documento: Dict[str, Dict[str, Any]] = {}
+        for valores in pessoas:
+            if valores:
+                por_documento.setdefault(valores["documento"], valores)
+        return por_documento
+
+    def _resolver_pessoas(self, session: Session, pessoas: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        """Mapeia documento -> id com um ``IN`` e um ``INSERT ... ON CONFLICT`` de várias linhas no máximo.
+
+        O upsert no índice único do documento devolve também o ID de quem outro
+        worker acabou de cadastrar entre a consulta e a inserção, sem erro de
+        integridade e sem nova tentativa.
+        """
+
+        tabela = Pessoas.__tablename__
+        ids: Dict[str, int] = {}
+        novas: Dict[str, Dict[str, Any]] = {}
+        versoes = versoes_da_sessao(session, _TABELAS_EM_CACHE)
+        for documento, valores in pessoas.items():
+            # Só o ID em cache serve aqui; com uma ausência a inserção tenta de novo
+            _, pessoa_id = self.cache.obter(tabela, documento, versoes)
+            if pessoa_id is not None:
+                ids[documento] = pessoa_id
+            else:
+                novas[documento] = valores
+        if not novas:
+            return ids
+
+        ids.update(session.execute(select(Pessoas.documento, Pessoas.id).where(Pessoas.documento.in_(novas))).all())
+        faltantes = [valores for documento, valores in sorted(novas.items()) if documento not in ids]
+        if faltantes:
+            stmt = upsert_insert(session, Pessoas)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Pessoas.__table__.c.documento],
+                # Atribuição sem efeito: com DO NOTHING a linha já existente não voltaria no RETURNING
+                set_={"documento": stmt.excluded.documento},
+            )
+            ids.update(session.execute(stmt.returning(Pessoas.documento, Pessoas.id), faltantes).all())
+            bump_table_versions(session, [tabela])
+        for documento in novas:
+            self.cache.guardar(tabela, documento, ids[documento], versoes, session=session)
+        return ids
+
+    def _entradas_classificacao(self, classificacoes_payload: Iterable[Any]) -> List[tuple[str, Optional[str]]]:
+        """``(descrição, tipo)`` de cada classificação do payload, sem repetir descrições."""
+
+        entradas: Dict[str, tuple[str, Optional[str]]] = {}
+        for registro in classificacoes_payload:
+            descricao = self._extrair_descricao_classificacao(registro)
+            if descricao:
+                entradas.setdefault(descricao.lower(), (descricao, self._extrair_tipo_classificacao(registro)))
+        return list(entradas.values())
+
+    def _resolver_classificacoes(
+        self,
+        session: Session,
+        entradas: Iterable[tuple[str, Optional[str]]],
+    ) -> Dict[str, int]:
+        """Mapeia descrição em minúsculas -> id com um ``IN`` e um ``INSERT ... ON CONFLICT`` no máximo."""
+
+        tabela = Classificacao.__tablename__
+        ids: Dict[str, int] = {}
+        novas: Dict[str, Dict[str, Any]] = {}
+        versoes = versoes_da_sessao(session, _TABELAS_EM_CACHE)
+        for descricao, tipo in entradas:
+            chave = descricao.lower()
+            if chave in ids or chave in novas:
+                continue
+            _, class_id = self.cache.obter(tabela, chave, versoes)
+            if class_id is not None:
+                ids[chave] = class_id
+            else:
+                novas[chave] = {"tipo": tipo, "descricao": descricao, "status": "ATIVO"}
+        if not novas:
+            return ids
+
+        coluna = func.lower(Classificacao.descricao)
+        ids.update(session.execute(select(coluna, Classificacao.id).where(coluna.in_(novas))).all())
+        faltantes = [valores for chave, valores in sorted(novas.items()) if chave not in ids]
+        if faltantes:
+            # Mesmo upsert de _resolver_pessoas, no índice único de lower(descricao); a
+            # linha existente mantém a grafia com que foi cadastrada
+            colunas = Classificacao.__table__.c
+            stmt = upsert_insert(session, Classificacao).on_conflict_do_update(
+                index_elements=[func.lower(colunas.descricao)],
+                set_={"descricao": colunas.descricao},
+            )
+            inseridas = session.execute(stmt.returning(Classificacao.descricao, Classificacao.id), faltantes)
+            ids.update((descricao.lower(), class_id) for descricao, class_id in inseridas)
+            bump_table_versions(session, [tabela])
+        for chave in novas:
+            self.cache.guardar(tabela, chave, ids[chave], versoes, session=session)
+        return ids
+
+    @staticmethod
+    def _sincronizar_vinculos(session: Session, desejados: Dict[int, List[int]]) -> None:
+        """Deixa cada movimento com exatamente as classificações pedidas, gravando só a diferença."""
+
+        if not desejados:
+            return
+        assoc = movimento_classificacao_association
+        conta_col = assoc.c.MovimentoContas_idMovimentoContas
+        class_col = assoc.c.Classificacao_idClassificacao
+
+        with track_movements(session, desejados):
+            atuais = {
+                tuple(linha) for linha in session.execute(select(conta_col, class_col).where(conta_col.in_(desejados)))
+            }
+            pedidos = {(movimento_id, class_id) for movimento_id, ids in desejados.items() for class_id in ids}
+            remover = atuais - pedidos
+            adicionar = pedidos - atuais
+            if remover:
+                session.execute(delete(assoc).where(tuple_(conta_col, class_col).in_(sorted(remover))))
+            if adicionar:
+                session.execute(
+                    insert(assoc),
+                    [{conta_col.key: movimento_id, class_col.key: class_id} for movimento_id, class_id in sorted(adicionar)],
+                )
+        if remover or adicionar:
+            bump_table_versions(session, [assoc.name])
+
     def verificar_entidades(self, dados_json: Dict[str, Any]) -> Dict[str, Any]:
         """Retorna o status de existência das entidades envolvidas sem realizar inserções."""
 
@@ -189,16 +525,22 @@ class PersistenciaAgent:
                 descricao = self._extrair_descricao_classificacao(item)
                 if not descricao:
                     continue
-                stmt = select(Classificacao).where(func.lower(Classificacao.descricao) == descricao.lower())
-                classificacao = session.execute(stmt).scalar_one_or_none()
+                class_id = self._consultar_id(
+                    session,
+                    Classificacao.__tablename__,
+                    descricao.lower(),
+                    select(Classificacao.id).where(func.lower(Classificacao.descricao) == descricao.lower()),
+                )
                 classificacoes_info.append(
                     {
                         "descricao": descricao,
-                        "status": "EXISTE" if classificacao else "NÃO EXISTE",
-                        "id": classificacao.id if classificacao else None,
+                        "status": "EXISTE" if class_id else "NÃO EXISTE",
+                        "id": class_id,
                     }
                 )
 
+            # Só leitura; o commit aplica ao cache o que as consultas acima encontraram
+            session.commit()
             return {
                 "fornecedor": fornecedor_info,
                 "faturado": faturado_info,
@@ -207,89 +549,194 @@ class PersistenciaAgent:
         finally:
             session.close()
 
+    def _consultar_id(
+        self,
+        session: Session,
+        tabela: str,
+        chave: str,
+        stmt,
+    ) -> Optional[int]:
+        """ID de ``chave`` pelo cache ou pela consulta ``stmt``, guardando o resultado (inclusive a ausência)."""
+
+        versoes = versoes_da_sessao(session, _TABELAS_EM_CACHE)
+        encontrado, valor = self.cache.obter(tabela, chave, versoes)
+        if encontrado:
+            return valor
+        valor = session.execute(stmt).scalar_one_or_none()
+        self.cache.guardar(tabela, chave, valor, versoes, session=session)
+        return valor
+
     def _upsert_movimento(
         self,
         session: Session,
         dados_json: Dict[str, Any],
         fornecedor_id: Optional[int],
         faturado_id: Optional[int],
-    ) -> MovimentoContas:
-        numero_nota = dados_json.get("numeroNotaFiscal")
+    ) -> int:
+        valores = {**self._valores_movimento(dados_json), "fornecedor_id": fornecedor_id, "faturado_id": faturado_id}
+        numero_nota = valores["numero_nota_fiscal"]
         stmt = select(MovimentoContas).where(MovimentoContas.numero_nota_fiscal == numero_nota)
         if fornecedor_id:
             stmt = stmt.where(MovimentoContas.fornecedor_id == fornecedor_id)
 
         movimento = session.execute(stmt).scalar_one_or_none()
         if movimento is None:
+            if numero_nota and fornecedor_id:
+                # Nota nova: se outro worker a gravar ao mesmo tempo, o ON CONFLICT cai na mesma linha
+                return self._gravar_movimentos(session, [valores])[0]
             movimento = MovimentoContas()
             session.add(movimento)
 
-        movimento.tipo = dados_json.get("tipo") or "Despesa"
-        movimento.numero_nota_fiscal = numero_nota
-        movimento.data_emissao = self._parse_date(
-            dados_json.get("dataEmissao") or dados_json.get("data_emissao")
-        )
-        movimento.descricao = dados_json.get("descricao") or dados_json.get("observacoes")
-        movimento.status = dados_json.get("status") or "ABERTO"
-        movimento.valor_total = self._to_decimal(
-            dados_json.get("valorTotal") or dados_json.get("valor_total")
-        )
-        movimento.fornecedor_id = fornecedor_id
-        movimento.faturado_id = faturado_id
+        for atributo, valor in valores.items():
+            setattr(movimento, atributo, valor)
+        session.flush()
+        return movimento.id
 
-        return movimento
+    def _valores_movimento(self, dados_json: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "tipo": dados_json.get("tipo") or "Despesa",
+            "numero_nota_fiscal": dados_json.get("numeroNotaFiscal"),
+            "data_emissao": self._parse_date(
+                dados_json.get("dataEmissao") or dados_json.get("data_emissao")
+            ),
+            "descricao": dados_json.get("descricao") or dados_json.get("observacoes"),
+            "status": dados_json.get("status") or "ABERTO",
+            "valor_total": self._to_decimal(
+                dados_json.get("valorTotal") or dados_json.get("valor_total")
+            ),
+        }
 
     def _sincronizar_classificacoes(
         self,
         session: Session,
-        movimento: MovimentoContas,
+        movimento_id: int,
         classificacoes_payload: Iterable[Any],
-    ) -> None:
-        movimento.classificacoes.clear()
-        for item in classificacoes_payload:
-            class_id = self.get_or_create_classificacao(item, session=session)
-            if not class_id:
-                continue
-            classificacao = session.get(Classificacao, class_id)
-            if classificacao and classificacao not in movimento.classificacoes:
-                movimento.classificacoes.append(classificacao)
+    ) -> List[int]:
+        entradas = self._entradas_classificacao(classificacoes_payload)
+        ids = self._resolver_classificacoes(session, entradas)
+        classificacao_ids = list(dict.fromkeys(ids[descricao.lower()] for descricao, _ in entradas))
+        self._sincronizar_vinculos(session, {movimento_id: classificacao_ids})
+        return classificacao_ids
 
     def _sincronizar_parcelas(
         self,
-        movimento: MovimentoContas,
-        parcelas_payload: Iterable[Dict[str, Any]],
-    ) -> None:
-        movimento.parcelas.clear()
-        for indice, parcela_raw in enumerate(parcelas_payload, start=1):
-            parcela = ParcelasContas(
-                identificacao=self._coalesce_str(
-                    parcela_raw.get("identificacao"),
-                    parcela_raw.get("Identificacao"),
-                    f"Parcela {indice}",
-                ),
-                data_vencimento=self._parse_date(
-                    parcela_raw.get("dataVencimento")
-                    or parcela_raw.get("data_vencimento")
-                ),
-                valor_parcela=self._to_decimal(
-                    parcela_raw.get("valorParcela")
-                    or parcela_raw.get("valor_parcela")
-                ),
-                valor_pago=self._to_decimal(
-                    parcela_raw.get("valorPago")
-                    or parcela_raw.get("valor_pago")
-                ),
-                valor_saldo=self._to_decimal(
-                    parcela_raw.get("valorSaldo")
-                    or parcela_raw.get("valor_saldo")
-                ),
-                status_parcela=self._coalesce_str(
-                    parcela_raw.get("statusParcela"),
-                    parcela_raw.get("status_parcela"),
-                    "PENDENTE",
-                ),
+        session: Session,
+        desejadas: Dict[int, List[Dict[str, Any]]],
+    ) -> Dict[int, List[int]]:
+        """Aplica às parcelas de cada movimento só as diferenças em relação ao payload.
+
+        Uma parcela do payload corresponde à existente de mesma identificação
+        ou, na falta dela, de mesmo vencimento; das correspondentes, só os campos
+        informados e diferentes são atualizados, de modo que ``valor_pago`` e
+        ``status_parcela`` ajustados depois do lançamento não se perdem quando a
+        nota é relançada sem eles. As sobras são inseridas ou excluídas.
+        Retorna os IDs das parcelas de cada movimento.
+        """
+
+        if not desejadas:
+            return {}
+        existentes: Dict[int, List[Dict[str, Any]]] = {movimento_id: [] for movimento_id in desejadas}
+        linhas = session.execute(
+            select(
+                *(getattr(ParcelasContas, atributo) for atributo in _CAMPOS_PARCELA),
+                ParcelasContas.id,
+                ParcelasContas.movimento_id,
             )
-            movimento.parcelas.append(parcela)
+            .where(ParcelasContas.movimento_id.in_(desejadas))
+            .order_by(ParcelasContas.id)
+        )
+        for linha in linhas:
+            existentes[linha.movimento_id].append(dict(linha._mapping))
+
+        atualizar: List[Dict[str, Any]] = []
+        inserir: List[Dict[str, Any]] = []
+        remover: List[int] = []
+        for movimento_id, novas in desejadas.items():
+            livres = list(existentes[movimento_id])
+            for nova in novas:
+                atual = self._parcela_correspondente(livres, nova)
+                if atual is None:
+                    inserir.append(
+                        {**nova, "status_parcela": nova["status_parcela"] or "PENDENTE", "movimento_id": movimento_id}
+                    )
+                    continue
+                livres.remove(atual)
+                mudancas = {
+                    campo: valor
+                    for campo, valor in nova.items()
+                    if valor is not None and valor != atual[campo]
+                }
+                if mudancas:
+                    atualizar.append({"id": atual["id"], **mudancas})
+            remover.extend(parcela["id"] for parcela in livres)
+
+        if remover:
+            session.execute(delete(ParcelasContas).where(ParcelasContas.id.in_(remover)))
+        if atualizar:
+            # UPDATE em massa pela chave primária (executemany, agrupado pelos campos alterados)
+            session.execute(update(ParcelasContas), atualizar)
+        if inserir:
+            session.execute(insert(ParcelasContas), inserir)
+        if not (remover or atualizar or inserir):
+            return {
+                movimento_id: [parcela["id"] for parcela in parcelas]
+                for movimento_id, parcelas in existentes.items()
+            }
+
+        bump_table_versions(session, [ParcelasContas.__tablename__])
+        ids: Dict[int, List[int]] = {movimento_id: [] for movimento_id in desejadas}
+        for parcela_id, movimento_id in session.execute(
+            select(ParcelasContas.id, ParcelasContas.movimento_id)
+            .where(ParcelasContas.movimento_id.in_(desejadas))
+            .order_by(ParcelasContas.id)
+        ):
+            ids[movimento_id].append(parcela_id)
+        return ids
+
+    @staticmethod
+    def _parcela_correspondente(
+        candidatas: List[Dict[str, Any]],
+        nova: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        identificacao = (nova["identificacao"] or "").strip().lower()
+        for parcela in candidatas:
+            if identificacao and (parcela["identificacao"] or "").strip().lower() == identificacao:
+                return parcela
+        if nova["data_vencimento"] is not None:
+            for parcela in candidatas:
+                if parcela["data_vencimento"] == nova["data_vencimento"]:
+                    return parcela
+        return None
+
+    def _valores_parcela(self, parcela_raw: Dict[str, Any], indice: int) -> Dict[str, Any]:
+        return {
+            "identificacao": self._coalesce_str(
+                parcela_raw.get("identificacao"),
+                parcela_raw.get("Identificacao"),
+                f"Parcela {indice}",
+            ),
+            "data_vencimento": self._parse_date(
+                parcela_raw.get("dataVencimento")
+                or parcela_raw.get("data_vencimento")
+            ),
+            "valor_parcela": self._to_decimal(
+                parcela_raw.get("valorParcela")
+                or parcela_raw.get("valor_parcela")
+            ),
+            "valor_pago": self._to_decimal(
+                parcela_raw.get("valorPago")
+                or parcela_raw.get("valor_pago")
+            ),
+            "valor_saldo": self._to_decimal(
+                parcela_raw.get("valorSaldo")
+                or parcela_raw.get("valor_saldo")
+            ),
+            # Sem status no payload, a parcela nova entra como PENDENTE e a existente mantém o seu
+            "status_parcela": self._coalesce_str(
+                parcela_raw.get("statusParcela"),
+                parcela_raw.get("status_parcela"),
+            ),
+        }
 
     @staticmethod
     def _sanitize_documento(documento: Optional[str]) -> Optional[str]:
@@ -334,12 +781,16 @@ class PersistenciaAgent:
                 "tipo": tipo_padrao,
             }
 
-        stmt = select(Pessoas).where(Pessoas.documento == documento)
-        pessoa = session.execute(stmt).scalar_one_or_none()
+        pessoa_id = self._consultar_id(
+            session,
+            Pessoas.__tablename__,
+            documento,
+            select(Pessoas.id).where(Pessoas.documento == documento),
+        )
 
         return {
-            "status": "EXISTE" if pessoa else "NÃO EXISTE",
-            "id": pessoa.id if pessoa else None,
+            "status": "EXISTE" if pessoa_id else "NÃO EXISTE",
+            "id": pessoa_id,
             "documento": documento,
             "tipo": tipo_padrao or self._inferir_tipo_pessoa(dados_pessoa),
             "nome": dados_pessoa.get("razaoSocial")
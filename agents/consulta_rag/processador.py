@@ -14,10 +14,37 @@ from config.settings import GOOGLE_API_KEY  # caso precise, mas usamos ia_servic
 from agents.AgentePersistencia.processador import PersistenciaAgent
 import os
 
-from database.models import Classificacao, MovimentoContas, ParcelasContas, Pessoas
+from database.models import (
+    Classificacao,
+    MovimentoContas,
+    ParcelasContas,
+    Pessoas,
+    ResumoDescricao,
+    ResumoDiarioClassificacao,
+    ResumoDiarioFornecedor,
+)
+from database.search import search_terms_filter
 
 # --- lazy imports for semantic retrieval (heavy libs, loaded only when needed) ---
 CHROMA_AVAILABLE = True  # assume available unless proven otherwise
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+_EMBED_MODELS: dict = {}  # one SentenceTransformer per process, shared by every agent
+
+
+def carregar_modelo_embeddings(nome: str = EMBED_MODEL_NAME):
+    """Load the embedding model once per process.
+
+    Under ``gunicorn --preload`` the master calls this before forking, so the
+    workers inherit the weights through copy-on-write pages instead of each
+    loading its own copy.
+    """
+    modelo = _EMBED_MODELS.get(nome)
+    if modelo is None:
+        from sentence_transformers import SentenceTransformer
+
+        modelo = SentenceTransformer(nome)
+        _EMBED_MODELS[nome] = modelo
+    return modelo
 
 # Use your existing ia wrapper to call Gemini
 from agents.AgenteExtracao.ia_service import responder_pergunta_com_llm  # Gemini wrapper adaptado para respostas textuais
@@ -65,8 +92,11 @@ class ConsultaRagAgent:
         embed_model=None,
         enable_chroma: bool | None = None,
         api_key_resolver: Callable[[], str | None] | None = None,
+        leitura_session_factory: Callable[[], Session] | None = None,
     ):
         self._session_factory = session_factory
+        # Consultas só leem: podem ir para uma réplica; gravações seguem no session_factory
+        self._leitura_session_factory = leitura_session_factory or session_factory
         self.persist_agent = PersistenciaAgent(session_factory)
         self.chroma_dir = chroma_dir or os.getenv("CHROMA_DIR", "./_chromadb")
         self._chroma_client = chroma_client
@@ -258,7 +288,7 @@ class ConsultaRagAgent:
         try:
             # Lazy import: only load when actually needed
             import chromadb
-            from sentence_transformers import SentenceTransformer
+            import sentence_transformers  # noqa: F401 - loaded by carregar_modelo_embeddings
         except ImportError as e:
             print(f"ChromaDB ou SentenceTransformer não disponíveis: {e}")
             self._enable_chroma = False
@@ -268,7 +298,7 @@ class ConsultaRagAgent:
         persist_path.mkdir(parents=True, exist_ok=True)
 
         if self._embed_model is None:
-            self._embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+            self._embed_model = carregar_modelo_embeddings()
 
         persistent_client_cls = getattr(chromadb, "PersistentClient", None)
         if persistent_client_cls is not None:
@@ -294,11 +324,13 @@ class ConsultaRagAgent:
     def _build_summary_context(self, session: Session, limite: int = 5) -> str:
         resumo_partes: list[str] = []
 
+        # Resumos mantidos a cada gravação (database.rollups): nada aqui varre movimento_contas
+        total_classificacao = func.sum(ResumoDiarioClassificacao.total)
         classificacao_totais = (
-            session.query(Classificacao.descricao, func.sum(MovimentoContas.valor_total).label("total"))
-            .join(Classificacao.movimentos)
+            session.query(Classificacao.descricao, total_classificacao.label("total"))
+            .join(ResumoDiarioClassificacao, ResumoDiarioClassificacao.classificacao_id == Classificacao.id)
             .group_by(Classificacao.descricao)
-            .order_by(func.sum(MovimentoContas.valor_total).desc())
+            .order_by(total_classificacao.desc())
             .limit(limite)
             .all()
         )
@@ -311,11 +343,12 @@ class ConsultaRagAgent:
             if linhas:
                 resumo_partes.append("Classificacoes com maiores gastos:\n" + "\n".join(linhas))
 
+        total_fornecedor = func.sum(ResumoDiarioFornecedor.total)
         fornecedor_totais = (
-            session.query(Pessoas.razaosocial, func.sum(MovimentoContas.valor_total).label("total"))
-            .join(MovimentoContas, MovimentoContas.fornecedor_id == Pessoas.id)
+            session.query(Pessoas.razaosocial, total_fornecedor.label("total"))
+            .join(ResumoDiarioFornecedor, ResumoDiarioFornecedor.fornecedor_id == Pessoas.id)
             .group_by(Pessoas.razaosocial)
-            .order_by(func.sum(MovimentoContas.valor_total).desc())
+            .order_by(total_fornecedor.desc())
             .limit(limite)
             .all()
         )
@@ -329,14 +362,9 @@ class ConsultaRagAgent:
                 resumo_partes.append("Fornecedores mais onerosos:\n" + "\n".join(linhas))
 
         recorrentes = (
-            session.query(
-                MovimentoContas.descricao,
-                func.count(MovimentoContas.id).label("freq"),
-                func.sum(MovimentoContas.valor_total).label("total"),
-            )
-            .group_by(MovimentoContas.descricao)
-            .having(func.count(MovimentoContas.id) > 1)
-            .order_by(func.count(MovimentoContas.id).desc(), func.sum(MovimentoContas.valor_total).desc())
+            session.query(ResumoDescricao.descricao, ResumoDescricao.quantidade, ResumoDescricao.total)
+            .filter(ResumoDescricao.quantidade > 1)
+            .order_by(ResumoDescricao.quantidade.desc(), ResumoDescricao.total.desc())
             .limit(limite)
             .all()
         )
@@ -354,7 +382,7 @@ class ConsultaRagAgent:
     # ---------------- RAG Simples ----------------
     def _retrieve_data_simples(self, pergunta: str, limit: int = 10) -> str:
         """Executa uma query SQL direta e retorna um contexto textual"""
-        session: Session = self._session_factory()
+        session: Session = self._leitura_session_factory()
         try:
             fornecedor_alias = aliased(Pessoas)
             faturado_alias = aliased(Pessoas)
@@ -373,20 +401,18 @@ class ConsultaRagAgent:
                 if token in _STOP_WORDS or token in tokens:
                     continue
                 tokens.append(token)
-            filters = []
-            for token in tokens[:5]:  # limita tokens relevantes para evitar filtros excessivos
-                pattern = f"%{token}%"
-                filters.extend(
-                    [
-                        MovimentoContas.descricao.ilike(pattern),
-                        MovimentoContas.numero_nota_fiscal.ilike(pattern),
-                        fornecedor_alias.razaosocial.ilike(pattern),
-                        fornecedor_alias.fantasia.ilike(pattern),
-                        faturado_alias.razaosocial.ilike(pattern),
-                        faturado_alias.fantasia.ilike(pattern),
-                        class_alias.descricao.ilike(pattern),
-                    ]
-                )
+            # limita tokens relevantes para evitar filtros excessivos; basta um token casar
+            filters = search_terms_filter(
+                session.get_bind(),
+                tokens[:5],
+                MovimentoContas.descricao,
+                MovimentoContas.numero_nota_fiscal,
+                fornecedor_alias.razaosocial,
+                fornecedor_alias.fantasia,
+                faturado_alias.razaosocial,
+                faturado_alias.fantasia,
+                class_alias.descricao,
+            )
 
             stmt = base_stmt
             if filters:
@@ -453,7 +479,7 @@ class ConsultaRagAgent:
         if not pergunta:
             return None
         texto = pergunta.lower()
-        session: Session = self._session_factory()
+        session: Session = self._leitura_session_factory()
         try:
             for template in self._intent_templates:
                 if not self._matches_intent(texto, template):
@@ -534,17 +560,18 @@ class ConsultaRagAgent:
         minimo = self._extract_having_threshold(pergunta_original, 5)
         inicio_mes = self._start_of_current_month()
 
+        lancamentos = func.sum(ResumoDiarioFornecedor.quantidade)
         resultados = (
             session.query(
                 Pessoas.razaosocial,
-                func.count(MovimentoContas.id).label("total_lancamentos"),
-                func.sum(MovimentoContas.valor_total).label("total_valor"),
+                lancamentos.label("total_lancamentos"),
+                func.sum(ResumoDiarioFornecedor.total).label("total_valor"),
             )
-            .join(MovimentoContas, MovimentoContas.fornecedor_id == Pessoas.id)
-            .filter(MovimentoContas.data_emissao >= inicio_mes)
+            .join(ResumoDiarioFornecedor, ResumoDiarioFornecedor.fornecedor_id == Pessoas.id)
+            .filter(ResumoDiarioFornecedor.dia >= inicio_mes)
             .group_by(Pessoas.id)
-            .having(func.count(MovimentoContas.id) > minimo)
-            .order_by(func.count(MovimentoContas.id).desc())
+            .having(lancamentos > minimo)
+            .order_by(lancamentos.desc())
             .all()
         )
         if not resultados:
@@ -594,17 +621,15 @@ class ConsultaRagAgent:
         minimo = self._extract_currency_threshold(pergunta_original, 50000.0)
         inicio_trimestre = self._start_of_current_quarter()
 
+        total = func.sum(ResumoDiarioClassificacao.total)
         resultados = (
-            session.query(
-                Classificacao.descricao,
-                func.sum(MovimentoContas.valor_total).label("total"),
-            )
-            .join(Classificacao.movimentos)
+            session.query(Classificacao.descricao, total.label("total"))
+            .join(ResumoDiarioClassificacao, ResumoDiarioClassificacao.classificacao_id == Classificacao.id)
             .filter(Classificacao.tipo == "DESPESA")
-            .filter(MovimentoContas.data_emissao >= inicio_trimestre)
+            .filter(ResumoDiarioClassificacao.dia >= inicio_trimestre)
             .group_by(Classificacao.id)
-            .having(func.sum(MovimentoContas.valor_total) >= Decimal(str(minimo)))
-            .order_by(func.sum(MovimentoContas.valor_total).desc())
+            .having(total >= Decimal(str(minimo)))
+            .order_by(total.desc())
             .all()
         )
         if not resultados:
@@ -630,12 +655,15 @@ class ConsultaRagAgent:
         if mes is None or ano is None:
             return None
 
+        # Intervalo do mês em vez de extract(): funciona no SQLite e usa o índice de data_emissao
+        inicio = date(ano, mes, 1)
+        fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
         registros = (
             session.query(MovimentoContas)
             .filter(
                 MovimentoContas.tipo == "RECEBER",
-                func.extract("month", MovimentoContas.data_emissao) == mes,
-                func.extract("year", MovimentoContas.data_emissao) == ano,
+                MovimentoContas.data_emissao >= inicio,
+                MovimentoContas.data_emissao < fim,
             )
             .order_by(MovimentoContas.data_emissao.asc())
             .all()
@@ -678,7 +706,7 @@ class ConsultaRagAgent:
         if not pergunta:
             return ""
         texto = pergunta.lower()
-        session: Session = self._session_factory()
+        session: Session = self._leitura_session_factory()
         try:
             for template in self._semantic_templates:
                 if not self._matches_intent(texto, template):
@@ -703,18 +731,17 @@ class ConsultaRagAgent:
                 MovimentoContas.tipo == "PAGAR",
                 or_(
                     Classificacao.descricao == "MANUTENÇÃO E OPERAÇÃO",
-                    Classificacao.descricao.ilike("%MANUT%"),
-                    Classificacao.descricao.ilike("%OPERAÇÃO%"),
-                    MovimentoContas.descricao.ilike("%manut%"),
-                    MovimentoContas.descricao.ilike("%maquin%"),
+                    *search_terms_filter(session.get_bind(), ["manut", "operação"], Classificacao.descricao),
+                    *search_terms_filter(session.get_bind(), ["manut", "maquin"], MovimentoContas.descricao),
                 ),
             )
             .scalar()
         ) or Decimal("0")
 
+        # O numerador filtra pelo texto da descrição e fica na tabela base; o total vem do resumo
         total_geral = (
-            session.query(func.sum(MovimentoContas.valor_total))
-            .filter(MovimentoContas.data_emissao >= inicio, MovimentoContas.tipo == "PAGAR")
+            session.query(func.sum(ResumoDiarioFornecedor.total))
+            .filter(ResumoDiarioFornecedor.dia >= inicio, ResumoDiarioFornecedor.tipo == "PAGAR")
             .scalar()
         ) or Decimal("0")
 
@@ -737,20 +764,20 @@ class ConsultaRagAgent:
 
         filtros_class = or_(
             Classificacao.descricao == "INSUMOS AGRÍCOLAS",
-            Classificacao.descricao.ilike("%INSUMO%"),
+            *search_terms_filter(session.get_bind(), ["insumo"], Classificacao.descricao),
         )
 
         atual = (
-            session.query(func.sum(MovimentoContas.valor_total))
-            .join(MovimentoContas.classificacoes)
-            .filter(MovimentoContas.data_emissao.between(inicio_atual, fim_atual), filtros_class)
+            session.query(func.sum(ResumoDiarioClassificacao.total))
+            .join(Classificacao, ResumoDiarioClassificacao.classificacao_id == Classificacao.id)
+            .filter(ResumoDiarioClassificacao.dia.between(inicio_atual, fim_atual), filtros_class)
             .scalar()
         ) or Decimal("0")
 
         passado = (
-            session.query(func.sum(MovimentoContas.valor_total))
-            .join(MovimentoContas.classificacoes)
-            .filter(MovimentoContas.data_emissao.between(inicio_passado, fim_passado), filtros_class)
+            session.query(func.sum(ResumoDiarioClassificacao.total))
+            .join(Classificacao, ResumoDiarioClassificacao.classificacao_id == Classificacao.id)
+            .filter(ResumoDiarioClassificacao.dia.between(inicio_passado, fim_passado), filtros_class)
             .scalar()
         ) or Decimal("0")
 
@@ -820,13 +847,10 @@ class ConsultaRagAgent:
         filtros_class = or_(
             Classificacao.descricao == "LOGÍSTICA AGRÍCOLA",
             Classificacao.descricao == "SERVIÇOS OPERACIONAIS",
-            Classificacao.descricao.ilike("%LOGÍSTICA%"),
-            Classificacao.descricao.ilike("%LOGISTICA%"),
+            *search_terms_filter(session.get_bind(), ["logística", "logistica"], Classificacao.descricao),
         )
         filtros_desc = or_(
-            MovimentoContas.descricao.ilike("%frete%"),
-            MovimentoContas.descricao.ilike("%transporte%"),
-            MovimentoContas.descricao.ilike("%logist%"),
+            *search_terms_filter(session.get_bind(), ["frete", "transporte", "logist"], MovimentoContas.descricao)
         )
         resultados = (
             session.query(
@@ -936,7 +960,7 @@ class ConsultaRagAgent:
         """Varredura do banco para indexar textos no ChromaDB (executar manualmente)."""
         if not self._enable_chroma or self._chroma_client is None or self._embed_model is None:
             raise RuntimeError("ChromaDB ou sentence-transformers não disponíveis no ambiente.")
-        session = self._session_factory()
+        session = self._leitura_session_factory()
         try:
             rows = session.execute(select(MovimentoContas)).scalars().all()
             docs = []
@@ -1,18 +1,63 @@
 import os
+import atexit
+import base64
+import binascii
+import csv
+import hashlib
+import io
 import json
 import re
-from datetime import datetime
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
-
-from flask import Flask, flash, jsonify, redirect, render_template, request, session, url_for
-from sqlalchemy import or_
+from typing import Any
+
+from flask import (
+    Flask,
+    flash,
+    get_flashed_messages,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_template,
+    url_for,
+)
+from sqlalchemy import and_, delete, exists, func, insert, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, joinedload, selectinload
 from config.settings import GOOGLE_API_KEY, UPLOAD_FOLDER
 from agents.AgenteExtracao.parser_service import extrair_texto_pdf
 from agents.AgenteExtracao.ia_service import extrair_dados_com_llm
 from agents.AgenteExtracao.utils import gerar_parcela_padrao
+from agents.AgentePersistencia.extracoes import RegistroExtracoes
+from agents.AgentePersistencia.fila_gravacao import FilaCheia, FilaGravacao
+from agents.AgentePersistencia.importacao import ImportadorCadastros
 from agents.AgentePersistencia.processador import PersistenciaAgent
-from database.connection import SessionLocal
-from database.models import Classificacao, MovimentoContas, Pessoas
+from assets import init_assets
+from database.connection import ReplicaSessionLocal, SessionLocal
+from database.request_session import (
+    detach_request_session,
+    init_request_session,
+    mark_write,
+    read_session_factory,
+    request_read_session,
+    request_session,
+)
+from database.models import (
+    Classificacao,
+    MovimentoContas,
+    ParcelasContas,
+    Pessoas,
+    movimento_classificacao_association,
+)
+from database.rollups import track_movements
+from database.search import search_terms_filter
+from database.versioning import bump_table_versions, table_versions
+from monitoring import init_metrics, init_query_budget, observe_group_commit, observe_identity_cache
 
 
 # ✅ lazy import — agente de consulta RAG (only loaded when /consulta is accessed)
@@ -21,20 +66,57 @@ from database.models import Classificacao, MovimentoContas, Pessoas
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
+init_metrics(app)
+init_query_budget(app)
+init_request_session(app)
+init_assets(app)
 
 def _resolve_api_key() -> str | None:
     return session.get("gemini_api_key") or GOOGLE_API_KEY
 
 persistencia_agent = PersistenciaAgent()
-_consulta_agent = None  # Lazy-loaded on first use
+persistencia_agent.cache.observador = observe_identity_cache
+importador_cadastros = ImportadorCadastros()
+registro_extracoes = RegistroExtracoes()
+consulta_agent = None  # Lazy-loaded on first use
+fila_gravacao = None  # Criada no primeiro lançamento de cada worker quando FILA_GRAVACAO=1
+_fila_gravacao_lock = threading.Lock()
+_FILA_GRAVACAO = os.getenv("FILA_GRAVACAO", "0") == "1"
+_FILA_GRAVACAO_TIMEOUT = float(os.getenv("FILA_GRAVACAO_TIMEOUT", "30"))
+
+def _sessao():
+    """Sessão do banco da requisição atual (fechada no teardown do Flask)."""
+    return request_session(SessionLocal)
+
+def _sessao_leitura():
+    """Sessão só de leitura: réplica quando configurada, primário logo após uma escrita do usuário."""
+    return request_read_session(SessionLocal, ReplicaSessionLocal)
+
+def _sessao_consulta():
+    """Sessão avulsa das consultas do RAG, roteada como :func:`_sessao_leitura`."""
+    return read_session_factory(SessionLocal, ReplicaSessionLocal)()
+
+def _get_fila_gravacao() -> FilaGravacao:
+    """Fila de gravação em grupo deste processo (a thread não sobrevive ao fork do preload)."""
+    global fila_gravacao
+    with _fila_gravacao_lock:
+        if fila_gravacao is None:
+            fila = FilaGravacao(persistencia_agent)
+            fila.observador = observe_group_commit
+            atexit.register(fila.encerrar, _FILA_GRAVACAO_TIMEOUT)
+            fila_gravacao = fila
+    return fila_gravacao
 
 def _get_consulta_agent():
     """Lazy load ConsultaRagAgent on first access."""
-    global _consulta_agent
-    if _consulta_agent is None:
+    global consulta_agent
+    if consulta_agent is None:
         from agents.consulta_rag.processador import ConsultaRagAgent
-        _consulta_agent = ConsultaRagAgent(api_key_resolver=_resolve_api_key)
-    return _consulta_agent
+        consulta_agent = ConsultaRagAgent(
+            leitura_session_factory=_sessao_consulta,
+            api_key_resolver=_resolve_api_key,
+        )
+    return consulta_agent
     
 def _parse_decimal(valor: str | None) -> Decimal | None:
     if not valor:
@@ -117,6 +199,15 @@ def extrair():
     if file.filename == '' or not file.filename.lower().endswith('.pdf'):
         return {"error": "Arquivo inválido"}, 400
 
+    # "reextrair" força uma nova chamada ao LLM mesmo para documentos já conhecidos
+    reextrair = request.form.get('reextrair', '').lower() in {'1', 'true', 'on', 'sim'}
+    conteudo = file.read()
+    hash_conteudo = registro_extracoes.hash_conteudo(conteudo)
+    if not reextrair:
+        anterior = registro_extracoes.buscar(hash_conteudo=hash_conteudo)
+        if anterior:
+            return _resposta_extracao(anterior["dados"], anterior, reaproveitada=True)
+
     api_key = _resolve_api_key()
     if not api_key:
         return {
@@ -124,10 +215,16 @@ def extrair():
             "detalhes": "Defina GOOGLE_API_KEY ou informe sua chave na interface.",
         }, 400
 
-    texto_pdf = extrair_texto_pdf(file)
+    texto_pdf = extrair_texto_pdf(io.BytesIO(conteudo))
     if not texto_pdf:
         return {"error": "Não foi possível extrair texto do PDF"}, 500
 
+    chave_no_texto = registro_extracoes.localizar_chave_no_texto(texto_pdf)
+    if chave_no_texto and not reextrair:
+        anterior = registro_extracoes.buscar(chave_acesso=chave_no_texto)
+        if anterior:
+            return _resposta_extracao(anterior["dados"], anterior, reaproveitada=True)
+
     try:
         raw_json_str = extrair_dados_com_llm(texto_pdf, api_key=api_key)
     except RuntimeError as exc:
@@ -143,9 +240,27 @@ def extrair():
 
     dados_json = gerar_parcela_padrao(dados_json)
 
-    verificacao = persistencia_agent.verificar_entidades(dados_json)
-    dados_json["_verificacao"] = verificacao
+    chave_acesso = registro_extracoes.normalizar_chave(dados_json.get("chaveAcesso")) or chave_no_texto
+    extracao = registro_extracoes.registrar(hash_conteudo, chave_acesso, dados_json)
+    return _resposta_extracao(dados_json, extracao, reaproveitada=False)
+
 
+_EXTRACOES_PENDENTES_MAX = 20
+
+
+def _resposta_extracao(dados_json: dict, extracao: dict, *, reaproveitada: bool) -> dict:
+    """Anexa a verificação de entidades e os dados da extração registrada."""
+    dados_json["_verificacao"] = persistencia_agent.verificar_entidades(dados_json)
+    dados_json["_extracao"] = {
+        "id": extracao["id"],
+        "reaproveitada": reaproveitada,
+        "movimento_id": extracao.get("movimento_id"),
+        "criado_em": extracao.get("criado_em"),
+    }
+    if extracao.get("movimento_id") is None:
+        # Só as extrações entregues a este navegador podem ser vinculadas no lançamento
+        pendentes = [i for i in session.get("extracoes_pendentes", []) if i != extracao["id"]]
+        session["extracoes_pendentes"] = (pendentes + [extracao["id"]])[-_EXTRACOES_PENDENTES_MAX:]
     return dados_json
 
 
@@ -167,10 +282,32 @@ def lancar_conta():
         return {"error": "Dados ausentes para lançamento"}, 400
 
     try:
-        resultado_persistencia = persistencia_agent.lancar_conta_pagar(dados_para_persistir)
+        if _FILA_GRAVACAO:
+            resultado_persistencia = _get_fila_gravacao().lancar(dados_para_persistir, timeout=_FILA_GRAVACAO_TIMEOUT)
+        else:
+            resultado_persistencia = persistencia_agent.lancar_conta_pagar(dados_para_persistir)
+    except FilaCheia:
+        return {"error": "Fila de gravação cheia, tente novamente em instantes"}, 503
+    except FuturesTimeoutError:
+        # A nota continua na fila e será gravada; reenviar é seguro (upsert por nota e
+        # fornecedor) e vincula a extração, que segue pendente nesta sessão
+        mark_write()
+        return {
+            "mensagem": "Lançamento na fila de gravação, ainda não confirmado",
+            "status": "pendente",
+        }, 202
     except Exception as exc:
         print(f"Erro ao persistir dados: {exc}")
         return {"error": "Falha ao persistir dados", "detalhes": str(exc)}, 500
+    # A fila grava em outra thread, fora do alcance do registro automático de escritas
+    mark_write()
+
+    # O id vem do cliente: só vale o de uma extração devolvida por /extrair nesta sessão
+    extracao_id = (dados_json.get("_extracao") or {}).get("id")
+    pendentes = session.get("extracoes_pendentes", [])
+    if isinstance(extracao_id, int) and extracao_id in pendentes:
+        registro_extracoes.vincular_movimento(extracao_id, resultado_persistencia["movimento_id"])
+        session["extracoes_pendentes"] = [i for i in pendentes if i != extracao_id]
 
     return jsonify({
         "mensagem": "Conta lançada com sucesso",
@@ -215,104 +352,307 @@ def consultar_rag():
     return jsonify({"resposta": resposta})
 
 
+# -----------------------
+# LISTAGENS - filtro, ordenação e serialização compartilhados
+# -----------------------
+@dataclass(frozen=True)
+class _Listagem:
+    """Consulta filtrada e ordenação resolvidas a partir da query string."""
+
+    query: Any
+    search: str
+    sort_field: str
+    sort_direction: str
+    sort_column: Any
+    id_column: Any
+    id_desc: bool
+    filtros: dict = field(default_factory=dict)
+
+
+_CONTAS_SORT = {
+    'data': MovimentoContas.data_emissao,
+    'valor': MovimentoContas.valor_total,
+    'descricao': MovimentoContas.descricao,
+    'nota': MovimentoContas.numero_nota_fiscal,
+}
+
+_PESSOAS_SORT = {
+    'razao': Pessoas.razaosocial,
+    'fantasia': Pessoas.fantasia,
+    'documento': Pessoas.documento,
+    'tipo': Pessoas.tipo,
+}
+
+_CLASSIFICACOES_SORT = {
+    'descricao': Classificacao.descricao,
+    'tipo': Classificacao.tipo,
+}
+
+
+def _resolver_ordenacao(args, sort_map: dict, padrao: str, direcao_padrao: str) -> tuple[str, str]:
+    sort_field = args.get('sort') or padrao
+    if sort_field not in sort_map:
+        sort_field = padrao
+    outra_direcao = 'asc' if direcao_padrao == 'desc' else 'desc'
+    sort_direction = outra_direcao if args.get('dir') == outra_direcao else direcao_padrao
+    return sort_field, sort_direction
+
+
+def _filtrar_contas(session, args, *, somente_ativas: bool = True) -> _Listagem:
+    search = (args.get('q') or '').strip()
+    sort_field, sort_direction = _resolver_ordenacao(args, _CONTAS_SORT, 'data', 'desc')
+    query = session.query(MovimentoContas)
+    if somente_ativas:
+        query = query.filter(MovimentoContas.status == 'ATIVO')
+    query = query.filter(
+        *search_terms_filter(
+            session.get_bind(),
+            _tokenize_search(search),
+            MovimentoContas.descricao,
+            MovimentoContas.numero_nota_fiscal,
+        )
+    )
+    return _Listagem(
+        query=query,
+        search=search,
+        sort_field=sort_field,
+        sort_direction=sort_direction,
+        sort_column=_CONTAS_SORT[sort_field],
+        id_column=MovimentoContas.id,
+        id_desc=True,
+    )
+
+
+def _filtrar_pessoas(session, args) -> _Listagem:
+    search = (args.get('q') or '').strip()
+    categoria = (args.get('categoria') or 'TODOS').upper()
+    sort_field, sort_direction = _resolver_ordenacao(args, _PESSOAS_SORT, 'razao', 'asc')
+    query = session.query(Pessoas).filter(Pessoas.status == 'ATIVO')
+    if categoria and categoria != 'TODOS':
+        query = query.filter(Pessoas.tipo == categoria)
+    query = query.filter(
+        *search_terms_filter(
+            session.get_bind(),
+            _tokenize_search(search),
+            Pessoas.razaosocial,
+            Pessoas.fantasia,
+            Pessoas.documento,
+        )
+    )
+    return _Listagem(
+        query=query,
+        search=search,
+        sort_field=sort_field,
+        sort_direction=sort_direction,
+        sort_column=_PESSOAS_SORT[sort_field],
+        id_column=Pessoas.id,
+        id_desc=sort_direction == 'desc',
+        filtros={'categoria': categoria},
+    )
+
+
+def _filtrar_classificacoes(session, args) -> _Listagem:
+    search = (args.get('q') or '').strip()
+    tipo_filtro = (args.get('tipo') or 'TODOS').upper()
+    sort_field, sort_direction = _resolver_ordenacao(args, _CLASSIFICACOES_SORT, 'descricao', 'asc')
+    query = session.query(Classificacao).filter(Classificacao.status == 'ATIVO')
+    if tipo_filtro != 'TODOS':
+        query = query.filter(Classificacao.tipo == tipo_filtro)
+    query = query.filter(
+        *search_terms_filter(session.get_bind(), _tokenize_search(search), Classificacao.descricao)
+    )
+    return _Listagem(
+        query=query,
+        search=search,
+        sort_field=sort_field,
+        sort_direction=sort_direction,
+        sort_column=_CLASSIFICACOES_SORT[sort_field],
+        id_column=Classificacao.id,
+        id_desc=sort_direction == 'desc',
+        filtros={'tipo': tipo_filtro},
+    )
+
+
+def _com_relacoes_conta(query):
+    """Carrega fornecedor, faturado e classificações sem N+1 na serialização."""
+    return query.options(
+        joinedload(MovimentoContas.fornecedor),
+        joinedload(MovimentoContas.faturado),
+        selectinload(MovimentoContas.classificacoes),
+    )
+
+
+def _ordenar_listagem(listagem: _Listagem):
+    """Ordena pela coluna escolhida (nulos por último) com o id como desempate."""
+    coluna = listagem.sort_column
+    ordem = coluna.asc() if listagem.sort_direction == 'asc' else coluna.desc()
+    ordem_id = listagem.id_column.desc() if listagem.id_desc else listagem.id_column.asc()
+    return listagem.query.order_by(ordem.nulls_last(), ordem_id)
+
+
+def _serializar_conta(movimento: MovimentoContas) -> dict:
+    return {
+        "id": movimento.id,
+        "descricao": movimento.descricao or "",
+        "tipo": movimento.tipo or "",
+        "numero_nota_fiscal": movimento.numero_nota_fiscal or "",
+        "data_emissao": movimento.data_emissao.isoformat() if movimento.data_emissao else "",
+        "data_emissao_br": _format_date_br(movimento.data_emissao),
+        "valor_total": f"{float(movimento.valor_total or 0):.2f}",
+        "valor_total_display": _format_currency(movimento.valor_total),
+        "status": movimento.status or "",
+        "fornecedor_id": movimento.fornecedor_id,
+        "fornecedor_nome": (movimento.fornecedor.razaosocial or movimento.fornecedor.fantasia)
+        if movimento.fornecedor
+        else "",
+        "faturado_id": movimento.faturado_id,
+        "faturado_nome": (movimento.faturado.razaosocial or movimento.faturado.fantasia)
+        if movimento.faturado
+        else "",
+        "classificacao_ids": [c.id for c in movimento.classificacoes],
+        "classificacao_resumo": ", ".join(
+            [c.descricao for c in movimento.classificacoes if c.descricao]
+        )
+        or "Sem classificação",
+    }
+
+
+def _serializar_pessoa(pessoa: Pessoas) -> dict:
+    return {
+        "id": pessoa.id,
+        "tipo": (pessoa.tipo or '').upper(),
+        "razaosocial": pessoa.razaosocial or "",
+        "fantasia": pessoa.fantasia or "",
+        "documento": pessoa.documento or "",
+        "status": pessoa.status or "",
+    }
+
+
+def _serializar_classificacao(item: Classificacao) -> dict:
+    return {
+        "id": item.id,
+        "tipo": (item.tipo or '').upper(),
+        "descricao": item.descricao or "",
+        "status": item.status or "",
+    }
+
+
+_LISTAGEM_STREAMING = os.getenv("LISTAGEM_STREAMING", "1") == "1"
+_LISTAGEM_LOTE = int(os.getenv("LISTAGEM_LOTE", "500"))
+_LISTAGEM_BLOCO_HTML = 16 * 1024
+
+
+def _linhas_listagem(query, serializar):
+    """Executa a consulta agora e serializa os registros conforme são lidos, em lotes de ``_LISTAGEM_LOTE``."""
+    # Estilo 2.0: o Query legado exige unique() com joinedload, o que impede yield_per
+    resultado = query.session.execute(query.statement.execution_options(yield_per=_LISTAGEM_LOTE))
+    return (serializar(registro) for registro in resultado.scalars())
+
+
+def _em_blocos(partes, ao_terminar):
+    """Agrupa os pedaços do template em blocos, evitando uma escrita por tag."""
+    buffer: list[str] = []
+    tamanho = 0
+    try:
+        for parte in partes:
+            buffer.append(parte)
+            tamanho += len(parte)
+            if tamanho >= _LISTAGEM_BLOCO_HTML:
+                yield ''.join(buffer)
+                buffer, tamanho = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        ao_terminar()
+
+
+def _renderizar_listagem(template: str, chave: str, linhas, **contexto):
+    """Renderiza uma tela de listagem enviando as linhas conforme saem do banco.
+
+    O cabeçalho da página chega ao navegador antes da última linha ser lida e
+    a memória não cresce com o tamanho do resultado. ``LISTAGEM_STREAMING=0``
+    volta para a renderização completa em memória.
+    """
+    if not _LISTAGEM_STREAMING:
+        return render_template(template, **{chave: list(linhas)}, **contexto)
+    # O cookie de sessão é gravado antes do corpo; as mensagens precisam sair dele agora
+    get_flashed_messages(with_categories=True)
+    # O corpo é gerado depois do teardown da requisição: a sessão (e o cursor) passam a ser do gerador
+    sessao = detach_request_session()
+    partes = stream_template(template, **{chave: linhas}, **contexto)
+    return app.response_class(
+        _em_blocos(partes, sessao.close if sessao is not None else (lambda: None)),
+        mimetype='text/html',
+    )
+
+
+def _importar_csv(importar, destino: str):
+    """Executa uma importação em massa a partir do CSV enviado em ``arquivo``."""
+    arquivo = request.files.get('arquivo')
+    if arquivo is None or not arquivo.filename:
+        flash('Selecione um arquivo CSV para importar.', 'error')
+        return redirect(url_for(destino))
+    try:
+        conteudo = io.StringIO(arquivo.read().decode('utf-8-sig'), newline='')
+        resultado = importar(conteudo)
+    except UnicodeDecodeError:
+        flash('O arquivo deve estar codificado em UTF-8.', 'error')
+    except Exception as exc:
+        flash(f'Erro ao importar arquivo: {exc}', 'error')
+    else:
+        flash(
+            f"Importação concluída: {resultado['inseridos']} inseridos, "
+            f"{resultado['atualizados']} atualizados, {resultado['rejeitados']} rejeitados.",
+            'success',
+        )
+    return redirect(url_for(destino))
+
+
 # -----------------------
 # CRUD - CONTAS
 # -----------------------
 @app.route('/contas', methods=['GET'])
 def contas_page():
-    session = SessionLocal()
-    search = (request.args.get('q') or '').strip()
-    terms = _tokenize_search(search)
-    sort_field = request.args.get('sort') or 'data'
-    sort_direction = request.args.get('dir') or 'desc'
-    contas = []
+    session = _sessao_leitura()
     pessoas_opts = []
     class_opts = []
-    sort_map = {
-        'data': MovimentoContas.data_emissao,
-        'valor': MovimentoContas.valor_total,
-        'descricao': MovimentoContas.descricao,
-        'nota': MovimentoContas.numero_nota_fiscal,
-    }
-    sort_column = sort_map.get(sort_field, sort_map['data'])
-    try:
-        query = session.query(MovimentoContas).filter(MovimentoContas.status == 'ATIVO')
-        for term in terms:
-            pattern = f"%{term}%"
-            query = query.filter(
-                or_(
-                    MovimentoContas.descricao.ilike(pattern),
-                    MovimentoContas.numero_nota_fiscal.ilike(pattern),
-                )
-            )
-
-        if sort_direction == 'asc':
-            query = query.order_by(sort_column.asc(), MovimentoContas.id.desc())
-        else:
-            query = query.order_by(sort_column.desc(), MovimentoContas.id.desc())
-
-        registros = query.all()
-        for movimento in registros:
-            contas.append({
-                "id": movimento.id,
-                "descricao": movimento.descricao or "",
-                "tipo": movimento.tipo or "",
-                "numero_nota_fiscal": movimento.numero_nota_fiscal or "",
-                "data_emissao": movimento.data_emissao.isoformat() if movimento.data_emissao else "",
-                "data_emissao_br": _format_date_br(movimento.data_emissao),
-                "valor_total": f"{float(movimento.valor_total or 0):.2f}",
-                "valor_total_display": _format_currency(movimento.valor_total),
-                "status": movimento.status or "",
-                "fornecedor_id": movimento.fornecedor_id,
-                "fornecedor_nome": (movimento.fornecedor.razaosocial or movimento.fornecedor.fantasia)
-                if movimento.fornecedor
-                else "",
-                "faturado_id": movimento.faturado_id,
-                "faturado_nome": (movimento.faturado.razaosocial or movimento.faturado.fantasia)
-                if movimento.faturado
-                else "",
-                "classificacao_ids": [c.id for c in movimento.classificacoes],
-                "classificacao_resumo": ", ".join(
-                    [c.descricao for c in movimento.classificacoes if c.descricao]
-                )
-                or "Sem classificação",
-            })
-
-        pessoas_query = (
-            session.query(Pessoas)
-            .filter(Pessoas.status == 'ATIVO')
-            .order_by(Pessoas.razaosocial.asc(), Pessoas.fantasia.asc())
-            .all()
-        )
-        for pessoa in pessoas_query:
-            pessoas_opts.append({
-                "id": pessoa.id,
-                "nome": pessoa.razaosocial or pessoa.fantasia or f"Pessoa {pessoa.id}",
-                "tipo": (pessoa.tipo or '').upper(),
-            })
-
-        class_query = (
-            session.query(Classificacao)
-            .filter(Classificacao.status == 'ATIVO')
-            .order_by(Classificacao.descricao.asc())
-            .all()
-        )
-        for item in class_query:
-            class_opts.append({
-                "id": item.id,
-                "descricao": item.descricao or f"Classificação {item.id}",
-            })
-    finally:
-        session.close()
+    listagem = _filtrar_contas(session, request.args)
+    contas = _linhas_listagem(_com_relacoes_conta(_ordenar_listagem(listagem)), _serializar_conta)
+
+    pessoas_query = (
+        session.query(Pessoas)
+        .filter(Pessoas.status == 'ATIVO')
+        .order_by(Pessoas.razaosocial.asc(), Pessoas.fantasia.asc())
+        .all()
+    )
+    for pessoa in pessoas_query:
+        pessoas_opts.append({
+            "id": pessoa.id,
+            "nome": pessoa.razaosocial or pessoa.fantasia or f"Pessoa {pessoa.id}",
+            "tipo": (pessoa.tipo or '').upper(),
+        })
+
+    class_query = (
+        session.query(Classificacao)
+        .filter(Classificacao.status == 'ATIVO')
+        .order_by(Classificacao.descricao.asc())
+        .all()
+    )
+    for item in class_query:
+        class_opts.append({
+            "id": item.id,
+            "descricao": item.descricao or f"Classificação {item.id}",
+        })
 
-    return render_template(
+    return _renderizar_listagem(
         'contas.html',
-        contas=contas,
+        'contas',
+        contas,
         pessoas=pessoas_opts,
         classificacoes=class_opts,
-        search_term=search,
-        sort_field=sort_field if sort_field in sort_map else 'data',
-        sort_direction='asc' if sort_direction == 'asc' else 'desc',
+        search_term=listagem.search,
+        sort_field=listagem.sort_field,
+        sort_direction=listagem.sort_direction,
     )
 
 
@@ -320,7 +660,7 @@ def contas_page():
 def salvar_conta():
     form = request.form
     conta_id = form.get('id')
-    session = SessionLocal()
+    session = _sessao()
     try:
         if conta_id:
             movimento = session.get(MovimentoContas, int(conta_id))
@@ -358,15 +698,13 @@ def salvar_conta():
     except Exception as exc:
         session.rollback()
         flash(f'Erro ao salvar conta: {exc}', 'error')
-    finally:
-        session.close()
 
     return redirect(url_for('contas_page'))
 
 
 @app.route('/contas/<int:conta_id>/excluir', methods=['POST'])
 def excluir_conta(conta_id: int):
-    session = SessionLocal()
+    session = _sessao()
     try:
         movimento = session.get(MovimentoContas, conta_id)
         if not movimento:
@@ -378,71 +716,264 @@ def excluir_conta(conta_id: int):
     except Exception as exc:
         session.rollback()
         flash(f'Erro ao excluir conta: {exc}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('contas_page'))
 
 
+_ACOES_LOTE_CONTAS = {'status', 'classificar', 'fornecedor'}
+
+
+def _atualizar_contas_em_lote(session, acao: str, ids: list[int], form) -> int:
+    """Aplica ``acao`` a todas as contas de ``ids`` com uma instrução por operação."""
+    if acao == 'status':
+        status = (form.get('status') or '').upper()
+        if status not in {'ATIVO', 'INATIVO'}:
+            raise ValueError('Status inválido.')
+        resultado = session.execute(
+            update(MovimentoContas)
+            .where(MovimentoContas.id.in_(ids))
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        tabelas = [MovimentoContas.__tablename__]
+    elif acao == 'fornecedor':
+        fornecedor_id = form.get('fornecedor_id', type=int)
+        if fornecedor_id is None or session.get(Pessoas, fornecedor_id) is None:
+            raise ValueError('Fornecedor não encontrado.')
+        with track_movements(session, ids):
+            resultado = session.execute(
+                update(MovimentoContas)
+                .where(MovimentoContas.id.in_(ids))
+                .values(fornecedor_id=fornecedor_id)
+                .execution_options(synchronize_session=False)
+            )
+        tabelas = [MovimentoContas.__tablename__]
+    else:
+        classificacao_id = form.get('classificacao_id', type=int)
+        if classificacao_id is None or session.get(Classificacao, classificacao_id) is None:
+            raise ValueError('Classificação não encontrada.')
+        assoc = movimento_classificacao_association
+        conta_col = assoc.c.MovimentoContas_idMovimentoContas
+        class_col = assoc.c.Classificacao_idClassificacao
+        with track_movements(session, ids):
+            if form.get('modo') == 'substituir':
+                session.execute(delete(assoc).where(conta_col.in_(ids)))
+            resultado = session.execute(
+                insert(assoc).from_select(
+                    [conta_col, class_col],
+                    select(MovimentoContas.id, literal(classificacao_id))
+                    .where(MovimentoContas.id.in_(ids))
+                    .where(~exists().where(conta_col == MovimentoContas.id, class_col == classificacao_id)),
+                )
+            )
+        tabelas = [assoc.name]
+
+    # UPDATE/INSERT em massa não passam pelo flush que atualiza tabela_versoes
+    # (nem pelo que mantém os resumos do RAG, daí o track_movements acima)
+    bump_table_versions(session, tabelas)
+    return resultado.rowcount
+
+
+@app.route('/contas/lote', methods=['POST'])
+def contas_em_lote():
+    form = request.form
+    acao = form.get('acao')
+    destino = url_for('contas_page', q=form.get('q') or None, sort=form.get('sort') or None, dir=form.get('dir') or None)
+    ids = sorted({int(cid) for cid in form.getlist('ids') if cid.isdigit()})
+    if acao not in _ACOES_LOTE_CONTAS:
+        flash('Ação em lote inválida.', 'error')
+        return redirect(destino)
+    if not ids:
+        flash('Selecione ao menos uma conta.', 'error')
+        return redirect(destino)
+
+    session = _sessao()
+    try:
+        afetadas = _atualizar_contas_em_lote(session, acao, ids, form)
+        session.commit()
+        flash(f'{afetadas} de {len(ids)} conta(s) atualizada(s).', 'success')
+    except ValueError as exc:
+        session.rollback()
+        flash(str(exc), 'error')
+    except Exception as exc:
+        session.rollback()
+        flash(f'Erro na ação em lote: {exc}', 'error')
+    return redirect(destino)
+
+
+_EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "2000"))
+_EXPORTACAO_CABECALHO = [
+    "id",
+    "tipo",
+    "numero_nota_fiscal",
+    "data_emissao",
+    "descricao",
+    "status",
+    "valor_total",
+    "fornecedor_id",
+    "fornecedor_nome",
+    "faturado_id",
+    "faturado_nome",
+    "classificacoes",
+    "parcelas",
+]
+
+
+def _linhas_exportacao(session, query):
+    """Percorre a consulta com cursor no servidor, um lote por vez.
+
+    Classificações e parcelas de cada lote saem em duas consultas ``IN``; nada
+    além do lote corrente fica em memória.
+    """
+    resultado = session.execute(query.statement, execution_options={"yield_per": _EXPORTACAO_LOTE})
+    for lote in resultado.partitions():
+        ids = [linha.id for linha in lote]
+
+        classificacoes: dict[int, list[str]] = {}
+        for movimento_id, descricao in session.execute(
+            select(movimento_classificacao_association.c.MovimentoContas_idMovimentoContas, Classificacao.descricao)
+            .join(
+                Classificacao,
+                Classificacao.id == movimento_classificacao_association.c.Classificacao_idClassificacao,
+            )
+            .where(movimento_classificacao_association.c.MovimentoContas_idMovimentoContas.in_(ids))
+            .order_by(Classificacao.descricao)
+        ):
+            classificacoes.setdefault(movimento_id, []).append(descricao or "")
+
+        parcelas: dict[int, list[str]] = {}
+        for parcela in session.execute(
+            select(
+                ParcelasContas.movimento_id,
+                ParcelasContas.identificacao,
+                ParcelasContas.data_vencimento,
+                ParcelasContas.valor_parcela,
+                ParcelasContas.valor_saldo,
+                ParcelasContas.status_parcela,
+            )
+            .where(ParcelasContas.movimento_id.in_(ids))
+            .order_by(ParcelasContas.movimento_id, ParcelasContas.data_vencimento, ParcelasContas.id)
+        ):
+            parcelas.setdefault(parcela.movimento_id, []).append(
+                "|".join(
+                    str(valor) if valor is not None else ""
+                    for valor in (
+                        parcela.identificacao,
+                        parcela.data_vencimento,
+                        parcela.valor_parcela,
+                        parcela.valor_saldo,
+                        parcela.status_parcela,
+                    )
+                )
+            )
+
+        yield [
+            [
+                linha.id,
+                linha.tipo or "",
+                linha.numero_nota_fiscal or "",
+                linha.data_emissao.isoformat() if linha.data_emissao else "",
+                linha.descricao or "",
+                linha.status or "",
+                linha.valor_total if linha.valor_total is not None else "",
+                linha.fornecedor_id or "",
+                linha.fornecedor_nome or "",
+                linha.faturado_id or "",
+                linha.faturado_nome or "",
+                ", ".join(classificacoes.get(linha.id, [])),
+                "; ".join(parcelas.get(linha.id, [])),
+            ]
+            for linha in lote
+        ]
+
+
+@app.route('/contas/exportar.csv', methods=['GET'])
+def exportar_contas():
+    """Exporta os movimentos em CSV, escrito de forma incremental.
+
+    Aceita os filtros da tela de contas (``q``, ``sort``, ``dir``) e ainda
+    ``inicio``/``fim`` (data de emissão) e ``status=TODOS`` para incluir inativas.
+    """
+    args = request.args.copy()
+    inicio = _parse_date(args.get('inicio'))
+    fim = _parse_date(args.get('fim'))
+    somente_ativas = (args.get('status') or 'ATIVO').upper() != 'TODOS'
+    # Decidido ainda na requisição: o corpo é gerado depois, sem acesso ao cookie
+    fabrica = read_session_factory(SessionLocal, ReplicaSessionLocal)
+
+    def gerar():
+        session = fabrica()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        try:
+            writer.writerow(_EXPORTACAO_CABECALHO)
+            listagem = _filtrar_contas(session, args, somente_ativas=somente_ativas)
+            query = listagem.query
+            if inicio:
+                query = query.filter(MovimentoContas.data_emissao >= inicio)
+            if fim:
+                query = query.filter(MovimentoContas.data_emissao <= fim)
+
+            fornecedor = aliased(Pessoas)
+            faturado = aliased(Pessoas)
+            query = (
+                _ordenar_listagem(replace(listagem, query=query))
+                .outerjoin(fornecedor, MovimentoContas.fornecedor_id == fornecedor.id)
+                .outerjoin(faturado, MovimentoContas.faturado_id == faturado.id)
+                .with_entities(
+                    MovimentoContas.id,
+                    MovimentoContas.tipo,
+                    MovimentoContas.numero_nota_fiscal,
+                    MovimentoContas.data_emissao,
+                    MovimentoContas.descricao,
+                    MovimentoContas.status,
+                    MovimentoContas.valor_total,
+                    MovimentoContas.fornecedor_id,
+                    func.coalesce(fornecedor.razaosocial, fornecedor.fantasia).label("fornecedor_nome"),
+                    MovimentoContas.faturado_id,
+                    func.coalesce(faturado.razaosocial, faturado.fantasia).label("faturado_nome"),
+                )
+            )
+
+            for linhas in _linhas_exportacao(session, query):
+                writer.writerows(linhas)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            session.close()
+
+    nome_arquivo = f"movimentos_{date.today().isoformat()}.csv"
+    return app.response_class(
+        gerar(),
+        mimetype='text/csv',
+        headers={
+            "Content-Disposition": f'attachment; filename="{nome_arquivo}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 # -----------------------
 # CRUD - PESSOAS
 # -----------------------
 @app.route('/pessoas', methods=['GET'])
 def pessoas_page():
-    search = (request.args.get('q') or '').strip()
-    terms = _tokenize_search(search)
-    categoria = (request.args.get('categoria') or 'TODOS').upper()
-    sort_field = request.args.get('sort') or 'razao'
-    sort_direction = request.args.get('dir') or 'asc'
-    session = SessionLocal()
-    pessoas = []
-    sort_map = {
-        'razao': Pessoas.razaosocial,
-        'fantasia': Pessoas.fantasia,
-        'documento': Pessoas.documento,
-        'tipo': Pessoas.tipo,
-    }
-    sort_column = sort_map.get(sort_field, sort_map['razao'])
-    try:
-        query = session.query(Pessoas).filter(Pessoas.status == 'ATIVO')
-        if categoria and categoria != 'TODOS':
-            query = query.filter(Pessoas.tipo == categoria)
-        for term in terms:
-            pattern = f"%{term}%"
-            query = query.filter(
-                or_(
-                    Pessoas.razaosocial.ilike(pattern),
-                    Pessoas.fantasia.ilike(pattern),
-                    Pessoas.documento.ilike(pattern),
-                )
-            )
-
-        if sort_direction == 'desc':
-            query = query.order_by(sort_column.desc(), Pessoas.id.desc())
-        else:
-            query = query.order_by(sort_column.asc(), Pessoas.id.asc())
-
-        registros = query.all()
-        for pessoa in registros:
-            pessoas.append({
-                "id": pessoa.id,
-                "tipo": (pessoa.tipo or '').upper(),
-                "razaosocial": pessoa.razaosocial or "",
-                "fantasia": pessoa.fantasia or "",
-                "documento": pessoa.documento or "",
-                "status": pessoa.status or "",
-            })
-    finally:
-        session.close()
+    session = _sessao_leitura()
+    listagem = _filtrar_pessoas(session, request.args)
+    pessoas = _linhas_listagem(_ordenar_listagem(listagem), _serializar_pessoa)
 
     categorias = ['TODOS', 'FORNECEDOR', 'CLIENTE', 'FATURADO']
-    return render_template(
+    return _renderizar_listagem(
         'pessoas.html',
-        pessoas=pessoas,
-        search_term=search,
-        categoria=categoria,
+        'pessoas',
+        pessoas,
+        search_term=listagem.search,
+        categoria=listagem.filtros['categoria'],
         categorias=categorias,
-        sort_field=sort_field if sort_field in sort_map else 'razao',
-        sort_direction='desc' if sort_direction == 'desc' else 'asc',
+        sort_field=listagem.sort_field,
+        sort_direction=listagem.sort_direction,
     )
 
 
@@ -450,7 +981,7 @@ def pessoas_page():
 def salvar_pessoa():
     form = request.form
     pessoa_id = form.get('id')
-    session = SessionLocal()
+    session = _sessao()
     try:
         if pessoa_id:
             pessoa = session.get(Pessoas, int(pessoa_id))
@@ -474,18 +1005,24 @@ def salvar_pessoa():
 
         session.commit()
         flash('Pessoa atualizada com sucesso.' if pessoa_id else 'Pessoa criada com sucesso.', 'success')
+    except IntegrityError:
+        session.rollback()
+        flash('Já existe uma pessoa cadastrada com este documento.', 'error')
     except Exception as exc:
         session.rollback()
         flash(f'Erro ao salvar pessoa: {exc}', 'error')
-    finally:
-        session.close()
 
     return redirect(url_for('pessoas_page'))
 
 
+@app.route('/pessoas/importar', methods=['POST'])
+def importar_pessoas():
+    return _importar_csv(importador_cadastros.importar_pessoas, 'pessoas_page')
+
+
 @app.route('/pessoas/<int:pessoa_id>/excluir', methods=['POST'])
 def excluir_pessoa(pessoa_id: int):
-    session = SessionLocal()
+    session = _sessao()
     try:
         pessoa = session.get(Pessoas, pessoa_id)
         if not pessoa:
@@ -497,8 +1034,6 @@ def excluir_pessoa(pessoa_id: int):
     except Exception as exc:
         session.rollback()
         flash(f'Erro ao excluir pessoa: {exc}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('pessoas_page'))
 
 
@@ -507,51 +1042,20 @@ def excluir_pessoa(pessoa_id: int):
 # -----------------------
 @app.route('/classificacoes', methods=['GET'])
 def classificacoes_page():
-    search = (request.args.get('q') or '').strip()
-    terms = _tokenize_search(search)
-    tipo_filtro = (request.args.get('tipo') or 'TODOS').upper()
-    sort_field = request.args.get('sort') or 'descricao'
-    sort_direction = request.args.get('dir') or 'asc'
-    session = SessionLocal()
-    classificacoes = []
-    sort_map = {
-        'descricao': Classificacao.descricao,
-        'tipo': Classificacao.tipo,
-    }
-    sort_column = sort_map.get(sort_field, sort_map['descricao'])
-    try:
-        query = session.query(Classificacao).filter(Classificacao.status == 'ATIVO')
-        if tipo_filtro != 'TODOS':
-            query = query.filter(Classificacao.tipo == tipo_filtro)
-        for term in terms:
-            pattern = f"%{term}%"
-            query = query.filter(Classificacao.descricao.ilike(pattern))
-
-        if sort_direction == 'desc':
-            query = query.order_by(sort_column.desc(), Classificacao.id.desc())
-        else:
-            query = query.order_by(sort_column.asc(), Classificacao.id.asc())
-
-        registros = query.all()
-        for item in registros:
-            classificacoes.append({
-                "id": item.id,
-                "tipo": (item.tipo or '').upper(),
-                "descricao": item.descricao or "",
-                "status": item.status or "",
-            })
-    finally:
-        session.close()
+    session = _sessao_leitura()
+    listagem = _filtrar_classificacoes(session, request.args)
+    classificacoes = _linhas_listagem(_ordenar_listagem(listagem), _serializar_classificacao)
 
     tipos = ['TODOS', 'RECEITA', 'DESPESA']
-    return render_template(
+    return _renderizar_listagem(
         'classificacoes.html',
-        classificacoes=classificacoes,
-        search_term=search,
-        tipo_filtro=tipo_filtro,
+        'classificacoes',
+        classificacoes,
+        search_term=listagem.search,
+        tipo_filtro=listagem.filtros['tipo'],
         tipos=tipos,
-        sort_field=sort_field if sort_field in sort_map else 'descricao',
-        sort_direction='desc' if sort_direction == 'desc' else 'asc',
+        sort_field=listagem.sort_field,
+        sort_direction=listagem.sort_direction,
     )
 
 
@@ -559,7 +1063,7 @@ def classificacoes_page():
 def salvar_classificacao():
     form = request.form
     class_id = form.get('id')
-    session = SessionLocal()
+    session = _sessao()
     try:
         if class_id:
             classificacao = session.get(Classificacao, int(class_id))
@@ -583,17 +1087,23 @@ def salvar_classificacao():
             'Classificação atualizada com sucesso.' if class_id else 'Classificação criada com sucesso.',
             'success',
         )
+    except IntegrityError:
+        session.rollback()
+        flash('Já existe uma classificação com esta descrição.', 'error')
     except Exception as exc:
         session.rollback()
         flash(f'Erro ao salvar classificação: {exc}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('classificacoes_page'))
 
 
+@app.route('/classificacoes/importar', methods=['POST'])
+def importar_classificacoes():
+    return _importar_csv(importador_cadastros.importar_classificacoes, 'classificacoes_page')
+
+
 @app.route('/classificacoes/<int:class_id>/excluir', methods=['POST'])
 def excluir_classificacao(class_id: int):
-    session = SessionLocal()
+    session = _sessao()
     try:
         classificacao = session.get(Classificacao, class_id)
         if not classificacao:
@@ -605,11 +1115,128 @@ def excluir_classificacao(class_id: int):
     except Exception as exc:
         session.rollback()
         flash(f'Erro ao excluir classificação: {exc}', 'error')
-    finally:
-        session.close()
     return redirect(url_for('classificacoes_page'))
 
 
+# -----------------------
+# API JSON - LISTAGENS (somente leitura)
+# -----------------------
+_API_LIMITE_PADRAO = 50
+_API_LIMITE_MAXIMO = 500
+
+def _filtrar_contas_api(session, args) -> _Listagem:
+    listagem = _filtrar_contas(session, args)
+    return replace(listagem, query=_com_relacoes_conta(listagem.query))
+
+
+# recurso -> (filtro, serializador, tabelas cujas alterações invalidam o ETag)
+_API_RECURSOS = {
+    'contas': (
+        _filtrar_contas_api,
+        _serializar_conta,
+        ('movimento_contas', 'pessoas', 'classificacao', movimento_classificacao_association.name),
+    ),
+    'pessoas': (_filtrar_pessoas, _serializar_pessoa, ('pessoas',)),
+    'classificacoes': (_filtrar_classificacoes, _serializar_classificacao, ('classificacao',)),
+}
+
+
+def _codificar_cursor(listagem: _Listagem, registro) -> str:
+    valor = getattr(registro, listagem.sort_column.key)
+    if isinstance(valor, (date, Decimal)):
+        valor = str(valor)
+    bruto = json.dumps([listagem.sort_field, listagem.sort_direction, valor, registro.id])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(listagem: _Listagem, cursor: str):
+    """Retorna ``(valor, id)`` do último item da página anterior."""
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        sort_field, sort_direction, valor, ultimo_id = json.loads(base64.urlsafe_b64decode(preenchido))
+        if (sort_field, sort_direction) != (listagem.sort_field, listagem.sort_direction):
+            raise ValueError("cursor gerado para outra ordenação")
+        if valor is not None:
+            tipo = listagem.sort_column.type.python_type
+            if tipo is date:
+                valor = date.fromisoformat(valor)
+            elif tipo is Decimal:
+                valor = Decimal(valor)
+        return valor, int(ultimo_id)
+    except (ValueError, TypeError, InvalidOperation, binascii.Error) as exc:
+        raise ValueError(f"Cursor inválido: {exc}") from exc
+
+
+def _aplicar_cursor(listagem: _Listagem, query, cursor: str):
+    """Keyset pagination coerente com ``_ordenar_listagem`` (nulos por último)."""
+    valor, ultimo_id = _decodificar_cursor(listagem, cursor)
+    coluna = listagem.sort_column
+    depois_do_id = listagem.id_column < ultimo_id if listagem.id_desc else listagem.id_column > ultimo_id
+    if valor is None:
+        return query.filter(coluna.is_(None), depois_do_id)
+    depois_do_valor = coluna > valor if listagem.sort_direction == 'asc' else coluna < valor
+    return query.filter(or_(depois_do_valor, and_(coluna == valor, depois_do_id), coluna.is_(None)))
+
+
+def _etag_listagem(recurso: str, versoes: dict[str, int], args) -> str:
+    chave = json.dumps([recurso, versoes, sorted(args.items(multi=True))], sort_keys=True)
+    return hashlib.sha1(chave.encode()).hexdigest()
+
+
+@app.route('/api/<recurso>', methods=['GET'])
+def api_listar(recurso: str):
+    """Lista contas, pessoas ou classificações em JSON com paginação por cursor.
+
+    Parâmetros aceitos: os mesmos filtros das páginas HTML (``q``, ``sort``,
+    ``dir``, ``categoria``, ``tipo``) mais ``limit``, ``cursor`` e ``fields``.
+    """
+    config = _API_RECURSOS.get(recurso)
+    if config is None:
+        return {"error": "Recurso não encontrado"}, 404
+    filtrar, serializar, tabelas = config
+
+    try:
+        limite = int(request.args.get('limit') or _API_LIMITE_PADRAO)
+    except ValueError:
+        return {"error": "Parâmetro limit inválido"}, 400
+    limite = max(1, min(limite, _API_LIMITE_MAXIMO))
+    campos = [campo.strip() for campo in (request.args.get('fields') or '').split(',') if campo.strip()]
+
+    session = _sessao_leitura()
+    etag = _etag_listagem(recurso, table_versions(session, tabelas), request.args)
+    if request.if_none_match.contains_weak(etag):
+        resposta = app.response_class(status=304)
+    else:
+        listagem = filtrar(session, request.args)
+        query = _ordenar_listagem(listagem)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                query = _aplicar_cursor(listagem, query, cursor)
+            except ValueError as exc:
+                return {"error": str(exc)}, 400
+
+        registros = query.limit(limite + 1).all()
+        pagina = registros[:limite]
+        itens = [serializar(registro) for registro in pagina]
+        if campos and itens:
+            desconhecidos = sorted(set(campos) - set(itens[0]))
+            if desconhecidos:
+                return {"error": "Campos inválidos", "campos": desconhecidos}, 400
+            selecionados = ['id'] + [campo for campo in campos if campo != 'id']
+            itens = [{campo: item[campo] for campo in selecionados} for item in itens]
+
+        resposta = jsonify({
+            "items": itens,
+            "count": len(itens),
+            "next_cursor": _codificar_cursor(listagem, pagina[-1]) if len(registros) > limite else None,
+        })
+
+    resposta.set_etag(etag, weak=True)
+    resposta.cache_control.no_cache = True
+    return resposta
+
+
 # Manter compatibilidade com rota antiga, se necessário
 app.add_url_rule('/upload', view_func=extrair, methods=['POST'])
 
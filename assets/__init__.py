@@ -0,0 +1,5 @@
+"""Build-free static asset pipeline (fingerprinted URLs, precompression)."""
+
+from .pipeline import AssetManifest, init_assets
+
+__all__ = ["AssetManifest", "init_assets"]
@@ -0,0 +1,134 @@
+"""Content-hashed static URLs with in-memory gzip/brotli variants.
+
+At startup every file under ``app.static_folder`` is hashed and published as
+``/assets/<dir>/<name>.<hash>.<ext>``. Text assets are compressed once with
+gzip and (when the ``brotli`` package is installed) brotli, and the smallest
+variant accepted by the client is served. Since the URL changes whenever the
+content does, responses carry ``Cache-Control: immutable`` with a one-year
+max-age and browsers never revalidate them.
+
+Templates call ``asset_url('css/style.css')``; in debug mode (or with
+``ASSETS_FINGERPRINT=0``) it falls back to the plain ``/static`` URL so edits
+show up without restarting.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from flask import Flask, Response, abort, current_app, request, url_for
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+_COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".map", ".html"}
+_IMMUTABLE = "public, max-age=31536000, immutable"
+_MIN_COMPRESS_SIZE = 512
+
+
+@dataclass(frozen=True)
+class Asset:
+    """A fingerprinted static file and its precompressed variants."""
+
+    path: str
+    url_path: str
+    digest: str
+    mimetype: str
+    content: bytes
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+
+def _fingerprinted_name(path: str, digest: str) -> str:
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+
+def _compress(content: bytes) -> dict[str, bytes]:
+    variantes = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes["br"] = brotli.compress(content, quality=11)
+    # Only keep variants that actually save bytes
+    return {encoding: dados for encoding, dados in variantes.items() if len(dados) < len(content)}
+
+
+class AssetManifest:
+    """Maps logical static paths to their fingerprinted URLs and payloads."""
+
+    def __init__(self, static_folder: str | os.PathLike) -> None:
+        self.static_folder = Path(static_folder)
+        self.by_path: dict[str, Asset] = {}
+        self.by_url: dict[str, Asset] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        by_path: dict[str, Asset] = {}
+        if self.static_folder.is_dir():
+            for arquivo in sorted(self.static_folder.rglob("*")):
+                if not arquivo.is_file() or arquivo.name.startswith("."):
+                    continue
+                path = arquivo.relative_to(self.static_folder).as_posix()
+                content = arquivo.read_bytes()
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                encoded = {}
+                if arquivo.suffix.lower() in _COMPRESSIBLE and len(content) >= _MIN_COMPRESS_SIZE:
+                    encoded = _compress(content)
+                by_path[path] = Asset(
+                    path=path,
+                    url_path=_fingerprinted_name(path, digest),
+                    digest=digest,
+                    mimetype=mimetypes.guess_type(arquivo.name)[0] or "application/octet-stream",
+                    content=content,
+                    encoded=encoded,
+                )
+        self.by_path = by_path
+        self.by_url = {asset.url_path: asset for asset in by_path.values()}
+
+
+def _pick_encoding(asset: Asset) -> str | None:
+    aceitas = request.accept_encodings
+    candidatas = [enc for enc in ("br", "gzip") if enc in asset.encoded and aceitas.quality(enc) > 0]
+    if not candidatas:
+        return None
+    return min(candidatas, key=lambda enc: len(asset.encoded[enc]))
+
+
+def serve_asset(filename: str) -> Response:
+    asset = current_app.extensions["asset_manifest"].by_url.get(filename)
+    if asset is None:
+        abort(404)
+
+    encoding = _pick_encoding(asset)
+    response = Response(asset.encoded[encoding] if encoding else asset.content, mimetype=asset.mimetype)
+    if encoding:
+        response.content_encoding = encoding
+    if asset.encoded:
+        response.vary.add("Accept-Encoding")
+    response.set_etag(f"{asset.digest}-{encoding or 'identity'}")
+    response.headers["Cache-Control"] = _IMMUTABLE
+    return response.make_conditional(request)
+
+
+def asset_url(path: str) -> str:
+    """Return the fingerprinted URL of ``path`` (relative to the static folder)."""
+    manifest: AssetManifest = current_app.extensions["asset_manifest"]
+    asset = manifest.by_path.get(path)
+    if asset is None or current_app.debug or not current_app.config["ASSETS_FINGERPRINT"]:
+        return url_for("static", filename=path)
+    return url_for("assets", filename=asset.url_path)
+
+
+def init_assets(app: Flask) -> AssetManifest:
+    """Hash and precompress ``app.static_folder`` and register ``asset_url``."""
+    app.config.setdefault("ASSETS_FINGERPRINT", os.getenv("ASSETS_FINGERPRINT", "1") == "1")
+    manifest = AssetManifest(app.static_folder)
+    app.extensions["asset_manifest"] = manifest
+    app.add_url_rule("/assets/<path:filename>", endpoint="assets", view_func=serve_asset)
+    app.add_template_global(asset_url, name="asset_url")
+    return manifest
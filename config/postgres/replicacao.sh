@@ -0,0 +1,5 @@
+#!/bin/bash
+# Executado pelo entrypoint do postgres na criação do volume: libera a
+# conexão de replicação usada pelo pg_basebackup da réplica local
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
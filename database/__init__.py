@@ -1,3 +1,6 @@
 """Database package initialization."""
 
 from .connection import Base, SessionLocal, engine  # noqa: F401
+from . import search  # noqa: F401 - registers f_unaccent on SQLite connections
+from . import versioning  # noqa: F401 - registers the per-table change counters
+from . import rollups  # noqa: F401 - keeps the RAG summary tables in step with movimento_contas
@@ -1,13 +1,39 @@
-"""Database connection utilities using SQLAlchemy."""
+"""Database connection utilities using SQLAlchemy.
+
+The PostgreSQL pool is configured from the environment:
+
+- ``DB_POOL_SIZE`` (5) and ``DB_MAX_OVERFLOW`` (10): persistent and extra connections per process;
+- ``DB_POOL_TIMEOUT`` (30): seconds a checkout waits for a free connection before failing;
+- ``DB_POOL_RECYCLE`` (1800): seconds after which a connection is replaced, ahead of server/proxy idle cuts;
+- ``DB_POOL_PRE_PING`` (1): test each connection on checkout and reconnect if it went stale;
+- ``DB_STATEMENT_TIMEOUT_MS`` (0 = off): server-side ``statement_timeout``;
+- ``DB_PGBOUNCER`` (0): PgBouncer in transaction mode does the pooling, so the
+  engine opens one connection per checkout and sets the timeout per transaction.
+
+Single-farm installs can skip PostgreSQL: ``DB_SQLITE_PATH`` (or a ``sqlite://``
+``DATABASE_URL``) runs the app on an embedded SQLite file. Every SQLite
+connection gets :data:`SQLITE_PRAGMAS` (WAL journal, so readers never block the
+writer, plus foreign keys and cache/mmap sizes tuned for a small box), and
+file databases wait ``DB_SQLITE_BUSY_TIMEOUT`` (30) seconds for the write lock.
+
+``DATABASE_REPLICA_URL`` optionally points to a read replica of the same
+database. It gets its own engine (same pool settings) and ``ReplicaSessionLocal``;
+both are ``None`` when it is unset and every read goes to the primary.
+"""
 
 from __future__ import annotations
 
 import os
-from typing import Generator
+import sqlite3
+import time
+from typing import Any, Callable, Generator
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import NullPool, Pool, QueuePool
 
 # Ensure .env variables are available when running scripts outside Flask context
 load_dotenv()
@@ -15,14 +41,94 @@ load_dotenv()
 # Base declarative class used by the ORM models
 Base = declarative_base()
 
+# Applied in this order to every new SQLite connection; journal_mode is a no-op
+# on in-memory databases. Negative cache_size is in KiB.
+SQLITE_PRAGMAS: dict[str, str | int] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # durable at checkpoints; WAL keeps the file consistent on crash
+    "foreign_keys": "ON",  # ON DELETE CASCADE / SET NULL as on PostgreSQL
+    "temp_store": "MEMORY",
+    "cache_size": -16384,
+    "mmap_size": 134217728,
+    "journal_size_limit": 67108864,
+}
+
+_pool_listeners: list[Callable[["InstrumentedQueuePool", float | None, bool], None]] = []
+
+
+def on_pool_event(
+    listener: Callable[["InstrumentedQueuePool", float | None, bool], None],
+) -> Callable[["InstrumentedQueuePool", float | None, bool], None]:
+    """Call ``listener(pool, waited, timed_out)`` on every checkout and checkin.
+
+    ``waited`` is the time the checkout spent getting a connection (``None`` on
+    checkin); ``timed_out`` tells that the pool was exhausted for ``DB_POOL_TIMEOUT``.
+    """
+    _pool_listeners.append(listener)
+    return listener
+
+
+class InstrumentedQueuePool(QueuePool):
+    """``QueuePool`` that reports checkout waits and occupancy to :func:`on_pool_event`.
+
+    ``role`` (``"primary"`` or ``"replica"``, set by :func:`build_engine`) tells
+    the pools of one process apart in the metrics.
+    """
+
+    def __init__(self, creator: Any, pool_size: int = 5, max_overflow: int = 10, **kw: Any) -> None:
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kw)
+        # None when the overflow is unbounded (max_overflow=-1)
+        self.capacity = pool_size + max_overflow if max_overflow >= 0 else None
+        self.role = "primary"
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # engine.dispose() swaps in a new pool built from the constructor arguments only
+        pool = super().recreate()
+        pool.role = self.role
+        return pool
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super().connect()
+        except PoolTimeoutError:
+            self._notify(time.perf_counter() - inicio, True)
+            raise
+        self._notify(time.perf_counter() - inicio, False)
+        return conexao
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._notify(None, False)
+
+    def _notify(self, waited: float | None, timed_out: bool) -> None:
+        for listener in _pool_listeners:
+            listener(self, waited, timed_out)
+
+
+@event.listens_for(Pool, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for nome, valor in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {nome}={valor}")
+    finally:
+        cursor.close()
+
 
 def _build_database_url() -> str:
-    """Compose the PostgreSQL connection URL from environment variables."""
+    """Compose the database URL from environment variables (PostgreSQL unless SQLite is asked for)."""
     # Allow an explicit DATABASE_URL to override individual pieces
     url = os.getenv("DATABASE_URL")
     if url:
         return url
 
+    caminho = os.getenv("DB_SQLITE_PATH")
+    if caminho:
+        return f"sqlite+pysqlite:///{caminho}"
+
     user = os.getenv("DB_USER", "postgres")
     password = os.getenv("DB_PASSWORD", "postgres")
     host = os.getenv("DB_HOST", "db")
@@ -32,12 +138,74 @@ def _build_database_url() -> str:
     return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{name}"
 
 
+def engine_options(url: str) -> dict[str, Any]:
+    """``create_engine`` keyword arguments for ``url`` taken from the ``DB_*`` variables."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database in (None, "", ":memory:"):
+            return {}
+        # One file shared by the worker threads; writers queue on the lock instead of failing
+        return {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": float(os.getenv("DB_SQLITE_BUSY_TIMEOUT", "30")),
+            }
+        }
+    if parsed.get_backend_name() != "postgresql":
+        return {}
+
+    if os.getenv("DB_PGBOUNCER", "0") == "1":
+        # PgBouncer owns the pool; a second pool here would pin server connections
+        return {"poolclass": NullPool}
+
+    opcoes: dict[str, Any] = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+    timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    if timeout_ms > 0:
+        opcoes["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return opcoes
+
+
+def build_engine(url: str, role: str = "primary") -> Engine:
+    """Create the engine for ``url`` with the pool and timeout settings of the environment."""
+    engine = create_engine(url, echo=False, future=True, **engine_options(url))
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.role = role
+
+    timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    if timeout_ms > 0 and engine.dialect.name == "postgresql" and os.getenv("DB_PGBOUNCER", "0") == "1":
+        # PgBouncer rejects the startup ``options`` and a plain SET would stick to a
+        # server connection other clients reuse; SET LOCAL ends with the transaction
+        @event.listens_for(engine, "begin")
+        def _statement_timeout(conn) -> None:
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+    return engine
+
+
 DATABASE_URL = _build_database_url()
 
 # Engine and session factory shared across the application
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+engine = build_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+
+# Read-only work (RAG retrieval, list pages) may go to the replica; sessions
+# from this factory carry ``info["replica"]`` so they are never used for writes
+replica_engine = build_engine(REPLICA_URL, role="replica") if REPLICA_URL else None
+ReplicaSessionLocal = (
+    sessionmaker(bind=replica_engine, autoflush=False, autocommit=False, future=True, info={"replica": True})
+    if replica_engine is not None
+    else None
+)
+
 
 def get_session() -> Generator:
     """Provide a transactional scope around a series of operations."""
@@ -0,0 +1,36 @@
+"""Helpers that pick dialect-specific SQL constructs for the configured engine."""
+
+from __future__ import annotations
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def dialect_name(bind: Session | Connection | Engine) -> str:
+    """Return the dialect name behind a session, connection or engine."""
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    return bind.dialect.name
+
+
+def supports_upsert(bind: Session | Connection | Engine) -> bool:
+    """Tell whether ``INSERT ... ON CONFLICT`` is available for ``bind``."""
+    return dialect_name(bind) in _UPSERT_INSERTS
+
+
+def upsert_insert(bind: Session | Connection | Engine, table):
+    """Return an ``insert()`` that exposes ``on_conflict_do_*`` for ``bind``.
+
+    Raises ``NotImplementedError`` for dialects without ``ON CONFLICT``.
+    """
+    try:
+        factory = _UPSERT_INSERTS[dialect_name(bind)]
+    except KeyError as exc:
+        raise NotImplementedError(f"ON CONFLICT não suportado em {dialect_name(bind)}") from exc
+    return factory(table)
@@ -0,0 +1,77 @@
+"""EXPLAIN helpers to check which indexes the planner picks for a statement."""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Iterator
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query, Session
+
+_SQLITE_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+
+def _compile(connection: Connection, stmt) -> tuple[str, Any]:
+    if isinstance(stmt, Query):
+        stmt = stmt.statement
+    # Expanding IN lists are only rendered at execution time unless asked for here
+    compiled = stmt.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    if compiled.positional:
+        return str(compiled), tuple(params[nome] for nome in compiled.positiontup)
+    return str(compiled), params
+
+
+def explain(bind: Session | Connection, stmt) -> list[str]:
+    """Return the plan of ``stmt`` as text lines (PostgreSQL or SQLite)."""
+    connection = bind.connection() if isinstance(bind, Session) else bind
+    sql, params = _compile(connection, stmt)
+    if connection.dialect.name == "postgresql":
+        linhas = connection.exec_driver_sql(f"EXPLAIN {sql}", params).scalars()
+    else:
+        linhas = (row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params))
+    return list(linhas)
+
+
+def _walk_pg_plan(no: dict) -> Iterator[str]:
+    if "Index Name" in no:
+        yield no["Index Name"]
+    for filho in no.get("Plans", ()):
+        yield from _walk_pg_plan(filho)
+
+
+def used_indexes(bind: Session | Connection, stmt) -> set[str]:
+    """Names of the indexes the planner uses for ``stmt``.
+
+    On PostgreSQL sequential scans are disabled for the check, so a small or
+    empty table does not hide an index the planner could not use at all, and
+    indexes of partitions are reported by the name of the partitioned index
+    they were created from.
+    """
+    connection = bind.connection() if isinstance(bind, Session) else bind
+    sql, params = _compile(connection, stmt)
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        bruto = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+        plano = bruto if isinstance(bruto, list) else json.loads(bruto)
+        nomes = sorted(set(_walk_pg_plan(plano[0]["Plan"])))
+        if not nomes:
+            return set()
+        return set(
+            connection.execute(
+                text(
+                    "SELECT coalesce(raiz.relname, indice.relname) FROM pg_class indice "
+                    "LEFT JOIN pg_class raiz ON raiz.oid = pg_partition_root(indice.oid) "
+                    "WHERE indice.relname IN :nomes AND indice.relkind IN ('i', 'I')"
+                ).bindparams(bindparam("nomes", expanding=True)),
+                {"nomes": nomes},
+            ).scalars()
+        )
+    return {
+        encontrado.group(1)
+        for linha in explain(connection, stmt)
+        for encontrado in [_SQLITE_INDEX.search(linha)]
+        if encontrado
+    }
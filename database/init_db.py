@@ -1,23 +1,49 @@
-"""Utility script to create database tables defined in the ORM models."""
+"""Utility script to create database tables and apply pending migrations."""
 
 from __future__ import annotations
 
 from sqlalchemy.exc import OperationalError
 
 from .connection import Base, engine
+from .migrations import MigrationError, run_migrations
+from .partitioning import apply_partitioning
 import database.models  # noqa: F401 - ensure models are imported before create_all
 
 
 def create_tables() -> None:
-    """Create all tables in the configured database."""
+    """Create all tables in the configured database and run pending migrations.
+
+    An unreachable database is only reported, so the app can still start and
+    retry later. A failing migration raises :class:`MigrationError`: the app
+    must not boot against a schema that is half migrated.
+    """
     try:
         Base.metadata.create_all(bind=engine)
-        print("Tabelas criadas com sucesso.")
     except OperationalError as exc:
         # Provide an actionable message when the DB service is offline
         print("Falha ao conectar ao banco de dados:", exc)
         print("Verifique se o serviço PostgreSQL está em execução e os parâmetros de conexão estão corretos.")
+        return
+    print("Tabelas criadas com sucesso.")
+    aplicadas = run_migrations(engine)
+    if aplicadas:
+        print("Migrações aplicadas:", ", ".join(aplicadas))
+    # Opcional (DB_PARTITIONING): cria as partições dos próximos períodos; a conversão
+    # da tabela só acontece com `python -m database.partitioning --converter-experimental`
+    particoes = apply_partitioning(engine)
+    if particoes:
+        print("Partições criadas:", ", ".join(particoes))
+
+
+def main() -> int:
+    """Entry point for ``python -m database.init_db``; non-zero stops the boot scripts."""
+    try:
+        create_tables()
+    except MigrationError as exc:
+        print("Falha ao aplicar as migrações:", exc)
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    create_tables()
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+"""Merge duplicate rows so the unique keys of migrations 0002 and 0004 can be built.
+
+Before those keys existed, ``PersistenciaAgent`` looked rows up and inserted
+them in separate statements. Two concurrent launches of the same document
+could therefore create the same pessoa, classificação or note twice. Each
+function below folds every group of duplicates into one surviving row and
+returns the groups it merged, survivor first:
+
+- pessoas with the same ``documento`` and classificações with the same
+  ``lower(descricao)`` keep their oldest row. The movimentos and
+  classification links of the other rows are repointed to it.
+- movimentos with the same ``(numeronotafiscal, fornecedor)`` keep the newest
+  row, because a re-launch overwrites the earlier one. The other rows are
+  deleted with their parcelas and links, and their extractions point at the
+  survivor.
+
+The functions only issue portable SQL, so they run on PostgreSQL and SQLite.
+Migrations 0002 and 0004 call them before creating their unique keys; the
+rollup tables are filled later by 0005. ``scripts/unificar_duplicados.py``
+lists or merges duplicates on demand and then rebuilds the rollups.
+"""
+
+from __future__ import annotations
+
+import logging
+from itertools import groupby
+from typing import List, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+from .versioning import bump_table_versions, rows_changed_key
+
+logger = logging.getLogger(__name__)
+
+_MOVIMENTO_KEY_INDEX = "uq_movimento_contas_nota_fornecedor"
+_REPETIDOS = bindparam("repetidos", expanding=True)
+
+
+def _duplicate_groups(
+    connection: Connection,
+    tabela: str,
+    coluna_id: str,
+    chave: Sequence[str],
+    *,
+    newest_first: bool = False,
+) -> List[List[int]]:
+    """Ids of each group of rows sharing a non-NULL ``chave``, survivor first."""
+    colunas = ", ".join(chave)
+    nao_nulas = " AND ".join(f"{expressao} IS NOT NULL" for expressao in chave)
+    ordem = "DESC" if newest_first else "ASC"
+    linhas = connection.execute(
+        text(
+            f"SELECT {colunas}, {coluna_id} FROM {tabela} "
+            f"WHERE ({colunas}) IN (SELECT {colunas} FROM {tabela} WHERE {nao_nulas} "
+            f"GROUP BY {colunas} HAVING count(*) > 1) "
+            f"ORDER BY {colunas}, {coluna_id} {ordem}"
+        )
+    ).all()
+    return [
+        [linha[-1] for linha in grupo]
+        for _, grupo in groupby(linhas, key=lambda linha: tuple(linha[:-1]))
+    ]
+
+
+def find_duplicates(connection: Connection) -> dict[str, List[List[int]]]:
+    """Groups of duplicate ids per table, survivor first, without changing anything."""
+    return {
+        "pessoas": _duplicate_groups(connection, "pessoas", '"idPessoas"', ["documento"]),
+        "classificacao": _duplicate_groups(
+            connection, "classificacao", '"idClassificacao"', ["lower(descricao)"]
+        ),
+        "movimento_contas": _duplicate_groups(
+            connection,
+            "movimento_contas",
+            '"idMovimentoContas"',
+            ["numeronotafiscal", '"Pessoas_idFornecedorCliente"'],
+            newest_first=True,
+        ),
+    }
+
+
+def merge_duplicate_movimentos(connection: Connection) -> List[List[int]]:
+    """Keep the newest movimento of each (nota, fornecedor) and delete the others."""
+    grupos = _duplicate_groups(
+        connection,
+        "movimento_contas",
+        '"idMovimentoContas"',
+        ["numeronotafiscal", '"Pessoas_idFornecedorCliente"'],
+        newest_first=True,
+    )
+    for sobrevivente, *repetidos in grupos:
+        parametros = {"sobrevivente": sobrevivente, "repetidos": repetidos}
+        connection.execute(
+            text(
+                'UPDATE extracao_documentos SET "MovimentoContas_idMovimentoContas" = :sobrevivente '
+                'WHERE "MovimentoContas_idMovimentoContas" IN :repetidos'
+            ).bindparams(_REPETIDOS),
+            parametros,
+        )
+        # Explicit deletes: SQLite only cascades with foreign keys enabled
+        for sql in (
+            'DELETE FROM parcelas_contas WHERE "MovimentoContas_idMovimentoContas" IN :repetidos',
+            'DELETE FROM "MovimentoContas_has_Classificacao" WHERE "MovimentoContas_idMovimentoContas" IN :repetidos',
+            'DELETE FROM movimento_contas WHERE "idMovimentoContas" IN :repetidos',
+        ):
+            connection.execute(text(sql).bindparams(_REPETIDOS), {"repetidos": repetidos})
+    if grupos:
+        logger.warning("Movimentos repetidos unificados (sobrevivente primeiro): %s", grupos)
+        bump_table_versions(
+            connection, ["movimento_contas", "parcelas_contas", "MovimentoContas_has_Classificacao"]
+        )
+    return grupos
+
+
+def merge_duplicate_pessoas(connection: Connection) -> List[List[int]]:
+    """Keep the oldest pessoa of each documento and repoint its movimentos.
+
+    Repointing can make two movimentos share (nota, fornecedor). The unique key
+    of migration 0002 is dropped while they are merged and then recreated.
+    """
+    grupos = _duplicate_groups(connection, "pessoas", '"idPessoas"', ["documento"])
+    if not grupos:
+        return grupos
+
+    connection.execute(text(f"DROP INDEX IF EXISTS {_MOVIMENTO_KEY_INDEX}"))
+    for sobrevivente, *repetidos in grupos:
+        parametros = {"sobrevivente": sobrevivente, "repetidos": repetidos}
+        for coluna in ("Pessoas_idFornecedorCliente", "Pessoas_idFaturado"):
+            connection.execute(
+                text(
+                    f'UPDATE movimento_contas SET "{coluna}" = :sobrevivente WHERE "{coluna}" IN :repetidos'
+                ).bindparams(_REPETIDOS),
+                parametros,
+            )
+        connection.execute(
+            text('DELETE FROM pessoas WHERE "idPessoas" IN :repetidos').bindparams(_REPETIDOS),
+            {"repetidos": repetidos},
+        )
+    merge_duplicate_movimentos(connection)
+    connection.execute(
+        text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {_MOVIMENTO_KEY_INDEX} "
+            'ON movimento_contas (numeronotafiscal, "Pessoas_idFornecedorCliente")'
+        )
+    )
+    logger.warning("Pessoas repetidas unificadas (sobrevivente primeiro): %s", grupos)
+    bump_table_versions(connection, ["pessoas", rows_changed_key("pessoas"), "movimento_contas"])
+    return grupos
+
+
+def merge_duplicate_classificacoes(connection: Connection) -> List[List[int]]:
+    """Keep the oldest classificação of each ``lower(descricao)`` and move its links."""
+    grupos = _duplicate_groups(connection, "classificacao", '"idClassificacao"', ["lower(descricao)"])
+    for sobrevivente, *repetidos in grupos:
+        parametros = {"sobrevivente": sobrevivente, "repetidos": repetidos}
+        connection.execute(
+            text(
+                'INSERT INTO "MovimentoContas_has_Classificacao" '
+                '("MovimentoContas_idMovimentoContas", "Classificacao_idClassificacao") '
+                'SELECT DISTINCT v."MovimentoContas_idMovimentoContas", :sobrevivente '
+                'FROM "MovimentoContas_has_Classificacao" v '
+                'WHERE v."Classificacao_idClassificacao" IN :repetidos AND NOT EXISTS ('
+                'SELECT 1 FROM "MovimentoContas_has_Classificacao" s '
+                'WHERE s."MovimentoContas_idMovimentoContas" = v."MovimentoContas_idMovimentoContas" '
+                'AND s."Classificacao_idClassificacao" = :sobrevivente)'
+            ).bindparams(_REPETIDOS),
+            parametros,
+        )
+        for sql in (
+            'DELETE FROM "MovimentoContas_has_Classificacao" WHERE "Classificacao_idClassificacao" IN :repetidos',
+            'DELETE FROM classificacao WHERE "idClassificacao" IN :repetidos',
+        ):
+            connection.execute(text(sql).bindparams(_REPETIDOS), {"repetidos": repetidos})
+    if grupos:
+        logger.warning("Classificações repetidas unificadas (sobrevivente primeiro): %s", grupos)
+        bump_table_versions(
+            connection, ["classificacao", rows_changed_key("classificacao"), "MovimentoContas_has_Classificacao"]
+        )
+    return grupos
@@ -0,0 +1,262 @@
+"""Versioned schema migrations applied on top of the ORM models.
+
+``Base.metadata.create_all`` only creates missing tables; everything that
+changes an existing schema (indexes, constraints, extensions) lives here as a
+numbered migration so deployed databases pick it up too. Run
+``python -m database.migrations`` to list and apply pending versions.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .merging import merge_duplicate_classificacoes, merge_duplicate_movimentos, merge_duplicate_pessoas
+
+# Bookkeeping table kept outside Base.metadata so create_all never touches it
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("versao", String(32), primary_key=True),
+    Column("descricao", String(200)),
+    Column("aplicada_em", DateTime),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A single schema change identified by an ordered version string."""
+
+    versao: str
+    descricao: str
+    aplicar: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(versao: str, descricao: str):
+    """Register the decorated function as the migration ``versao``."""
+
+    def decorator(func: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        MIGRATIONS.append(Migration(versao, descricao, func))
+        MIGRATIONS.sort(key=lambda item: item.versao)
+        return func
+
+    return decorator
+
+
+def applied_versions(connection: Connection) -> set[str]:
+    """Return the versions already recorded in ``schema_migrations``."""
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.versao)).scalars())
+
+
+class MigrationError(RuntimeError):
+    """A migration failed; the ones after it were not attempted."""
+
+    def __init__(self, versao: str, pendentes: list[str], causa: Exception) -> None:
+        super().__init__(
+            f"a migração {versao} falhou ({causa}); pendentes: {', '.join(pendentes)}. "
+            "O app não deve subir com o schema pela metade."
+        )
+        self.versao = versao
+        self.pendentes = pendentes
+
+
+def run_migrations(engine: Engine) -> list[str]:
+    """Apply pending migrations, each one in its own transaction.
+
+    Stops at the first failure and raises :class:`MigrationError`; the
+    migrations already applied stay recorded.
+    """
+    with engine.begin() as connection:
+        aplicadas = applied_versions(connection)
+
+    pendentes = [item for item in MIGRATIONS if item.versao not in aplicadas]
+    executadas: list[str] = []
+    for posicao, item in enumerate(pendentes):
+        try:
+            with engine.begin() as connection:
+                item.aplicar(connection)
+                connection.execute(
+                    insert(schema_migrations).values(
+                        versao=item.versao,
+                        descricao=item.descricao,
+                        aplicada_em=func.current_timestamp(),
+                    )
+                )
+        except Exception as exc:
+            raise MigrationError(item.versao, [p.versao for p in pendentes[posicao:]], exc) from exc
+        executadas.append(item.versao)
+    return executadas
+
+
+def _is_postgres(connection: Connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+_TRGM_INDEXES = {
+    "ix_movimento_contas_descricao_trgm": ("movimento_contas", "descricao"),
+    "ix_movimento_contas_numeronotafiscal_trgm": ("movimento_contas", "numeronotafiscal"),
+    "ix_pessoas_razaosocial_trgm": ("pessoas", "razaosocial"),
+    "ix_pessoas_fantasia_trgm": ("pessoas", "fantasia"),
+    "ix_pessoas_documento_trgm": ("pessoas", "documento"),
+    "ix_classificacao_descricao_trgm": ("classificacao", "descricao"),
+}
+
+
+@migration("0001", "pg_trgm/unaccent search indexes for the list pages")
+def _0001_search_indexes(connection: Connection) -> None:
+    # SQLite runs fall back to the Python f_unaccent registered by database.search
+    if not _is_postgres(connection):
+        return
+
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    # unaccent() is only STABLE; the wrapper pins the dictionary so it can back an index
+    connection.execute(
+        text(
+            "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS "
+            "$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$ "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+        )
+    )
+    for nome, (tabela, coluna) in _TRGM_INDEXES.items():
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} "
+                f"USING gin (f_unaccent(lower({coluna})) gin_trgm_ops)"
+            )
+        )
+
+
+@migration("0002", "unique (numeronotafiscal, fornecedor) key for movimento upserts")
+def _0002_movimento_nota_fornecedor(connection: Connection) -> None:
+    # The old check-then-insert could store the same note twice under concurrency
+    merge_duplicate_movimentos(connection)
+    # Backs INSERT ... ON CONFLICT in PersistenciaAgent.lancar_contas_em_lote
+    connection.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_movimento_contas_nota_fornecedor "
+            'ON movimento_contas (numeronotafiscal, "Pessoas_idFornecedorCliente")'
+        )
+    )
+
+
+# Indexes for the hot filters and orderings of app.py, PersistenciaAgent and
+# ConsultaRagAgent. ``scripts/verificar_indices.py`` checks with EXPLAIN that
+# each of those queries is actually served by the index listed next to it.
+# name -> (table, indexed columns/expressions, partial-index predicate)
+HOT_QUERY_INDEXES: dict[str, tuple[str, str, str | None]] = {
+    # Equality lookups by document / case-insensitive description (0004 swaps
+    # both for the unique uq_* indexes behind the agent's upserts)
+    "ix_pessoas_documento": ("pessoas", "documento", None),
+    "ix_classificacao_descricao_lower": ("classificacao", "lower(descricao)", None),
+    # Foreign keys: report joins and the checks behind ON DELETE
+    "ix_movimento_contas_fornecedor": ("movimento_contas", '"Pessoas_idFornecedorCliente"', None),
+    "ix_movimento_contas_faturado": ("movimento_contas", '"Pessoas_idFaturado"', None),
+    "ix_movimento_classificacao_classificacao": (
+        '"MovimentoContas_has_Classificacao"',
+        '"Classificacao_idClassificacao"',
+        None,
+    ),
+    "ix_parcelas_contas_movimento_vencimento": (
+        "parcelas_contas",
+        '"MovimentoContas_idMovimentoContas", datavencimento',
+        None,
+    ),
+    # Date windows of the RAG reports, with and without the tipo filter
+    "ix_movimento_contas_dataemissao": ("movimento_contas", "dataemissao", None),
+    "ix_movimento_contas_tipo_dataemissao": ("movimento_contas", "tipo, dataemissao", None),
+    # Default order of the list pages, which only show active rows
+    "ix_movimento_contas_ativas_data": (
+        "movimento_contas",
+        'dataemissao DESC NULLS LAST, "idMovimentoContas" DESC',
+        "status = 'ATIVO'",
+    ),
+    "ix_pessoas_ativas_razaosocial": ("pessoas", 'razaosocial, "idPessoas"', "status = 'ATIVO'"),
+    "ix_classificacao_ativas_descricao": ("classificacao", 'descricao, "idClassificacao"', "status = 'ATIVO'"),
+    # Open installments (overdue and outstanding balance reports)
+    "ix_parcelas_contas_em_aberto": ("parcelas_contas", "datavencimento", "valorsaldo > 0"),
+}
+
+
+@migration("0003", "indexes for the hot list, lookup and report queries")
+def _0003_hot_query_indexes(connection: Connection) -> None:
+    for nome, (tabela, colunas, predicado) in HOT_QUERY_INDEXES.items():
+        if not _is_postgres(connection):
+            # SQLite already sorts NULLs first ascending / last descending and rejects the clause
+            colunas = colunas.replace(" NULLS LAST", "")
+        sql = f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})"
+        if predicado:
+            sql += f" WHERE {predicado}"
+        connection.execute(text(sql))
+    if _is_postgres(connection):
+        connection.execute(text("ANALYZE pessoas, classificacao, movimento_contas, parcelas_contas"))
+
+
+# name -> (table, key expression, plain index from 0003 it supersedes)
+_UNIQUE_LOOKUP_KEYS = {
+    "uq_pessoas_documento": ("pessoas", "documento", "ix_pessoas_documento"),
+    "uq_classificacao_descricao_lower": (
+        "classificacao",
+        "lower(descricao)",
+        "ix_classificacao_descricao_lower",
+    ),
+}
+
+
+@migration("0004", "unique keys for pessoas.documento and lower(classificacao.descricao)")
+def _0004_unique_lookup_keys(connection: Connection) -> None:
+    # Back the ON CONFLICT upserts of PersistenciaAgent. Duplicates left by the
+    # old check-then-insert are folded into their oldest row first.
+    merge_duplicate_pessoas(connection)
+    merge_duplicate_classificacoes(connection)
+    for nome, (tabela, chave, substituido) in _UNIQUE_LOOKUP_KEYS.items():
+        connection.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {nome} ON {tabela} ({chave})"))
+        connection.execute(text(f"DROP INDEX IF EXISTS {substituido}"))
+
+
+@migration("0005", "day-level rollup tables for the RAG summaries")
+def _0005_rag_rollups(connection: Connection) -> None:
+    from .models import ResumoDescricao, ResumoDiarioClassificacao, ResumoDiarioFornecedor
+    from .rollups import rebuild_rollups
+
+    for modelo in (ResumoDiarioClassificacao, ResumoDiarioFornecedor, ResumoDescricao):
+        modelo.__table__.create(connection, checkfirst=True)
+    # Seed from the existing movimentos; writes keep them current from here on
+    rebuild_rollups(connection)
+
+
+def _main() -> int:
+    import argparse
+
+    from .connection import engine
+
+    parser = argparse.ArgumentParser(description="Lista e aplica as migrações pendentes.")
+    parser.add_argument("--status", action="store_true", help="Só lista as versões, sem aplicar")
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        aplicadas = applied_versions(connection)
+    for item in MIGRATIONS:
+        marca = "x" if item.versao in aplicadas else " "
+        print(f"[{marca}] {item.versao}  {item.descricao}")
+    if args.status:
+        return 0
+    executadas = run_migrations(engine)
+    print("Migrações aplicadas:", ", ".join(executadas) if executadas else "nenhuma pendente")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_main())
@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional
 
-from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric, String, Table
+from sqlalchemy import JSON, BigInteger, Column, Date, DateTime, ForeignKey, Index, Integer, Numeric, String, Table, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .connection import Base
@@ -69,6 +70,12 @@ class Classificacao(Base):
     )
 
 
+# Lookup keys of PersistenciaAgent's INSERT ... ON CONFLICT upserts: concurrent
+# workers launching notes of the same supplier or category resolve to one row
+Index("uq_pessoas_documento", Pessoas.documento, unique=True)
+Index("uq_classificacao_descricao_lower", func.lower(Classificacao.descricao), unique=True)
+
+
 class MovimentoContas(Base):
     """Registro principal de cada nota fiscal processada."""
 
@@ -119,8 +126,22 @@ class MovimentoContas(Base):
     )
 
 
+# One movimento per invoice number and supplier; rows missing either column never
+# conflict (NULLs are distinct), so manual entries without a number are unaffected
+Index(
+    "uq_movimento_contas_nota_fornecedor",
+    MovimentoContas.numero_nota_fiscal,
+    MovimentoContas.fornecedor_id,
+    unique=True,
+)
+
+
 class ParcelasContas(Base):
-    """Parcelas geradas para pagamentos futuros vinculados ao movimento."""
+    """Parcelas geradas para pagamentos futuros vinculados ao movimento.
+
+    Com ``DB_PARTITIONING`` a tabela é particionada por ``datavencimento``
+    (``database.partitioning``); ``id`` continua sendo a identidade no ORM.
+    """
 
     __tablename__ = "parcelas_contas"
 
@@ -143,3 +164,73 @@ class ParcelasContas(Base):
         "MovimentoContas",
         back_populates="parcelas",
     )
+
+
+class TabelaVersao(Base):
+    """Contador de alterações por tabela, usado para gerar ETags das listagens."""
+
+    __tablename__ = "tabela_versoes"
+
+    tabela: Mapped[str] = mapped_column(String(64), primary_key=True)
+    versao: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class ExtracaoDocumento(Base):
+    """Extração já feita de um PDF, reaproveitada quando o mesmo documento é reenviado."""
+
+    __tablename__ = "extracao_documentos"
+
+    id: Mapped[int] = mapped_column("idExtracaoDocumento", Integer, primary_key=True, autoincrement=True, quote=True)
+    hash_conteudo: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    chave_acesso: Mapped[Optional[str]] = mapped_column(String(44), index=True)
+    dados: Mapped[dict] = mapped_column(JSON, nullable=False)
+    movimento_id: Mapped[Optional[int]] = mapped_column(
+        "MovimentoContas_idMovimentoContas",
+        Integer,
+        ForeignKey("movimento_contas.idMovimentoContas", ondelete="SET NULL"),
+        quote=True,
+    )
+    criado_em: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.current_timestamp())
+    atualizado_em: Mapped[Optional[datetime]] = mapped_column(
+        DateTime,
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+    )
+
+
+class ResumoDiarioClassificacao(Base):
+    """Movimentos e valor total por dia de emissão, tipo e classificação (ver ``database.rollups``)."""
+
+    __tablename__ = "resumo_diario_classificacao"
+
+    dia: Mapped[date] = mapped_column(Date, primary_key=True)
+    tipo: Mapped[str] = mapped_column(String(45), primary_key=True)
+    classificacao_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    quantidade: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total: Mapped[Decimal] = mapped_column(Numeric(16, 2), nullable=False, default=0)
+
+
+class ResumoDiarioFornecedor(Base):
+    """Movimentos e valor total por dia de emissão, tipo e fornecedor (``0`` = sem fornecedor)."""
+
+    __tablename__ = "resumo_diario_fornecedor"
+
+    dia: Mapped[date] = mapped_column(Date, primary_key=True)
+    tipo: Mapped[str] = mapped_column(String(45), primary_key=True)
+    fornecedor_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    quantidade: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total: Mapped[Decimal] = mapped_column(Numeric(16, 2), nullable=False, default=0)
+
+
+class ResumoDescricao(Base):
+    """Ocorrências e valor total de cada descrição de movimento (gastos recorrentes)."""
+
+    __tablename__ = "resumo_descricao"
+
+    descricao: Mapped[str] = mapped_column(String(300), primary_key=True)
+    quantidade: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total: Mapped[Decimal] = mapped_column(Numeric(16, 2), nullable=False, default=0)
+
+
+# Most frequent descriptions first, without scanning the whole table
+Index("ix_resumo_descricao_quantidade_total", ResumoDescricao.quantidade, ResumoDescricao.total)
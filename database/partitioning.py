@@ -0,0 +1,348 @@
+"""Optional range partitioning of ``parcelas_contas`` by due date (PostgreSQL only).
+
+``DB_PARTITIONING`` selects ``year`` or ``month`` partitions (unset keeps
+plain tables). Converting a plain table copies it under an exclusive lock, so
+it only happens on an explicit ``python -m database.partitioning
+--converter-experimental``, never from ``python -m database.init_db``. The
+conversion is experimental: it is exercised only by the ``TEST_DATABASE_URL``
+integration test and has not been measured on a production-sized table. Once a table is partitioned, both commands
+create the partitions for the current period and the next
+``DB_PARTITION_AHEAD`` (2) periods; run the module from cron to keep them
+ahead. Rows dated outside every partition (or without a date) land in the
+``<table>_default`` partition and are moved to their own partition the next
+time partitions are ensured.
+
+Queries that filter on the partition key with plain comparisons
+(``datavencimento < :hoje``, ``BETWEEN``) are pruned by the planner, also for
+bound parameters at execution time; wrapping the column in a function disables
+pruning. The ORM is unaffected: ``id`` stays the mapper identity, backed by a
+plain index because PostgreSQL only allows unique constraints that contain the
+partition key.
+
+``movimento_contas`` is deliberately not partitioned. The same rule would
+force ``dataemissao`` into its primary key and into the (nota, fornecedor)
+key behind the ON CONFLICT upserts, and foreign keys from parcelas, links and
+extractions cannot point to a partitioned table without it. Its date windows
+are served by the ``dataemissao`` indexes (migration 0003) and the RAG rollups
+(migration 0005).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from datetime import date
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+GRANULARITY = os.getenv("DB_PARTITIONING", "").strip().lower() or None
+AHEAD = int(os.getenv("DB_PARTITION_AHEAD", "2"))
+
+# Partitioned table -> range partition key
+PARTITION_KEYS = {"parcelas_contas": "datavencimento"}
+
+GRANULARITIES = ("year", "month")
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(?:_(\d{2}))?$")
+
+
+def period_start(dia: date, granularity: str) -> date:
+    """First day of the year or month that contains ``dia``."""
+    return date(dia.year, 1, 1) if granularity == "year" else date(dia.year, dia.month, 1)
+
+
+def next_period(inicio: date, granularity: str) -> date:
+    """First day of the period after the one starting at ``inicio``."""
+    if granularity == "year":
+        return date(inicio.year + 1, 1, 1)
+    return date(inicio.year + 1, 1, 1) if inicio.month == 12 else date(inicio.year, inicio.month + 1, 1)
+
+
+def partition_name(table: str, inicio: date, granularity: str) -> str:
+    """``parcelas_contas_p2024`` for years, ``parcelas_contas_p2024_05`` for months."""
+    return f"{table}_p{inicio:%Y}" if granularity == "year" else f"{table}_p{inicio:%Y_%m}"
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    """Whether ``table`` is already a partitioned table."""
+    return bool(
+        connection.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"),
+            {"t": table},
+        ).scalar()
+    )
+
+
+def partitions(connection: Connection, table: str) -> list[str]:
+    """Names of the partitions attached to ``table``, default included."""
+    return list(
+        connection.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:t) ORDER BY c.relname"
+            ),
+            {"t": table},
+        ).scalars()
+    )
+
+
+def current_granularity(connection: Connection, table: str) -> Optional[str]:
+    """Granularity of the existing partitions, read from their names (``None`` if there are none)."""
+    for nome in partitions(connection, table):
+        encontrado = _PARTITION_SUFFIX.search(nome)
+        if encontrado:
+            return "month" if encontrado.group(2) else "year"
+    return None
+
+
+def _check_granularity(granularity: str) -> None:
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularidade inválida: {granularity!r} (use year ou month)")
+
+
+def _check_blockers(connection: Connection, table: str) -> None:
+    referencias = connection.execute(
+        text(
+            "SELECT conrelid::regclass::text FROM pg_constraint "
+            "WHERE confrelid = to_regclass(:t) AND contype = 'f' ORDER BY 1"
+        ),
+        {"t": table},
+    ).scalars().all()
+    unicos = connection.execute(
+        text(
+            "SELECT indexrelid::regclass::text FROM pg_index "
+            "WHERE indrelid = to_regclass(:t) AND indisunique AND NOT indisprimary ORDER BY 1"
+        ),
+        {"t": table},
+    ).scalars().all()
+    motivos = [f"referenciada por {', '.join(referencias)}"] if referencias else []
+    motivos += [f"índices únicos sem a chave de partição: {', '.join(unicos)}"] if unicos else []
+    if motivos:
+        raise RuntimeError(f"{table} não pode ser particionada: {'; '.join(motivos)}")
+
+
+def _wanted_starts(connection: Connection, source: str, key: str, granularity: str, hoje: date) -> list[date]:
+    """Periods holding rows of ``source`` plus the current one and ``AHEAD`` after it."""
+    inicios = set(
+        connection.execute(
+            text(
+                f"SELECT DISTINCT date_trunc('{granularity}', {key})::date FROM {source} "
+                f"WHERE {key} IS NOT NULL"
+            )
+        ).scalars()
+    )
+    inicio = period_start(hoje, granularity)
+    for _ in range(AHEAD + 1):
+        inicios.add(inicio)
+        inicio = next_period(inicio, granularity)
+    return sorted(inicios)
+
+
+def _create_partition(connection: Connection, table: str, key: str, inicio: date, granularity: str) -> str:
+    nome = partition_name(table, inicio, granularity)
+    fim = next_period(inicio, granularity)
+    limites = f"FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+    padrao = f"{table}_default"
+    ocupado = connection.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {padrao} WHERE {key} >= :inicio AND {key} < :fim)"),
+        {"inicio": inicio, "fim": fim},
+    ).scalar()
+    if not ocupado:
+        connection.execute(text(f"CREATE TABLE {nome} PARTITION OF {table} FOR VALUES {limites}"))
+        return nome
+
+    # The default partition already holds rows of this period: move them out, then attach
+    connection.execute(text(f"CREATE TABLE {nome} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(
+        text(
+            f"WITH movidas AS (DELETE FROM {padrao} WHERE {key} >= :inicio AND {key} < :fim RETURNING *) "
+            f"INSERT INTO {nome} SELECT * FROM movidas"
+        ),
+        {"inicio": inicio, "fim": fim},
+    )
+    connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {nome} FOR VALUES {limites}"))
+    return nome
+
+
+def ensure_partitions(
+    connection: Connection,
+    table: str,
+    key: str,
+    granularity: str,
+    hoje: Optional[date] = None,
+) -> list[str]:
+    """Create the missing partitions of ``table`` and return their names.
+
+    Covers the current period, the next ``AHEAD`` ones and every period that
+    has rows waiting in the default partition.
+    """
+    _check_granularity(granularity)
+    existente = current_granularity(connection, table)
+    if existente and existente != granularity:
+        raise RuntimeError(
+            f"{table} já está particionada por {existente}; "
+            f"ajuste DB_PARTITIONING ou recrie a tabela antes de mudar para {granularity}"
+        )
+    atuais = set(partitions(connection, table))
+    criadas = []
+    for inicio in _wanted_starts(connection, f"{table}_default", key, granularity, hoje or date.today()):
+        if partition_name(table, inicio, granularity) not in atuais:
+            criadas.append(_create_partition(connection, table, key, inicio, granularity))
+    return criadas
+
+
+def partition_table(
+    connection: Connection,
+    table: str,
+    key: str,
+    granularity: str,
+    hoje: Optional[date] = None,
+) -> list[str]:
+    """Rebuild the plain ``table`` as a table partitioned by range of ``key``.
+
+    Indexes, foreign keys and the id sequence are carried over; the primary
+    key becomes a plain index. Runs in the caller's transaction and holds an
+    exclusive lock on the table while the rows are copied.
+    """
+    _check_granularity(granularity)
+    _check_blockers(connection, table)
+    quote = connection.dialect.identifier_preparer.quote
+
+    # Captured before the rename, so the definitions already point to the new table
+    primaria = connection.execute(
+        text(
+            "SELECT conname, array_agg(a.attname::text ORDER BY a.attnum) FROM pg_constraint c "
+            "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY (c.conkey) "
+            "WHERE c.conrelid = to_regclass(:t) AND c.contype = 'p' GROUP BY conname"
+        ),
+        {"t": table},
+    ).first()
+    indices = connection.execute(
+        text(
+            "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t "
+            "AND indexname <> coalesce(:pk, '') ORDER BY indexname"
+        ),
+        {"t": table, "pk": primaria[0] if primaria else None},
+    ).scalars().all()
+    estrangeiras = connection.execute(
+        text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(:t) AND contype = 'f' ORDER BY conname"
+        ),
+        {"t": table},
+    ).all()
+
+    antiga = f"{table}_heap"
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {antiga}"))
+    connection.execute(
+        text(
+            f"CREATE TABLE {table} (LIKE {antiga} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({key})"
+        )
+    )
+    connection.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+    criadas = [
+        _create_partition(connection, table, key, inicio, granularity)
+        for inicio in _wanted_starts(connection, antiga, key, granularity, hoje or date.today())
+    ]
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {antiga}"))
+
+    colunas_pk = list(primaria[1]) if primaria else []
+    for coluna in colunas_pk:
+        # The column argument keeps its case as is; quoting it would look for '"idParcelasContas"'
+        sequencia = connection.execute(
+            text("SELECT pg_get_serial_sequence(:t, :c)"), {"t": antiga, "c": coluna}
+        ).scalar()
+        if sequencia:
+            # Otherwise the sequence behind the id default is dropped with the old table
+            connection.execute(text(f"ALTER SEQUENCE {sequencia} OWNED BY {table}.{quote(coluna)}"))
+    connection.execute(text(f"DROP TABLE {antiga}"))
+
+    for definicao in indices:
+        connection.execute(text(definicao))
+    for nome, definicao in estrangeiras:
+        connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {quote(nome)} {definicao}"))
+    if colunas_pk:
+        colunas = ", ".join(quote(coluna) for coluna in colunas_pk)
+        connection.execute(text(f"CREATE INDEX ix_{primaria[0]} ON {table} ({colunas})"))
+    connection.execute(text(f"ANALYZE {table}"))
+    return criadas
+
+
+def apply_partitioning(
+    engine: Engine,
+    granularity: Optional[str] = GRANULARITY,
+    tables: Optional[Iterable[str]] = None,
+    *,
+    convert: bool = False,
+) -> list[str]:
+    """Create missing partitions, converting plain tables only when ``convert`` is set.
+
+    No-op unless ``granularity`` is set and the engine is PostgreSQL. A plain
+    table is left alone (with a warning) unless ``convert`` is true. Returns
+    the names of the partitions created.
+    """
+    if not granularity or engine.dialect.name != "postgresql":
+        return []
+    _check_granularity(granularity)
+    criadas: list[str] = []
+    with engine.begin() as connection:
+        for tabela in tables or PARTITION_KEYS:
+            chave = PARTITION_KEYS[tabela]
+            if not is_partitioned(connection, tabela):
+                if not convert:
+                    logger.warning(
+                        "%s ainda não é particionada; a conversão é experimental "
+                        "(python -m database.partitioning --converter-experimental)",
+                        tabela,
+                    )
+                    continue
+                criadas += partition_table(connection, tabela, chave, granularity)
+            criadas += ensure_partitions(connection, tabela, chave, granularity)
+    return criadas
+
+
+def _main(argv: Optional[Sequence[str]] = None) -> int:
+    import argparse
+
+    from .connection import engine
+
+    parser = argparse.ArgumentParser(description="Particiona as tabelas configuradas e cria as partições que faltam.")
+    parser.add_argument("--granularidade", choices=GRANULARITIES, default=GRANULARITY,
+                        help="year ou month (padrão: DB_PARTITIONING)")
+    parser.add_argument("--status", action="store_true", help="Só lista as partições, sem alterar nada")
+    parser.add_argument(
+        "--converter-experimental",
+        action="store_true",
+        help="Converte as tabelas comuns (experimental: ainda não validado nem medido num PostgreSQL real)",
+    )
+    args = parser.parse_args(argv)
+
+    if engine.dialect.name != "postgresql":
+        print("Particionamento disponível apenas no PostgreSQL.")
+        return 1
+    if args.status:
+        with engine.connect() as connection:
+            for tabela in PARTITION_KEYS:
+                if not is_partitioned(connection, tabela):
+                    print(f"{tabela}: tabela comum")
+                    continue
+                print(f"{tabela}: particionada por {current_granularity(connection, tabela) or '?'}")
+                for nome in partitions(connection, tabela):
+                    print(f"  {nome}")
+        return 0
+    if not args.granularidade:
+        print("Defina DB_PARTITIONING (year ou month) ou use --granularidade.")
+        return 1
+    criadas = apply_partitioning(engine, args.granularidade, convert=args.converter_experimental)
+    print("Partições criadas:", ", ".join(criadas) if criadas else "nenhuma")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_main())
@@ -0,0 +1,107 @@
+"""One SQLAlchemy session per Flask request, closed on app-context teardown.
+
+Read-only views can ask for :func:`request_read_session` instead: it opens the
+session on the read replica, unless the client committed a write within the
+last ``DB_REPLICA_STICKY_SECONDS`` (5 by default). In that case reads stay on
+the primary, so a user never misses a row they just saved because the replica
+is a little behind. Writes are recorded in the Flask session cookie, so the
+window follows the client across requests and workers.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Callable, Optional
+
+from flask import Flask, g, has_request_context, session as flask_session
+from sqlalchemy.orm import Session
+
+from .versioning import on_tables_committed
+
+_G_KEY = "_db_session"
+_WRITE_KEY = "_db_escrita"
+
+REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+
+def request_session(session_factory: Callable[[], Session]) -> Session:
+    """Return the session bound to the current request, creating it on first use."""
+    session = g.get(_G_KEY)
+    if session is not None and session.info.get("replica"):
+        # The request read from the replica and now needs the primary
+        g.pop(_G_KEY)
+        session.close()
+        session = None
+    if session is None:
+        session = session_factory()
+        setattr(g, _G_KEY, session)
+    return session
+
+
+def request_read_session(
+    session_factory: Callable[[], Session],
+    replica_factory: Optional[Callable[[], Session]],
+) -> Session:
+    """Return the request session for read-only work, on the replica when it is safe."""
+    session = g.get(_G_KEY)
+    if session is None:
+        session = read_session_factory(session_factory, replica_factory)()
+        setattr(g, _G_KEY, session)
+    return session
+
+
+def read_session_factory(
+    session_factory: Callable[[], Session],
+    replica_factory: Optional[Callable[[], Session]],
+) -> Callable[[], Session]:
+    """Pick the factory for read-only work: the replica, unless the client wrote recently."""
+    if replica_factory is None or wrote_recently():
+        return session_factory
+    return replica_factory
+
+
+def mark_write() -> None:
+    """Keep the current client's reads on the primary for ``DB_REPLICA_STICKY_SECONDS``."""
+    if has_request_context():
+        flask_session[_WRITE_KEY] = time.time()
+
+
+def wrote_recently() -> bool:
+    """Whether the current client committed a write inside the sticky window."""
+    if not has_request_context():
+        return False
+    ultima = flask_session.get(_WRITE_KEY)
+    return ultima is not None and time.time() - ultima < REPLICA_STICKY_SECONDS
+
+
+@on_tables_committed
+def _mark_committed_write(_tabelas: set[str]) -> None:
+    # Commits made by the request thread; background writers call mark_write() themselves
+    mark_write()
+
+
+def close_request_session(exc: BaseException | None = None) -> None:
+    """Roll back on unhandled errors and release the request session."""
+    session = g.pop(_G_KEY, None)
+    if session is None:
+        return
+    try:
+        if exc is not None:
+            session.rollback()
+    finally:
+        session.close()
+
+
+def detach_request_session() -> Session | None:
+    """Hand the request session over to the caller, who becomes responsible for closing it.
+
+    Used by streamed responses: the body is generated after the request context
+    is torn down, so the teardown must not close the session still being read.
+    """
+    return g.pop(_G_KEY, None)
+
+
+def init_request_session(app: Flask) -> None:
+    """Register the teardown that closes the request session."""
+    app.teardown_appcontext(close_request_session)
@@ -0,0 +1,299 @@
+"""Aggregate tables that let the RAG summaries skip full scans of ``movimento_contas``.
+
+Each movimento contributes ``(1, valor_total)`` to:
+
+- ``resumo_diario_classificacao``: one row per (dia, tipo, classificação) it is linked to;
+- ``resumo_diario_fornecedor``: its (dia, tipo, fornecedor) row;
+- ``resumo_descricao``: its description, for the recurring-expense summary.
+
+Key columns are NOT NULL so the rows can be upserted: a movimento without
+``data_emissao`` counts on :data:`SEM_DATA` (no date window reaches it), a
+missing tipo or description on ``""`` and a missing supplier on ``0``.
+
+Maintenance is incremental and happens in the writing transaction. ORM flushes
+are tracked automatically: before the flush the contribution of every
+movimento about to change is read (locking its row), after the flush it is read
+again and the difference is queued on the session. Set-based writes to
+``movimento_contas`` or ``MovimentoContas_has_Classificacao`` that bypass the
+unit of work must run inside :func:`track_movements`, just as they call
+``bump_table_versions``. Queued differences are applied right before commit,
+one upsert per table in key order, so concurrent transactions lock rollup rows
+in the same order. :func:`rebuild_rollups` recomputes everything from scratch.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import Date, delete, event, func, insert, inspect, literal, select, text, tuple_, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .dialects import supports_upsert, upsert_insert
+from .models import (
+    Classificacao,
+    MovimentoContas,
+    Pessoas,
+    ResumoDescricao,
+    ResumoDiarioClassificacao,
+    ResumoDiarioFornecedor,
+    movimento_classificacao_association,
+)
+
+SEM_DATA = date(1, 1, 1)
+
+_movimentos = MovimentoContas.__table__
+_vinculos = movimento_classificacao_association
+_vinculo_movimento = _vinculos.c.MovimentoContas_idMovimentoContas
+_vinculo_classificacao = _vinculos.c.Classificacao_idClassificacao
+
+# rollup name -> (table, key columns)
+_ROLLUPS = {
+    "classificacao": (ResumoDiarioClassificacao.__table__, ("dia", "tipo", "classificacao_id")),
+    "fornecedor": (ResumoDiarioFornecedor.__table__, ("dia", "tipo", "fornecedor_id")),
+    "descricao": (ResumoDescricao.__table__, ("descricao",)),
+}
+
+# (rollup name, key) -> [quantidade, total]
+Contributions = Dict[Tuple[str, tuple], List]
+
+_PENDING_KEY = "resumos_pendentes"
+_BEFORE_FLUSH_KEY = "resumos_antes_do_flush"
+_TRACKER_KEY = "resumos_rastreio"
+
+
+def movement_contributions(session: Session, ids: Iterable[int], *, lock: bool = False) -> Contributions:
+    """Return what the movimentos ``ids`` currently add to each rollup row.
+
+    With ``lock=True`` the movimento rows are read ``FOR UPDATE``, so no other
+    transaction changes them between this read and the caller's write.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    stmt = (
+        select(
+            _movimentos.c.idMovimentoContas,
+            _movimentos.c.dataemissao,
+            _movimentos.c.tipo,
+            _movimentos.c.Pessoas_idFornecedorCliente,
+            _movimentos.c.descricao,
+            _movimentos.c.valortotal,
+            _vinculo_classificacao,
+        )
+        .select_from(_movimentos.outerjoin(_vinculos, _vinculo_movimento == _movimentos.c.idMovimentoContas))
+        .where(_movimentos.c.idMovimentoContas.in_(ids))
+        .order_by(_movimentos.c.idMovimentoContas)
+    )
+    if lock:
+        stmt = stmt.with_for_update(of=_movimentos)
+    movimentos: Dict[int, tuple] = {}
+    classificacoes: Dict[int, List[int]] = defaultdict(list)
+    for movimento_id, *valores, classificacao_id in session.connection().execute(stmt):
+        movimentos[movimento_id] = tuple(valores)
+        if classificacao_id is not None:
+            classificacoes[movimento_id].append(classificacao_id)
+
+    contribuicoes: Contributions = {}
+    for movimento_id, (dia, tipo, fornecedor_id, descricao, valor) in movimentos.items():
+        dia, tipo, valor = dia or SEM_DATA, tipo or "", valor or Decimal("0")
+        chaves = chain(
+            [("fornecedor", (dia, tipo, fornecedor_id or 0)), ("descricao", (descricao or "",))],
+            (("classificacao", (dia, tipo, classificacao_id)) for classificacao_id in classificacoes[movimento_id]),
+        )
+        for chave in chaves:
+            item = contribuicoes.setdefault(chave, [0, Decimal("0")])
+            item[0] += 1
+            item[1] += valor
+    return contribuicoes
+
+
+def _queue_difference(session: Session, antes: Contributions, depois: Contributions) -> None:
+    pendentes: Contributions = session.info.setdefault(_PENDING_KEY, {})
+    for chave in antes.keys() | depois.keys():
+        quantidade_antes, total_antes = antes.get(chave, (0, 0))
+        quantidade_depois, total_depois = depois.get(chave, (0, 0))
+        if quantidade_antes == quantidade_depois and total_antes == total_depois:
+            continue
+        item = pendentes.setdefault(chave, [0, Decimal("0")])
+        item[0] += quantidade_depois - quantidade_antes
+        item[1] += total_depois - total_antes
+
+
+class MovementTracker:
+    """Collects the movimentos written inside :func:`track_movements`."""
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+        self.ids: set[int] = set()
+        self.antes: Contributions = {}
+
+    def lock(self, ids: Iterable[int]) -> None:
+        """Lock ``ids`` and record their contribution before the block writes them."""
+        novos = set(ids) - self.ids
+        self.ids |= novos
+        for chave, (quantidade, total) in movement_contributions(self._session, novos, lock=True).items():
+            item = self.antes.setdefault(chave, [0, Decimal("0")])
+            item[0] += quantidade
+            item[1] += total
+
+    def inserted(self, ids: Iterable[int]) -> None:
+        """Track rows inserted by the block; they contributed nothing before it."""
+        self.ids.update(ids)
+
+
+@contextmanager
+def track_movements(session: Session, ids: Iterable[int] = ()) -> Iterator[MovementTracker]:
+    """Queue the rollup change caused by set-based writes to the movimentos ``ids``.
+
+    Rows whose ids are only known inside the block are added with
+    :meth:`MovementTracker.lock` (before writing them) or
+    :meth:`MovementTracker.inserted`. Nested blocks share the outermost
+    tracker, so a batch touching the same movimentos through several helpers
+    reads their final state once. ORM changes to tracked movimentos must not be
+    flushed inside the block; their own flush already accounts for them.
+    """
+    ativo = session.info.get(_TRACKER_KEY)
+    if ativo is not None:
+        ativo.lock(ids)
+        yield ativo
+        return
+
+    # Pending ORM changes are tracked by their own flush, not by this block
+    session.flush()
+    tracker = MovementTracker(session)
+    session.info[_TRACKER_KEY] = tracker
+    try:
+        tracker.lock(ids)
+        yield tracker
+    finally:
+        session.info.pop(_TRACKER_KEY, None)
+    _queue_difference(session, tracker.antes, movement_contributions(session, tracker.ids))
+
+
+def apply_rollup_deltas(connection: Connection, deltas: Contributions) -> None:
+    """Add ``deltas`` to the rollup rows, dropping rows no movimento contributes to."""
+    linhas: Dict[str, List[dict]] = defaultdict(list)
+    for (nome, chave), (quantidade, total) in sorted(deltas.items()):
+        if quantidade or total:
+            linhas[nome].append({**dict(zip(_ROLLUPS[nome][1], chave)), "quantidade": quantidade, "total": total})
+
+    for nome in sorted(linhas):
+        tabela, colunas_chave = _ROLLUPS[nome]
+        chaves = [tabela.c[coluna] for coluna in colunas_chave]
+        if supports_upsert(connection):
+            stmt = upsert_insert(connection, tabela)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=chaves,
+                set_={
+                    "quantidade": tabela.c.quantidade + stmt.excluded.quantidade,
+                    "total": tabela.c.total + stmt.excluded.total,
+                },
+            )
+            connection.execute(stmt, linhas[nome])
+        else:
+            for linha in linhas[nome]:
+                filtro = [coluna == linha[coluna.name] for coluna in chaves]
+                result = connection.execute(
+                    update(tabela)
+                    .where(*filtro)
+                    .values(quantidade=tabela.c.quantidade + linha["quantidade"], total=tabela.c.total + linha["total"])
+                )
+                if not result.rowcount:
+                    connection.execute(insert(tabela).values(**linha))
+
+        esvaziadas = [tuple(linha[coluna] for coluna in colunas_chave) for linha in linhas[nome] if linha["quantidade"] < 0]
+        if esvaziadas:
+            connection.execute(delete(tabela).where(tabela.c.quantidade <= 0, tuple_(*chaves).in_(esvaziadas)))
+
+
+def rebuild_rollups(bind: Engine | Connection) -> Dict[str, int]:
+    """Recompute every rollup from ``movimento_contas`` and return the row count of each."""
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return rebuild_rollups(connection)
+
+    if bind.dialect.name == "postgresql":
+        # Writers wait for the rebuild instead of queueing deltas against rows being replaced
+        bind.execute(text('LOCK TABLE movimento_contas, "MovimentoContas_has_Classificacao" IN SHARE MODE'))
+
+    dia = func.coalesce(_movimentos.c.dataemissao, literal(SEM_DATA, Date))
+    tipo = func.coalesce(_movimentos.c.tipo, "")
+    quantidade = func.count()
+    total = func.coalesce(func.sum(func.coalesce(_movimentos.c.valortotal, 0)), 0)
+    consultas = {
+        "classificacao": select(dia, tipo, _vinculo_classificacao, quantidade, total)
+        .select_from(_movimentos.join(_vinculos, _vinculo_movimento == _movimentos.c.idMovimentoContas))
+        .group_by(dia, tipo, _vinculo_classificacao),
+        "fornecedor": select(
+            dia, tipo, func.coalesce(_movimentos.c.Pessoas_idFornecedorCliente, 0), quantidade, total
+        ).group_by(dia, tipo, func.coalesce(_movimentos.c.Pessoas_idFornecedorCliente, 0)),
+        "descricao": select(func.coalesce(_movimentos.c.descricao, ""), quantidade, total).group_by(
+            func.coalesce(_movimentos.c.descricao, "")
+        ),
+    }
+
+    linhas: Dict[str, int] = {}
+    for nome, consulta in consultas.items():
+        tabela, colunas_chave = _ROLLUPS[nome]
+        bind.execute(delete(tabela))
+        bind.execute(insert(tabela).from_select([*colunas_chave, "quantidade", "total"], consulta))
+        linhas[tabela.name] = bind.execute(select(func.count()).select_from(tabela)).scalar_one()
+    return linhas
+
+
+@event.listens_for(Session, "before_flush")
+def _read_before_flush(session: Session, _flush_context, _instances) -> None:
+    ids = {
+        obj.id
+        for obj in chain(session.dirty, session.deleted)
+        if isinstance(obj, MovimentoContas) and obj.id is not None
+    }
+    for obj in session.dirty:
+        # Links changed from the classification side leave the movimentos clean
+        if isinstance(obj, Classificacao):
+            historico = inspect(obj).attrs.movimentos.history
+            ids.update(mov.id for mov in chain(historico.added, historico.deleted) if mov.id is not None)
+    # Deleting a classification drops its links; deleting a person unsets the supplier
+    classificacoes = [obj.id for obj in session.deleted if isinstance(obj, Classificacao)]
+    if classificacoes:
+        ids.update(
+            session.connection().execute(select(_vinculo_movimento).where(_vinculo_classificacao.in_(classificacoes))).scalars()
+        )
+    pessoas = [obj.id for obj in session.deleted if isinstance(obj, Pessoas)]
+    if pessoas:
+        ids.update(
+            session.connection().execute(
+                select(_movimentos.c.idMovimentoContas).where(_movimentos.c.Pessoas_idFornecedorCliente.in_(pessoas))
+            ).scalars()
+        )
+    if ids:
+        session.info[_BEFORE_FLUSH_KEY] = (ids, movement_contributions(session, ids, lock=True))
+
+
+@event.listens_for(Session, "after_flush")
+def _queue_flushed_changes(session: Session, _flush_context) -> None:
+    ids, antes = session.info.pop(_BEFORE_FLUSH_KEY, (set(), {}))
+    ids = ids | {obj.id for obj in session.new if isinstance(obj, MovimentoContas)}
+    if ids:
+        _queue_difference(session, antes, movement_contributions(session, ids))
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_pending(session: Session) -> None:
+    # The commit flushes after this hook; flush now so its changes are included
+    session.flush()
+    pendentes = session.info.pop(_PENDING_KEY, None)
+    if pendentes:
+        apply_rollup_deltas(session.connection(), pendentes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, _transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_BEFORE_FLUSH_KEY, None)
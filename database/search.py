@@ -0,0 +1,84 @@
+"""Accent-insensitive substring search shared by the CRUD list pages.
+
+On PostgreSQL the predicates are written as ``f_unaccent(lower(col)) LIKE ...``
+so they match the ``gin_trgm_ops`` indexes created by migration 0001. SQLite
+connections get a Python implementation of ``f_unaccent`` so the same SQL runs
+unchanged in tests and single-process installs.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import unicodedata
+import weakref
+from typing import Iterable
+
+from sqlalchemy import event, func, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from sqlalchemy.sql.elements import ColumnElement
+
+SEARCH_FUNCTION = "f_unaccent"
+
+_unaccent_support: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+
+def _py_unaccent(value: str | None) -> str | None:
+    """Strip diacritics and lowercase (SQLite's lower() only folds ASCII)."""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+@event.listens_for(Pool, "connect")
+def _register_sqlite_unaccent(dbapi_connection, _connection_record) -> None:
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function(SEARCH_FUNCTION, 1, _py_unaccent, deterministic=True)
+
+
+def supports_unaccent(engine: Engine) -> bool:
+    """Tell whether ``f_unaccent`` is callable on ``engine`` (cached per engine).
+
+    A missing function on PostgreSQL is not cached: migration 0001 may create it
+    later (``init_db`` often runs after the app has started), and the next call
+    should pick it up.
+    """
+    cached = _unaccent_support.get(engine)
+    if cached is not None:
+        return cached
+
+    if engine.dialect.name == "sqlite":
+        suportado = True
+    elif engine.dialect.name == "postgresql":
+        with engine.connect() as connection:
+            suportado = bool(
+                connection.execute(text(f"SELECT to_regproc('{SEARCH_FUNCTION}') IS NOT NULL")).scalar()
+            )
+        if not suportado:
+            return False
+    else:
+        suportado = False
+
+    _unaccent_support[engine] = suportado
+    return suportado
+
+
+def search_terms_filter(
+    engine: Engine,
+    terms: Iterable[str],
+    *columns: ColumnElement,
+) -> list[ColumnElement]:
+    """Build one predicate per term; each term must match at least one column."""
+    unaccent = supports_unaccent(engine)
+    filtros: list[ColumnElement] = []
+    for term in terms:
+        pattern = f"%{term}%"
+        if unaccent:
+            alvo = getattr(func, SEARCH_FUNCTION)(func.lower(pattern))
+            filtros.append(
+                or_(*(getattr(func, SEARCH_FUNCTION)(func.lower(column)).like(alvo) for column in columns))
+            )
+        else:
+            filtros.append(or_(*(column.ilike(pattern) for column in columns)))
+    return filtros
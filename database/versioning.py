@@ -0,0 +1,156 @@
+"""Per-table change counters used to build cheap ETags for the list endpoints.
+
+Every ORM flush that inserts, updates or deletes rows bumps the counter of the
+affected tables in ``tabela_versoes``. Set-based writes that bypass the unit of
+work (bulk ``UPDATE``/``INSERT``) must call :func:`bump_table_versions` themselves.
+
+Bumps made through a :class:`Session` are written after its transaction commits,
+in a short transaction of their own. Writing them inside the transaction would
+hold the lock on the shared ``tabela_versoes`` row until commit and serialize
+every concurrent writer of the table. Bumping after commit never pairs a new
+version with old data; the cost is that a crash between the two commits leaves
+the table's ETag unchanged until its next write. Bumps on a bare
+:class:`Connection` (scripts that own a short transaction) are written at once.
+
+Because every write goes through that function, it is also where in-process
+caches learn about changes: callbacks registered with :func:`on_tables_committed`
+receive the table names once the transaction that bumped them commits.
+
+Caches of ``key -> id`` mappings only go stale when rows are updated or deleted,
+never on inserts. Those writes also bump a second counter, named by
+:func:`rows_changed_key`, so such caches survive a bulk ingest. Raw SQL that
+updates or deletes rows must bump that name too.
+"""
+
+from __future__ import annotations
+
+import logging
+from itertools import chain
+from typing import Callable, Iterable
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .dialects import supports_upsert, upsert_insert
+from .models import TabelaVersao
+
+_versoes = TabelaVersao.__table__
+
+logger = logging.getLogger(__name__)
+
+# Tables bumped in the connection's current transaction, announced on commit
+_PENDING_KEY = "tabelas_alteradas"
+# Session.info: engine -> tables whose counters are written after the commit
+_DEFERRED_KEY = "versoes_pendentes"
+_commit_listeners: list[Callable[[set[str]], None]] = []
+
+
+def on_tables_committed(callback: Callable[[set[str]], None]) -> Callable[[set[str]], None]:
+    """Call ``callback(tabelas)`` whenever a transaction that changed ``tabelas`` commits."""
+    _commit_listeners.append(callback)
+    return callback
+
+
+def rows_changed_key(tabela: str) -> str:
+    """Counter bumped only when rows of ``tabela`` are updated or deleted."""
+    return f"{tabela}:alteradas"
+
+
+def bump_table_versions(bind: Session | Connection, tabelas: Iterable[str]) -> None:
+    """Increment the change counter of each table name in ``tabelas``.
+
+    With a session the increment is deferred until the session commits.
+    """
+    nomes = sorted(set(tabelas))
+    if not nomes:
+        return
+    connection = bind.connection() if isinstance(bind, Session) else bind
+    connection.info.setdefault(_PENDING_KEY, set()).update(nomes)
+
+    if isinstance(bind, Session):
+        pendentes = bind.info.setdefault(_DEFERRED_KEY, {})
+        pendentes.setdefault(connection.engine, set()).update(nomes)
+        return
+    _write_versions(connection, nomes)
+
+
+def _write_versions(connection: Connection, nomes: list[str]) -> None:
+    if supports_upsert(connection):
+        stmt = upsert_insert(connection, _versoes)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[_versoes.c.tabela],
+            set_={"versao": _versoes.c.versao + 1},
+        )
+        connection.execute(stmt, [{"tabela": nome, "versao": 1} for nome in nomes])
+        return
+
+    for nome in nomes:
+        result = connection.execute(
+            update(_versoes).where(_versoes.c.tabela == nome).values(versao=_versoes.c.versao + 1)
+        )
+        if not result.rowcount:
+            connection.execute(_versoes.insert().values(tabela=nome, versao=1))
+
+
+def table_versions(bind: Session | Connection, tabelas: Iterable[str]) -> dict[str, int]:
+    """Return the current counter for each table (``0`` when never written)."""
+    nomes = sorted(set(tabelas))
+    rows = bind.execute(select(_versoes.c.tabela, _versoes.c.versao).where(_versoes.c.tabela.in_(nomes)))
+    versoes = {nome: 0 for nome in nomes}
+    versoes.update({tabela: int(versao) for tabela, versao in rows})
+    return versoes
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session: Session, _flush_context) -> None:
+    tabelas: set[str] = set()
+    for obj in session.new:
+        tabelas.update(table.name for table in inspect(obj).mapper.tables)
+    for obj in session.deleted:
+        for table in inspect(obj).mapper.tables:
+            tabelas.update((table.name, rows_changed_key(table.name)))
+    for obj in session.dirty:
+        # A collection change alone writes the association table, not the entity's own
+        if session.is_modified(obj, include_collections=False):
+            for table in inspect(obj).mapper.tables:
+                tabelas.update((table.name, rows_changed_key(table.name)))
+    for obj in chain(session.new, session.deleted, session.dirty):
+        estado = inspect(obj)
+        for relacao in estado.mapper.relationships:
+            if relacao.secondary is not None and estado.attrs[relacao.key].history.has_changes():
+                tabelas.add(relacao.secondary.name)
+    tabelas.discard(_versoes.name)
+    bump_table_versions(session, tabelas)
+
+
+@event.listens_for(Session, "after_commit")
+def _write_deferred_versions(session: Session) -> None:
+    pendentes = session.info.pop(_DEFERRED_KEY, None)
+    for engine, nomes in (pendentes or {}).items():
+        try:
+            with engine.begin() as connection:
+                _write_versions(connection, sorted(nomes))
+        except Exception:  # pragma: no cover - the data is already committed
+            logger.exception("Falha ao incrementar a versão das tabelas %s", ", ".join(sorted(nomes)))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_deferred_versions(session: Session, previous_transaction) -> None:
+    # A rolled-back savepoint keeps the outer bumps (an extra bump is harmless)
+    if not previous_transaction.nested:
+        session.info.pop(_DEFERRED_KEY, None)
+
+
+@event.listens_for(Engine, "commit")
+def _announce_committed_tables(connection: Connection) -> None:
+    tabelas = connection.info.pop(_PENDING_KEY, None)
+    if not tabelas:
+        return
+    for callback in _commit_listeners:
+        callback(tabelas)
+
+
+@event.listens_for(Engine, "rollback")
+def _discard_pending_tables(connection: Connection) -> None:
+    connection.info.pop(_PENDING_KEY, None)
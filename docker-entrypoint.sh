@@ -5,20 +5,32 @@ echo "🚀 Iniciando Container no Render..."
 
 # --- 1. Inicialização do Banco de Dados ---
 # REMOVIDO: python -m database.wait_for_db (Causava timeout no deploy)
-# Tenta criar tabelas, mas não falha se o banco já estiver pronto (|| true)
+# Banco fora do ar é só avisado pelo init_db (sai com 0) e o app sobe mesmo assim.
+# Uma migração com erro sai com 1: subir com o schema pela metade quebraria os upserts.
 echo "🛠️ Tentando inicializar banco (se possível)..."
-python -m database.init_db || echo "⚠️ Aviso: Inicialização do DB falhou ou já estava pronto. Continuando..."
+if ! python -m database.init_db; then
+    echo "❌ Migrações do banco falharam; corrija o erro acima antes de subir o app."
+    exit 1
+fi
 
 # Cria pasta de uploads para garantir que existe
 mkdir -p uploads
 
 # --- 2. Indexação RAG (Opcional) ---
-# Executa apenas se não houver indice e não for pulado via env var
+# Executa apenas se não houver indice e não for pulado via env var.
+# Roda antes do Gunicorn: em paralelo, o modelo de embeddings seria carregado duas vezes
+# (aqui e nos workers/master com GUNICORN_PRELOAD) e a instância com pouca RAM estoura.
+# RAG_INDEX_SEGUNDO_PLANO=1 antecipa o bind do Gunicorn em máquinas com memória de sobra.
 if [ "${SKIP_RAG_INDEX:-0}" != "1" ]; then
     if [ ! -f "${CHROMA_DIR:-./_chromadb}/chroma.sqlite3" ]; then
-        echo "[entrypoint] Executando indexação RAG..."
-        # '|| true' impede que falta de RAM mate o deploy
-        python scripts/indexar_dados.py || echo "⚠️ Aviso: Indexação RAG falhou (provavelmente RAM). O app vai subir sem dados novos."
+        if [ "${RAG_INDEX_SEGUNDO_PLANO:-0}" = "1" ]; then
+            echo "[entrypoint] Indexação RAG iniciada em segundo plano..."
+            ( python scripts/indexar_dados.py || echo "⚠️ Aviso: Indexação RAG falhou (provavelmente RAM). O modo semântico ficará sem dados novos." ) &
+        else
+            echo "[entrypoint] Executando indexação RAG..."
+            # '|| true' impede que falta de RAM mate o deploy
+            python scripts/indexar_dados.py || echo "⚠️ Aviso: Indexação RAG falhou (provavelmente RAM). O app vai subir sem dados novos."
+        fi
     else
         echo "[entrypoint] Índice Chroma já existente."
     fi
@@ -28,10 +40,14 @@ fi
 APP_MODULE=${APP_MODULE:-app:app} 
 GUNICORN_HOST=0.0.0.0
 GUNICORN_PORT=${PORT:-5000}        # Render injeta a porta automaticamente
-GUNICORN_WORKERS=${GUNICORN_WORKERS:-1}     # 1 worker para economizar RAM (IA libs carregadas uma vez)
+GUNICORN_WORKERS=${GUNICORN_WORKERS:-1}     # 1 worker para economizar RAM; com GUNICORN_PRELOAD=1 (gunicorn.conf.py) o modelo de embeddings é compartilhado e dá para subir mais workers
 GUNICORN_THREADS=${GUNICORN_THREADS:-4}     # 4 threads para manter concorrência sem RAM extra
 GUNICORN_TIMEOUT=120               # Timeout maior para evitar erros 502 na inicialização
 
+# Métricas Prometheus agregadas entre workers (diretório limpo a cada boot)
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 echo "✅ Iniciando Gunicorn na porta $GUNICORN_PORT com ${GUNICORN_WORKERS} worker(s) e ${GUNICORN_THREADS} thread(s)..."
 
 # Executa o servidor com modelo threaded. Se o banco estiver fora, o erro aparecerá no log do Gunicorn.
@@ -0,0 +1,61 @@
+"""Gunicorn settings shared by the Docker entrypoint and manual runs.
+
+Command-line flags still win; this file adds the Prometheus multiprocess
+hooks and the optional preload mode.
+
+With ``GUNICORN_PRELOAD=1`` the master imports the app and loads the
+embedding model before forking, so N workers share the model weights through
+copy-on-write pages instead of each holding its own copy. Anything that owns
+sockets or file handles (SQLAlchemy pools, Chroma clients) is recreated in
+each worker by ``post_fork``.
+"""
+
+import gc
+import os
+import sys
+
+from prometheus_client import multiprocess
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+
+def when_ready(server):
+    # Runs in the master right before the first workers are forked
+    if not server.cfg.preload_app:
+        return
+    if os.getenv("SKIP_EMBED_PRELOAD", "0") != "1":
+        try:
+            from agents.consulta_rag.processador import carregar_modelo_embeddings
+
+            carregar_modelo_embeddings()
+            server.log.info("Modelo de embeddings carregado no master (compartilhado com os workers)")
+        except Exception as exc:  # noqa: BLE001 - o modo semântico é opcional
+            server.log.warning("Modelo de embeddings não pré-carregado: %s", exc)
+    # Objects that survive to this point are never collected; freezing them keeps
+    # the collector from touching (and so un-sharing) their pages in the workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    from database.connection import engine, replica_engine
+
+    # Connections opened by the master must not be shared with the children
+    engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.dispose(close=False)
+    aplicacao = sys.modules.get("app")
+    if aplicacao is not None:
+        aplicacao.consulta_agent = None  # Chroma client is created lazily per worker
+        aplicacao.fila_gravacao = None  # its writer thread does not survive the fork
+    torch = sys.modules.get("torch")
+    if torch is not None and os.getenv("TORCH_NUM_THREADS"):
+        # Avoid N workers each spinning one intra-op thread per core
+        torch.set_num_threads(int(os.environ["TORCH_NUM_THREADS"]))
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a dead worker so in-flight counts do not leak
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
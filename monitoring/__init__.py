@@ -0,0 +1,13 @@
+"""Runtime instrumentation for the Flask app (Prometheus metrics, query budget)."""
+
+from .metrics import init_metrics, observe_group_commit, observe_identity_cache
+from .query_budget import QueryBudgetExceeded, init_query_budget, query_budget
+
+__all__ = [
+    "QueryBudgetExceeded",
+    "init_metrics",
+    "init_query_budget",
+    "observe_group_commit",
+    "observe_identity_cache",
+    "query_budget",
+]
@@ -0,0 +1,226 @@
+"""Per-request latency, in-flight and database metrics in Prometheus format.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (see ``gunicorn.conf.py``) every
+worker writes its samples to that directory and ``/metrics`` aggregates them,
+so the numbers are correct no matter which worker answers the scrape.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+from flask import Flask, Response, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database.connection import on_pool_event
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+_POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, by endpoint.",
+    ["method", "endpoint", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+REQUEST_QUEUE_TIME = Histogram(
+    "http_request_queue_seconds",
+    "Time between the proxy receiving the request (X-Request-Start) and a worker picking it up.",
+    buckets=_LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled.",
+    ["method", "endpoint"],
+    multiprocess_mode="livesum",
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while handling a request.",
+    ["endpoint"],
+    buckets=_QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(
+    "db_query_seconds_per_request",
+    "Total time spent in SQL statements while handling a request.",
+    ["endpoint"],
+    buckets=_LATENCY_BUCKETS,
+)
+IDENTITY_CACHE_LOOKUPS = Counter(
+    "identity_cache_lookups_total",
+    "Pessoa/classificação id lookups answered by the in-process cache (hit, negativo) or the database (miss).",
+    ["table", "result"],
+)
+PERSISTENCE_COMMITTED_NOTES = Counter(
+    "persistence_committed_notes_total",
+    "Notes committed by the group-commit writer queue; rate() gives committed notes per second.",
+)
+PERSISTENCE_GROUP_COMMIT = Histogram(
+    "persistence_group_commit_seconds",
+    "Time to write and commit one group of notes from the writer queue.",
+    buckets=_LATENCY_BUCKETS,
+)
+PERSISTENCE_QUEUE_DEPTH = Gauge(
+    "persistence_queue_depth",
+    "Notes waiting in the writer queue after the last group commit.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time a checkout waited to get a connection from the pool (including pre-ping and reconnects).",
+    ["pool"],
+    buckets=_POOL_WAIT_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT because the pool was exhausted.",
+    ["pool"],
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connections currently checked out of the pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity",
+    "Connections the pool may open (DB_POOL_SIZE + DB_MAX_OVERFLOW).",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation",
+    "Fraction of the pool capacity in use; the busiest worker when aggregated.",
+    ["pool"],
+    multiprocess_mode="livemax",
+)
+
+# Scrapes are not interesting and would dominate the low-latency buckets
+_IGNORED_ENDPOINTS = {"metrics"}
+
+
+def _endpoint() -> str:
+    return request.endpoint or "nao_encontrado"
+
+
+def _parse_request_start(valor: str | None) -> float | None:
+    """Convert an ``X-Request-Start`` header (s, ms or µs, optional ``t=``) to epoch seconds."""
+    if not valor:
+        return None
+    try:
+        instante = float(valor.strip().removeprefix("t="))
+    except ValueError:
+        return None
+    if instante > 1e14:
+        return instante / 1_000_000
+    if instante > 1e11:
+        return instante / 1_000
+    return instante
+
+
+def _before_request() -> None:
+    if request.endpoint in _IGNORED_ENDPOINTS:
+        return
+    g._metrics_start = time.perf_counter()
+    g._metrics_db = [0, 0.0]
+    REQUESTS_IN_PROGRESS.labels(request.method, _endpoint()).inc()
+
+    inicio_proxy = _parse_request_start(request.headers.get("X-Request-Start"))
+    if inicio_proxy is not None:
+        REQUEST_QUEUE_TIME.observe(max(time.time() - inicio_proxy, 0.0))
+
+
+def _after_request(response: Response) -> Response:
+    g._metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(_exc: BaseException | None) -> None:
+    inicio = g.pop("_metrics_start", None)
+    if inicio is None:
+        return
+    endpoint = _endpoint()
+    status = str(g.pop("_metrics_status", 500))
+    REQUESTS_IN_PROGRESS.labels(request.method, endpoint).dec()
+    REQUEST_LATENCY.labels(request.method, endpoint, status).observe(time.perf_counter() - inicio)
+
+    quantidade, duracao = g.pop("_metrics_db", (0, 0.0))
+    DB_QUERIES.labels(endpoint).observe(quantidade)
+    DB_TIME.labels(endpoint).observe(duracao)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, _cursor, _statement, _parameters, context, _executemany) -> None:
+    # Kept on the execution context rather than the connection: after_cursor_execute
+    # does not fire for failed statements, and nothing must be left behind for them
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, _cursor, _statement, _parameters, context, _executemany) -> None:
+    inicio = getattr(context, "_metrics_start", None)
+    if inicio is None or not has_request_context():
+        return
+    acumulado = g.get("_metrics_db")
+    if acumulado is not None:
+        acumulado[0] += 1
+        acumulado[1] += time.perf_counter() - inicio
+
+
+@on_pool_event
+def _observe_pool(pool, waited: float | None, timed_out: bool) -> None:
+    # Primary and replica pools live side by side; the label keeps their gauges apart
+    papel = pool.role
+    if waited is not None:
+        DB_POOL_CHECKOUT.labels(papel).observe(waited)
+    if timed_out:
+        DB_POOL_TIMEOUTS.labels(papel).inc()
+    em_uso = pool.checkedout()
+    DB_POOL_IN_USE.labels(papel).set(em_uso)
+    if pool.capacity:
+        DB_POOL_CAPACITY.labels(papel).set(pool.capacity)
+        DB_POOL_SATURATION.labels(papel).set(em_uso / pool.capacity)
+
+
+def observe_identity_cache(tabela: str, resultado: str) -> None:
+    """Observer for ``CacheIdentidades``: counts each lookup by table and outcome."""
+    IDENTITY_CACHE_LOOKUPS.labels(tabela, resultado).inc()
+
+
+def observe_group_commit(notas: int, duracao: float, pendentes: int) -> None:
+    """Observer for ``FilaGravacao``: committed notes, commit time and queue depth."""
+    PERSISTENCE_COMMITTED_NOTES.inc(notas)
+    PERSISTENCE_GROUP_COMMIT.observe(duracao)
+    PERSISTENCE_QUEUE_DEPTH.set(pendentes)
+
+
+def metrics_response() -> Response:
+    """Render every collected metric in the Prometheus text exposition format."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app: Flask) -> None:
+    """Attach the request hooks and expose ``GET /metrics`` on ``app``."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", endpoint="metrics", view_func=metrics_response, methods=["GET"])
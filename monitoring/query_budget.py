@@ -0,0 +1,103 @@
+"""Per-request SQL statement budget and N+1 detection.
+
+Every statement executed while a request is active is fingerprinted (literals
+and parameter lists collapsed). After the view returns, routes that executed
+more than ``QUERY_BUDGET`` statements, or repeated the same fingerprint at
+least ``QUERY_REPEAT_LIMIT`` times (the usual shape of a lazy load inside a
+loop), are logged with the offending fingerprints. With ``QUERY_BUDGET_STRICT``
+enabled the request fails with :class:`QueryBudgetExceeded` instead, which is
+what the test suite uses to catch query-count regressions.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from collections import Counter
+from typing import Callable, TypeVar
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = r"(?:\?|%\(\w+\)s|%s|:\w+|__\[POSTCOMPILE_\w+\])"
+_PARAM_LIST = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when a request breaks its statement budget."""
+
+
+def fingerprint(statement: str) -> str:
+    """Normalise ``statement`` so executions that differ only by values compare equal."""
+    normalizado = _STRING_LITERAL.sub("?", statement)
+    normalizado = _NUMBER_LITERAL.sub("?", normalizado)
+    normalizado = _PARAM_LIST.sub("(...)", normalizado)
+    return _WHITESPACE.sub(" ", normalizado).strip()
+
+
+def query_budget(limite: int) -> Callable[[F], F]:
+    """Override the statement budget of a single view."""
+
+    def decorator(view: F) -> F:
+        view._query_budget = limite
+        return view
+
+    return decorator
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(_conn, _cursor, statement, _parameters, _context, _executemany) -> None:
+    if not has_request_context():
+        return
+    registro = g.get("_query_budget_log")
+    if registro is not None:
+        registro.append(fingerprint(statement))
+
+
+def _start_recording() -> None:
+    g._query_budget_log = []
+
+
+def _budget_for_endpoint() -> int:
+    view = current_app.view_functions.get(request.endpoint or "")
+    return getattr(view, "_query_budget", current_app.config["QUERY_BUDGET"])
+
+
+def _check_budget(response: Response) -> Response:
+    registro = g.pop("_query_budget_log", None)
+    if not registro:
+        return response
+
+    limite = _budget_for_endpoint()
+    limite_repeticao = current_app.config["QUERY_REPEAT_LIMIT"]
+    repetidas = [(sql, total) for sql, total in Counter(registro).most_common() if total >= limite_repeticao]
+    if len(registro) <= limite and not repetidas:
+        return response
+
+    detalhes = "".join(f"\n  {total}x {sql}" for sql, total in repetidas[:5])
+    mensagem = (
+        f"{request.method} {request.path} ({request.endpoint}) executou {len(registro)} "
+        f"instruções SQL (orçamento {limite}){detalhes}"
+    )
+    if current_app.config["QUERY_BUDGET_STRICT"]:
+        raise QueryBudgetExceeded(mensagem)
+    logger.warning(mensagem)
+    return response
+
+
+def init_query_budget(app: Flask) -> None:
+    """Enable statement counting for ``app`` using the ``QUERY_*`` settings."""
+    app.config.setdefault("QUERY_BUDGET", int(os.getenv("QUERY_BUDGET", "30")))
+    app.config.setdefault("QUERY_REPEAT_LIMIT", int(os.getenv("QUERY_REPEAT_LIMIT", "5")))
+    app.config.setdefault("QUERY_BUDGET_STRICT", os.getenv("QUERY_BUDGET_STRICT", "0") == "1")
+    app.before_request(_start_recording)
+    app.after_request(_check_budget)
@@ -0,0 +1,173 @@
+# scripts/benchmark_particionamento.py
+"""Compara consultas por janela de vencimento em parcelas comuns e particionadas (PostgreSQL).
+
+Gera ``--linhas`` parcelas sintéticas (10 milhões por padrão) com vencimentos
+espalhados pelos últimos ``--anos`` anos num schema descartável, com os mesmos
+índices de ``parcelas_contas``. Uma cópia é convertida com
+``database.partitioning.partition_table`` (o tempo da conversão também é
+medido) e as consultas das intenções do RAG rodam nas duas tabelas. O
+relatório mostra a mediana de cada consulta e quantas partições o planner
+realmente leu.
+
+Uso:
+    python scripts/benchmark_particionamento.py
+    python scripts/benchmark_particionamento.py --linhas 1000000 --granularidade month --rodadas 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from database.connection import engine  # noqa: E402
+from database.partitioning import GRANULARITIES, partition_table  # noqa: E402
+
+SCHEMA = "benchmark_particionamento"
+
+_TABELA = """
+CREATE TABLE {nome} (
+    "idParcelasContas" bigserial PRIMARY KEY,
+    "MovimentoContas_idMovimentoContas" integer NOT NULL,
+    datavencimento date,
+    valorparcela numeric(14, 2),
+    valorsaldo numeric(14, 2),
+    statusparcela varchar(45)
+)
+"""
+
+_INDICES = (
+    'CREATE INDEX {nome}_movimento_vencimento ON {nome} ("MovimentoContas_idMovimentoContas", datavencimento)',
+    "CREATE INDEX {nome}_em_aberto ON {nome} (datavencimento) WHERE valorsaldo > 0",
+)
+
+
+def consultas(hoje: date) -> list[tuple[str, str]]:
+    """``(descrição, SQL)`` das janelas usadas pelo RAG e pelos relatórios de parcelas."""
+    inicio_mes = hoje.replace(day=1)
+    return [
+        (
+            "vencidas nos últimos 30 dias",
+            f"SELECT count(*), sum(valorsaldo) FROM {{tabela}} WHERE valorsaldo > 0 "
+            f"AND datavencimento >= '{hoje - timedelta(days=30)}' AND datavencimento < '{hoje}'",
+        ),
+        (
+            "vencendo nos próximos 30 dias",
+            f"SELECT count(*), sum(valorparcela) FROM {{tabela}} "
+            f"WHERE datavencimento BETWEEN '{hoje}' AND '{hoje + timedelta(days=30)}'",
+        ),
+        (
+            "mês corrente",
+            f"SELECT statusparcela, count(*), sum(valorparcela) FROM {{tabela}} "
+            f"WHERE datavencimento >= '{inicio_mes}' AND datavencimento < '{(inicio_mes + timedelta(days=32)).replace(day=1)}' "
+            f"GROUP BY statusparcela",
+        ),
+        (
+            "últimos 180 dias",
+            f"SELECT sum(valorparcela) FROM {{tabela}} WHERE datavencimento >= '{hoje - timedelta(days=180)}'",
+        ),
+        (
+            "parcelas de um movimento (sem a chave)",
+            "SELECT * FROM {tabela} WHERE \"MovimentoContas_idMovimentoContas\" = 12345",
+        ),
+    ]
+
+
+def _carregar(conexao: Connection, nome: str, linhas: int, anos: int) -> float:
+    inicio = time.perf_counter()
+    conexao.execute(text(_TABELA.format(nome=nome)))
+    # Vencimentos uniformes na janela; metade das parcelas já quitadas
+    conexao.execute(
+        text(
+            f"INSERT INTO {nome} (\"MovimentoContas_idMovimentoContas\", datavencimento, valorparcela, valorsaldo, statusparcela) "
+            "SELECT g / 3, current_date - (random() * :dias)::int + 60, round((random() * 5000)::numeric, 2), "
+            "CASE WHEN random() < 0.5 THEN 0 ELSE round((random() * 5000)::numeric, 2) END, "
+            "CASE WHEN random() < 0.5 THEN 'PAGO' ELSE 'PENDENTE' END "
+            "FROM generate_series(1, :linhas) AS g"
+        ),
+        {"dias": anos * 365, "linhas": linhas},
+    )
+    for indice in _INDICES:
+        conexao.execute(text(indice.format(nome=nome)))
+    conexao.execute(text(f"ANALYZE {nome}"))
+    return time.perf_counter() - inicio
+
+
+def _medir(conexao: Connection, sql: str, rodadas: int) -> tuple[float, int]:
+    """Mediana em ms e número de tabelas (partições) lidas pelo plano."""
+    tempos = []
+    relacoes: set[str] = set()
+    for _ in range(rodadas):
+        bruto = conexao.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()
+        plano = bruto if isinstance(bruto, list) else json.loads(bruto)
+        tempos.append(plano[0]["Execution Time"])
+        relacoes = set(_relacoes_lidas(plano[0]["Plan"]))
+    return statistics.median(tempos), len(relacoes)
+
+
+def _relacoes_lidas(no: dict):
+    # Partições podadas em execução aparecem no plano com "Actual Loops" = 0
+    if "Relation Name" in no and no.get("Actual Loops", 1):
+        yield no["Relation Name"]
+    for filho in no.get("Plans", ()):
+        yield from _relacoes_lidas(filho)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mede o efeito do particionamento por vencimento.")
+    parser.add_argument("--linhas", type=int, default=10_000_000, help="Parcelas geradas em cada tabela")
+    parser.add_argument("--anos", type=int, default=10, help="Anos cobertos pelos vencimentos")
+    parser.add_argument("--granularidade", choices=GRANULARITIES, default="year")
+    parser.add_argument("--rodadas", type=int, default=5, help="Execuções por consulta (mediana reportada)")
+    parser.add_argument("--manter", action="store_true", help=f"Não apaga o schema {SCHEMA} ao final")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("O benchmark precisa de PostgreSQL (DATABASE_URL).")
+        return 1
+
+    with engine.connect() as conexao:
+        conexao.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conexao.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conexao.execute(text(f"SET search_path TO {SCHEMA}"))
+        conexao.commit()
+        try:
+            print(f"Gerando {args.linhas:,} parcelas em cada tabela...")
+            carga_comum = _carregar(conexao, "parcelas_comum", args.linhas, args.anos)
+            _carregar(conexao, "parcelas_particionada", args.linhas, args.anos)
+            conexao.commit()
+
+            inicio = time.perf_counter()
+            particoes = partition_table(conexao, "parcelas_particionada", "datavencimento", args.granularidade)
+            conexao.commit()
+            conversao = time.perf_counter() - inicio
+            print(f"Carga: {carga_comum:.1f}s por tabela; conversão em {len(particoes)} partições "
+                  f"({args.granularidade}): {conversao:.1f}s\n")
+
+            print(f"{'consulta':<42}{'comum (ms)':>12}{'particionada (ms)':>20}{'partições lidas':>18}")
+            for descricao, sql in consultas(date.today()):
+                comum, _ = _medir(conexao, sql.format(tabela="parcelas_comum"), args.rodadas)
+                particionada, lidas = _medir(conexao, sql.format(tabela="parcelas_particionada"), args.rodadas)
+                print(f"{descricao:<42}{comum:>12.1f}{particionada:>20.1f}{lidas:>11} de {len(particoes) + 1}")
+        finally:
+            conexao.rollback()
+            if not args.manter:
+                conexao.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conexao.execute(text("RESET search_path"))
+            conexao.commit()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
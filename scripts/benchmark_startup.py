@@ -0,0 +1,116 @@
+# scripts/benchmark_startup.py
+"""Mede o tempo de inicialização da aplicação.
+
+Cada rodada sobe um interpretador novo (como um worker recém-criado) com
+``-X importtime``, importa ``app`` e atende a primeira requisição pelo
+cliente de testes do Flask. O relatório mostra o tempo até a primeira
+resposta e os módulos mais caros de importar, para que regressões de cold
+start apareçam antes do deploy.
+
+Uso:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --rodadas 5 --top 15 --rota /status_api_key
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# Executado no processo filho: imprime uma linha JSON com os tempos medidos
+_PROGRAMA_FILHO = """
+import json, sys, time
+inicio = time.perf_counter()
+from app import app
+importado = time.perf_counter()
+resposta = app.test_client().get(sys.argv[1])
+fim = time.perf_counter()
+print(json.dumps({"import_app": importado - inicio, "primeira_requisicao": fim - inicio,
+                  "status": resposta.status_code}))
+"""
+
+
+def _parse_importtime(stderr: str) -> dict[str, float]:
+    """Tempo acumulado (s) de cada import de até dois níveis, a partir de ``-X importtime``.
+
+    O nível 0 são os imports feitos pelo próprio ``-c`` (``app``, ``site``...); o
+    nível 1 são os módulos que eles importam diretamente.
+    """
+    modulos: dict[str, float] = {}
+    for linha in stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        try:
+            _proprio, acumulado, nome = linha[len("import time:"):].split("|")
+            profundidade = (len(nome) - len(nome.lstrip())) // 2
+            if profundidade <= 1:
+                modulos[nome.strip()] = int(acumulado) / 1e6
+        except ValueError:
+            continue
+    return modulos
+
+
+def _rodada(rota: str) -> tuple[dict, dict[str, float]]:
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROGRAMA_FILHO, rota],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    linhas = [linha for linha in processo.stdout.splitlines() if linha.startswith("{")]
+    if processo.returncode != 0 or not linhas:
+        raise RuntimeError(f"Falha ao iniciar a aplicação:\n{processo.stderr[-2000:]}")
+    return json.loads(linhas[-1]), _parse_importtime(processo.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mede import e tempo até a primeira requisição.")
+    parser.add_argument("--rodadas", type=int, default=3, help="Processos medidos (mediana reportada)")
+    parser.add_argument("--top", type=int, default=20, help="Quantidade de módulos no ranking")
+    parser.add_argument("--rota", default="/status_api_key", help="Rota usada como primeira requisição")
+    parser.add_argument("--json", action="store_true", help="Emite o resultado em JSON (para CI)")
+    args = parser.parse_args()
+
+    # Uma rodada descartada aquece o cache de bytecode e o cache de disco do SO
+    _rodada(args.rota)
+    tempos, importacoes = [], []
+    for _ in range(max(args.rodadas, 1)):
+        tempo, modulos = _rodada(args.rota)
+        tempos.append(tempo)
+        importacoes.append(modulos)
+
+    import_app = statistics.median(t["import_app"] for t in tempos)
+    primeira = statistics.median(t["primeira_requisicao"] for t in tempos)
+    nomes = set().union(*importacoes)
+    ranking = sorted(
+        ((nome, statistics.median(m.get(nome, 0.0) for m in importacoes)) for nome in nomes),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+
+    if args.json:
+        print(json.dumps({
+            "import_app_s": round(import_app, 4),
+            "primeira_requisicao_s": round(primeira, 4),
+            "status": tempos[-1]["status"],
+            "modulos": {nome: round(acumulado, 4) for nome, acumulado in ranking},
+        }, indent=2))
+        return 0
+
+    print(f"import app:            {import_app * 1000:8.1f} ms")
+    print(f"primeira requisição:   {primeira * 1000:8.1f} ms  ({args.rota} -> {tempos[-1]['status']})")
+    print(f"\nMódulos mais caros (tempo acumulado, mediana de {len(tempos)} rodadas):")
+    for nome, acumulado in ranking:
+        print(f"  {acumulado * 1000:8.1f} ms  {nome}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
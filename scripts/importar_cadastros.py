@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Importa pessoas ou classificações em massa a partir de um arquivo CSV."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from agents.AgentePersistencia.importacao import ImportadorCadastros  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Carga em massa de cadastros via CSV.")
+    parser.add_argument("cadastro", choices=["pessoas", "classificacoes"], help="Cadastro de destino")
+    parser.add_argument("arquivo", type=Path, help="Arquivo CSV (UTF-8, separado por vírgula ou ponto e vírgula)")
+    parser.add_argument("--encoding", default="utf-8-sig", help="Codificação do arquivo (padrão: utf-8-sig)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    importador = ImportadorCadastros()
+    importar = (
+        importador.importar_pessoas if args.cadastro == "pessoas" else importador.importar_classificacoes
+    )
+
+    with args.arquivo.open(encoding=args.encoding, newline="") as arquivo:
+        resultado = importar(arquivo)
+
+    print(
+        f"Importação concluída: {resultado['inseridos']} inseridos, "
+        f"{resultado['atualizados']} atualizados, {resultado['rejeitados']} rejeitados."
+    )
+    for erro in resultado["erros"]:
+        print(f"  linha {erro['linha']}: {erro['motivo']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
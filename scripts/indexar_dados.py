@@ -9,11 +9,13 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from agents.consulta_rag.processador import ConsultaRagAgent  # noqa: E402
+from database.connection import ReplicaSessionLocal  # noqa: E402
 
 
 def main() -> int:
     try:
-        agent = ConsultaRagAgent()
+        # A varredura completa lê da réplica, quando houver, sem disputar o primário
+        agent = ConsultaRagAgent(leitura_session_factory=ReplicaSessionLocal)
         result = agent.indexar_movimentos_para_chroma()
         print("Indexação finalizada:", result)
         return 0
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Lança em massa notas já extraídas (JSON no formato devolvido por ``/extrair``)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from agents.AgentePersistencia.processador import PersistenciaAgent  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Lançamento de notas em lote.")
+    parser.add_argument(
+        "arquivos",
+        type=Path,
+        nargs="+",
+        help="Arquivos .json (uma nota ou uma lista de notas) ou .jsonl (uma nota por linha)",
+    )
+    parser.add_argument("--lote", type=int, default=500, help="Notas por transação (padrão: 500)")
+    return parser.parse_args()
+
+
+def _ler_notas(arquivos: list[Path]) -> list[dict]:
+    notas: list[dict] = []
+    for arquivo in arquivos:
+        conteudo = arquivo.read_text(encoding="utf-8")
+        if arquivo.suffix == ".jsonl":
+            notas.extend(json.loads(linha) for linha in conteudo.splitlines() if linha.strip())
+            continue
+        dados = json.loads(conteudo)
+        notas.extend(dados if isinstance(dados, list) else [dados])
+    return notas
+
+
+def main() -> int:
+    args = parse_args()
+    notas = _ler_notas(args.arquivos)
+    agente = PersistenciaAgent()
+    tamanho = max(args.lote, 1)
+
+    lancadas = 0
+    for inicio in range(0, len(notas), tamanho):
+        resultado = agente.lancar_contas_em_lote(notas[inicio:inicio + tamanho])
+        lancadas += len(resultado["lancadas"])
+        for erro in resultado["erros"]:
+            print(f"  nota {inicio + erro['indice'] + 1}: {erro['motivo']}")
+
+    print(f"Lançamento concluído: {lancadas} de {len(notas)} notas lançadas.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
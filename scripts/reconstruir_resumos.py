@@ -0,0 +1,23 @@
+# scripts/reconstruir_resumos.py
+"""Recalcula do zero as tabelas de resumo usadas pelo RAG (após cargas feitas fora da aplicação)."""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from database.connection import engine  # noqa: E402
+from database.rollups import rebuild_rollups  # noqa: E402
+
+
+def main() -> int:
+    linhas = rebuild_rollups(engine)
+    for tabela, quantidade in linhas.items():
+        print(f"{tabela}: {quantidade} linha(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
-"""Popula o banco PostgreSQL com dados sintéticos para testes e RAG."""
+"""Popula o banco PostgreSQL com dados sintéticos para testes e RAG.
+
+Com ``--em-massa`` os movimentos são gerados em lotes de tuplas, sem objetos
+ORM, e gravados com ``COPY`` no PostgreSQL (``executemany`` com
+insertmanyvalues nos demais bancos), opcionalmente em vários processos.
+Cada lote tem a própria semente derivada de ``--seed``, então o conteúdo
+não depende de quantos processos foram usados.
+"""
 
 from __future__ import annotations
 
 import argparse
+import csv
+import io
 import random
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
@@ -15,6 +26,8 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from faker import Faker  # noqa: E402
+from sqlalchemy import Table, insert, text  # noqa: E402
+from sqlalchemy.engine import Connection  # noqa: E402
 
 from config.settings import REGRAS_DE_CLASSIFICACAO  # noqa: E402
 from database.connection import Base, SessionLocal, engine  # noqa: E402
@@ -23,7 +36,10 @@ from database.models import (  # noqa: E402
     MovimentoContas,
     ParcelasContas,
     Pessoas,
+    movimento_classificacao_association,
 )
+from database.rollups import rebuild_rollups  # noqa: E402
+from database.versioning import bump_table_versions  # noqa: E402
 
 DESPESA_CLASSIFICACOES = list(REGRAS_DE_CLASSIFICACAO.keys()) + ["LOGÍSTICA AGRÍCOLA"]
 
@@ -94,8 +110,16 @@ AGRO_ITENS = [
     "kits de monitoramento",
 ]
 
+TIPOS_MOVIMENTO = ["PAGAR", "RECEBER"]
+
+STATUS_PARCELA = ["ABERTA", "LIQUIDADA", "PARCIAL"]
+
+_movimentos = MovimentoContas.__table__
+_parcelas = ParcelasContas.__table__
+_vinculos = movimento_classificacao_association
 
-def parse_args() -> argparse.Namespace:
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Gera registros fake de pessoas, classificações e movimentos."
     )
@@ -110,7 +134,15 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Ignora checagens e insere dados mesmo se já houver registros",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--em-massa",
+        action="store_true",
+        help="Gera os movimentos em lotes com COPY/executemany (volumes de benchmark)",
+    )
+    parser.add_argument("--lote", type=int, default=10_000, help="Movimentos por lote no modo em massa")
+    parser.add_argument("--processos", type=int, default=1, help="Processos de carga no modo em massa")
+    parser.add_argument("--dias", type=int, default=365, help="Janela de emissão (dias até hoje) no modo em massa")
+    return parser.parse_args(argv)
 
 
 def quantize(valor: float | Decimal) -> Decimal:
@@ -176,54 +208,77 @@ def seed_classificacoes(session, por_tipo: int) -> list[Classificacao]:
     return registros
 
 
-def escolher_classificacoes(movimento_tipo: str, classificacoes: list[Classificacao]) -> list[Classificacao]:
+def candidatas_por_tipo(movimento_tipo: str, classificacoes: list[Classificacao]) -> list[Classificacao]:
     alvo = "DESPESA" if movimento_tipo == "PAGAR" else "RECEITA"
     candidatas = [c for c in classificacoes if (c.tipo or "").upper() == alvo]
-    if not candidatas:
-        candidatas = classificacoes
-    quantidade = random.randint(1, min(3, len(candidatas)))
-    return random.sample(candidatas, quantidade)
+    return candidatas or classificacoes
 
 
-def distribuir_parcelas(valor_total: Decimal, data_base: date) -> list[ParcelasContas]:
+def sortear_classificacoes(rng, candidatas: list):
+    quantidade = rng.randint(1, min(3, len(candidatas)))
+    return rng.sample(candidatas, quantidade)
+
+
+def escolher_classificacoes(movimento_tipo: str, classificacoes: list[Classificacao]) -> list[Classificacao]:
+    return sortear_classificacoes(random, candidatas_por_tipo(movimento_tipo, classificacoes))
+
+
+def parcelas_em_centavos(rng, total: int, data_base: date) -> list[tuple]:
+    """``(identificação, vencimento, valor, pago, saldo, status)`` de cada parcela, valores em centavos."""
     parcelas = []
-    total_parcelas = random.randint(1, 4)
-    valor_base = quantize(valor_total / total_parcelas)
-    acumulado = Decimal("0.00")
+    total_parcelas = rng.randint(1, 4)
+    # Arredondamento half-up de total / total_parcelas
+    valor_base = (2 * total + total_parcelas) // (2 * total_parcelas)
 
     for indice in range(total_parcelas):
         if indice == total_parcelas - 1:
-            valor = quantize(valor_total - acumulado)
+            valor = total - valor_base * indice
         else:
             valor = valor_base
-            acumulado += valor
 
         vencimento = data_base + timedelta(days=30 * (indice + 1))
-        status = random.choice(["ABERTA", "LIQUIDADA", "PARCIAL"])
+        status = rng.choice(STATUS_PARCELA)
         if status == "LIQUIDADA":
             valor_pago = valor
-            valor_saldo = Decimal("0.00")
         elif status == "PARCIAL":
-            valor_pago = quantize(valor * Decimal("0.5"))
-            valor_saldo = quantize(valor - valor_pago)
+            valor_pago = (valor + 1) // 2
         else:
-            valor_pago = Decimal("0.00")
-            valor_saldo = valor
+            valor_pago = 0
 
         parcelas.append(
-            ParcelasContas(
-                identificacao=f"PARC-{indice + 1:02d}/{total_parcelas:02d}",
-                data_vencimento=vencimento,
-                valor_parcela=valor,
-                valor_pago=valor_pago,
-                valor_saldo=valor_saldo,
-                status_parcela=status,
+            (
+                f"PARC-{indice + 1:02d}/{total_parcelas:02d}",
+                vencimento,
+                valor,
+                valor_pago,
+                valor - valor_pago,
+                status,
             )
         )
 
     return parcelas
 
 
+def _reais(centavos: int) -> Decimal:
+    return Decimal(centavos).scaleb(-2)
+
+
+def distribuir_parcelas(valor_total: Decimal, data_base: date) -> list[ParcelasContas]:
+    return [
+        ParcelasContas(
+            identificacao=identificacao,
+            data_vencimento=vencimento,
+            valor_parcela=_reais(valor),
+            valor_pago=_reais(valor_pago),
+            valor_saldo=_reais(valor_saldo),
+            status_parcela=status,
+        )
+        for identificacao, vencimento, valor, valor_pago, valor_saldo, status in parcelas_em_centavos(
+            random, int(valor_total * 100), data_base
+        )
+    ]
+
+
 def seed_movimentos(
     session,
     faker: Faker,
@@ -232,7 +287,7 @@ def seed_movimentos(
     quantidade: int,
 ) -> None:
     for _ in range(quantidade):
-        movimento_tipo = random.choice(["PAGAR", "RECEBER"])
+        movimento_tipo = random.choice(TIPOS_MOVIMENTO)
         data_emissao = faker.date_between(start_date="-365d", end_date="today")
         valor_total = quantize(random.uniform(500, 20000))
 
@@ -265,8 +320,203 @@ def seed_movimentos(
         session.add(movimento)
 
 
-def main() -> int:
-    args = parse_args()
+def referencias_em_massa(buckets: dict[str, list[Pessoas]], classificacoes: list[Classificacao]) -> dict:
+    """Ids sorteáveis no modo em massa, com os mesmos fallbacks de ``seed_movimentos``."""
+    fornecedores = [p.id for p in buckets["FORNECEDOR"]]
+    clientes = [p.id for p in buckets["CLIENTE"]]
+    return {
+        "PAGAR": fornecedores or clientes,
+        "RECEBER": clientes or fornecedores,
+        "FATURADO": [p.id for p in buckets["FATURADO"]] or clientes or fornecedores,
+        "classificacoes": {
+            tipo: [c.id for c in candidatas_por_tipo(tipo, classificacoes)] for tipo in TIPOS_MOVIMENTO
+        },
+    }
+
+
+def gerar_lote(referencias: dict, indice: int, tamanho: int, semente: int, dias: int, hoje: date) -> tuple[list, list, list]:
+    """Gera ``tamanho`` movimentos com seus vínculos e parcelas como linhas de banco.
+
+    Vínculos e parcelas apontam para a posição do movimento no lote; os ids
+    só são conhecidos na gravação.
+    """
+    rng = random.Random(semente * 1_000_003 + indice)
+    # Sorteios por coluna para o lote inteiro; só classificações e parcelas dependem da linha
+    tipos = rng.choices(TIPOS_MOVIMENTO, k=tamanho)
+    emissoes = [hoje - timedelta(days=dia) for dia in rng.choices(range(dias + 1), k=tamanho)]
+    valores = [rng.randint(50_000, 2_000_000) for _ in range(tamanho)]
+    operacoes = rng.choices(AGRO_OPERACOES, k=tamanho)
+    itens = rng.choices(AGRO_ITENS, k=tamanho)
+    fornecedores = {tipo: rng.choices(referencias[tipo], k=tamanho) for tipo in TIPOS_MOVIMENTO}
+    faturados = rng.choices(referencias["FATURADO"], k=tamanho)
+
+    movimentos, vinculos, parcelas = [], [], []
+    for posicao in range(tamanho):
+        tipo = tipos[posicao]
+        movimentos.append(
+            {
+                "tipo": tipo,
+                # Única por semente, lote e posição: cargas repetidas com --force só precisam de outra --seed
+                "numeronotafiscal": f"S{semente}-{indice}-{posicao}",
+                "dataemissao": emissoes[posicao],
+                "descricao": f"{operacoes[posicao]} - {itens[posicao]}",
+                "status": "ATIVO",
+                "valortotal": _reais(valores[posicao]),
+                "Pessoas_idFornecedorCliente": fornecedores[tipo][posicao],
+                "Pessoas_idFaturado": faturados[posicao],
+            }
+        )
+        for classificacao_id in sortear_classificacoes(rng, referencias["classificacoes"][tipo]):
+            vinculos.append((posicao, classificacao_id))
+        for identificacao, vencimento, valor, valor_pago, valor_saldo, status in parcelas_em_centavos(
+            rng, valores[posicao], emissoes[posicao]
+        ):
+            parcelas.append(
+                (posicao, identificacao, vencimento, _reais(valor), _reais(valor_pago), _reais(valor_saldo), status)
+            )
+    return movimentos, vinculos, parcelas
+
+
+def _copiar(connection: Connection, tabela: Table, linhas: list[dict]) -> None:
+    """``COPY`` no PostgreSQL; nos demais bancos, ``executemany`` do SQLAlchemy."""
+    if connection.dialect.name != "postgresql":
+        connection.execute(insert(tabela), linhas)
+        return
+
+    colunas = list(linhas[0])
+    preparer = connection.dialect.identifier_preparer
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for linha in linhas:
+        writer.writerow([linha[coluna] for coluna in colunas])
+    buffer.seek(0)
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {preparer.format_table(tabela)} ({', '.join(preparer.quote(c) for c in colunas)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def gravar_lote(connection: Connection, movimentos: list[dict], vinculos: list[tuple], parcelas: list[tuple]) -> None:
+    if connection.dialect.name == "postgresql":
+        # COPY não devolve ids: reserva os ids do lote na sequence numa única ida ao banco
+        ids = connection.execute(
+            text(
+                "SELECT nextval(pg_get_serial_sequence('movimento_contas', '\"idMovimentoContas\"')) "
+                "FROM generate_series(1, :n)"
+            ),
+            {"n": len(movimentos)},
+        ).scalars().all()
+        _copiar(connection, _movimentos, [{"idMovimentoContas": i, **m} for i, m in zip(ids, movimentos)])
+    else:
+        ids = connection.execute(
+            insert(_movimentos).returning(_movimentos.c.idMovimentoContas, sort_by_parameter_order=True),
+            movimentos,
+        ).scalars().all()
+
+    _copiar(
+        connection,
+        _vinculos,
+        [
+            {"MovimentoContas_idMovimentoContas": ids[posicao], "Classificacao_idClassificacao": classificacao_id}
+            for posicao, classificacao_id in vinculos
+        ],
+    )
+    _copiar(
+        connection,
+        _parcelas,
+        [
+            {
+                "MovimentoContas_idMovimentoContas": ids[posicao],
+                "Identiticacao": identificacao,
+                "datavencimento": vencimento,
+                "valorparcela": valor,
+                "valorpago": valor_pago,
+                "valorsaldo": valor_saldo,
+                "statusparcela": status,
+            }
+            for posicao, identificacao, vencimento, valor, valor_pago, valor_saldo, status in parcelas
+        ],
+    )
+
+
+def carregar_lote(referencias: dict, indice: int, tamanho: int, semente: int, dias: int, hoje: date) -> tuple[int, int, int]:
+    """Gera e grava um lote na própria transação; devolve ``(movimentos, vínculos, parcelas)``."""
+    movimentos, vinculos, parcelas = gerar_lote(referencias, indice, tamanho, semente, dias, hoje)
+    with engine.begin() as connection:
+        gravar_lote(connection, movimentos, vinculos, parcelas)
+    return len(movimentos), len(vinculos), len(parcelas)
+
+
+def _iniciar_processo() -> None:
+    # Conexões herdadas do processo pai no fork não podem ser reaproveitadas
+    engine.dispose(close=False)
+
+
+def seed_movimentos_em_massa(
+    referencias: dict,
+    quantidade: int,
+    lote: int,
+    processos: int,
+    semente: int,
+    dias: int,
+) -> tuple[int, int, int]:
+    hoje = date.today()
+    tamanhos = [min(lote, quantidade - inicio) for inicio in range(0, quantidade, lote)]
+    tarefas = [(referencias, indice, tamanho, semente, dias, hoje) for indice, tamanho in enumerate(tamanhos)]
+    totais = [0, 0, 0]
+    concluidos = [0]
+    passo = max(1, len(tarefas) // 10)
+    inicio = time.perf_counter()
+
+    def registrar(contagens: tuple[int, int, int]) -> None:
+        for posicao, valor in enumerate(contagens):
+            totais[posicao] += valor
+        concluidos[0] += 1
+        if concluidos[0] % passo == 0 or concluidos[0] == len(tarefas):
+            decorrido = time.perf_counter() - inicio
+            print(f"  {totais[0]:,}/{quantidade:,} movimentos ({sum(totais) / decorrido:,.0f} linhas/s)")
+
+    if processos <= 1:
+        for tarefa in tarefas:
+            registrar(carregar_lote(*tarefa))
+    else:
+        engine.dispose()
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as executor:
+            for contagens in executor.map(carregar_lote, *zip(*tarefas)):
+                registrar(contagens)
+    return totais[0], totais[1], totais[2]
+
+
+def seed_em_massa(args: argparse.Namespace, referencias: dict) -> None:
+    semente = args.seed if args.seed is not None else 0
+    inicio = time.perf_counter()
+    movimentos, vinculos, parcelas = seed_movimentos_em_massa(
+        referencias, args.movimentos, args.lote, args.processos, semente, args.dias
+    )
+    carga = time.perf_counter() - inicio
+    linhas = movimentos + vinculos + parcelas
+    print(
+        f"Carga em massa: {movimentos:,} movimentos, {vinculos:,} vínculos e {parcelas:,} parcelas "
+        f"em {carga:.1f}s ({linhas / max(carga, 1e-9):,.0f} linhas/s)."
+    )
+
+    inicio = time.perf_counter()
+    # As gravações em massa não passam pelos eventos do ORM: resumos e versões são refeitos aqui
+    rebuild_rollups(engine)
+    with engine.begin() as connection:
+        bump_table_versions(connection, [_movimentos.name, _parcelas.name, _vinculos.name])
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(f"ANALYZE {_movimentos.name}, {_parcelas.name}, \"{_vinculos.name}\""))
+    print(f"Resumos do RAG e estatísticas atualizados em {time.perf_counter() - inicio:.1f}s.")
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
     faker = Faker("pt_BR")
     if args.seed is not None:
         random.seed(args.seed)
@@ -286,9 +536,13 @@ def main() -> int:
 
         pessoas = seed_pessoas(session, faker, args.fornecedores, args.clientes, args.faturados)
         classificacoes = seed_classificacoes(session, args.classificacoes)
-        seed_movimentos(session, faker, pessoas, classificacoes, args.movimentos)
-
-        session.commit()
+        if args.em_massa:
+            referencias = referencias_em_massa(pessoas, classificacoes)
+            session.commit()
+            seed_em_massa(args, referencias)
+        else:
+            seed_movimentos(session, faker, pessoas, classificacoes, args.movimentos)
+            session.commit()
         total_pessoas = sum(len(lista) for lista in pessoas.values())
         print(
             f"Seed concluído com sucesso: {total_pessoas} pessoas, "
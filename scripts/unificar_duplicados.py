@@ -0,0 +1,71 @@
+# scripts/unificar_duplicados.py
+"""Lista ou unifica pessoas, classificações e notas cadastradas em duplicidade.
+
+As migrações 0002 e 0004 já fazem a unificação antes de criar as chaves
+únicas; este script serve para conferir o banco antes do deploy (``--listar``)
+ou para unificar manualmente. Depois de unificar, os resumos do RAG são
+recalculados.
+
+Uso:
+    python scripts/unificar_duplicados.py --listar
+    python scripts/unificar_duplicados.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Optional, Sequence
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from database.connection import engine  # noqa: E402
+from database.merging import (  # noqa: E402
+    find_duplicates,
+    merge_duplicate_classificacoes,
+    merge_duplicate_movimentos,
+    merge_duplicate_pessoas,
+)
+from database.rollups import rebuild_rollups  # noqa: E402
+
+
+def _imprimir(tabela: str, grupos) -> None:
+    for sobrevivente, *repetidos in grupos:
+        print(f"{tabela}: {sobrevivente} fica, {', '.join(map(str, repetidos))} unificado(s)")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listar", action="store_true", help="só lista os duplicados, sem alterar o banco")
+    args = parser.parse_args(argv)
+
+    if args.listar:
+        with engine.connect() as connection:
+            duplicados = find_duplicates(connection)
+        for tabela, grupos in duplicados.items():
+            _imprimir(tabela, grupos)
+        total = sum(len(grupos) for grupos in duplicados.values())
+        print(f"{total} grupo(s) de duplicados encontrados.")
+        return 0
+
+    with engine.begin() as connection:
+        unificados = {
+            "pessoas": merge_duplicate_pessoas(connection),
+            "classificacao": merge_duplicate_classificacoes(connection),
+            "movimento_contas": merge_duplicate_movimentos(connection),
+        }
+    for tabela, grupos in unificados.items():
+        _imprimir(tabela, grupos)
+    if any(unificados.values()):
+        rebuild_rollups(engine)
+        print("Resumos do RAG recalculados.")
+    else:
+        print("Nenhum duplicado encontrado.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
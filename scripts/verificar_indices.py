@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Confere, via EXPLAIN, se as consultas mais frequentes usam os índices das migrações.
+
+Cada consulta do catálogo abaixo reproduz um filtro/ordenação real de
+``app.py``, do ``PersistenciaAgent`` ou do ``ConsultaRagAgent`` e indica o
+índice que deveria atendê-la. O script termina com código 1 se alguma delas
+não usar o índice esperado — útil no CI depois de mexer em consultas ou em
+``database/migrations.py``.
+
+Uso:
+    python scripts/verificar_indices.py
+"""
+
+from __future__ import annotations
+
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from database.explain import used_indexes  # noqa: E402
+from database.models import (  # noqa: E402
+    Classificacao,
+    MovimentoContas,
+    ParcelasContas,
+    Pessoas,
+    movimento_classificacao_association,
+)
+
+
+def consultas_quentes(session: Session) -> List[Tuple[str, Any, str]]:
+    """``(descrição, consulta, índice esperado)`` de cada consulta verificada."""
+
+    from app import _filtrar_classificacoes, _filtrar_contas, _filtrar_pessoas, _ordenar_listagem
+
+    hoje = date.today()
+    assoc = movimento_classificacao_association
+    return [
+        (
+            "pessoa por documento",
+            select(Pessoas.id).where(Pessoas.documento == "12345678000100"),
+            "uq_pessoas_documento",
+        ),
+        (
+            "classificação por descrição",
+            select(Classificacao.id).where(func.lower(Classificacao.descricao) == "insumos"),
+            "uq_classificacao_descricao_lower",
+        ),
+        (
+            "movimento por nota e fornecedor",
+            select(MovimentoContas.id).where(
+                MovimentoContas.numero_nota_fiscal == "NF-001",
+                MovimentoContas.fornecedor_id == 1,
+            ),
+            "uq_movimento_contas_nota_fornecedor",
+        ),
+        (
+            "listagem de contas",
+            _ordenar_listagem(_filtrar_contas(session, {})).limit(50),
+            "ix_movimento_contas_ativas_data",
+        ),
+        (
+            "listagem de pessoas",
+            _ordenar_listagem(_filtrar_pessoas(session, {})).limit(50),
+            "ix_pessoas_ativas_razaosocial",
+        ),
+        (
+            "listagem de classificações",
+            _ordenar_listagem(_filtrar_classificacoes(session, {})).limit(50),
+            "ix_classificacao_ativas_descricao",
+        ),
+        (
+            "parcelas dos movimentos",
+            select(ParcelasContas.id).where(ParcelasContas.movimento_id.in_([1, 2, 3])),
+            "ix_parcelas_contas_movimento_vencimento",
+        ),
+        (
+            "movimentos do fornecedor",
+            select(MovimentoContas.id).where(MovimentoContas.fornecedor_id == 1),
+            "ix_movimento_contas_fornecedor",
+        ),
+        (
+            "movimentos da classificação",
+            select(assoc.c.MovimentoContas_idMovimentoContas).where(assoc.c.Classificacao_idClassificacao == 1),
+            "ix_movimento_classificacao_classificacao",
+        ),
+        (
+            "total a pagar no período (RAG)",
+            select(func.sum(MovimentoContas.valor_total)).where(
+                MovimentoContas.data_emissao >= hoje - timedelta(days=30),
+                MovimentoContas.tipo == "PAGAR",
+            ),
+            "ix_movimento_contas_tipo_dataemissao",
+        ),
+        (
+            "movimentos no período (RAG)",
+            select(func.sum(MovimentoContas.valor_total)).where(
+                MovimentoContas.data_emissao.between(hoje - timedelta(days=90), hoje)
+            ),
+            "ix_movimento_contas_dataemissao",
+        ),
+        (
+            "parcelas vencidas (RAG)",
+            select(func.sum(ParcelasContas.valor_saldo)).where(
+                ParcelasContas.valor_saldo > 0,
+                ParcelasContas.data_vencimento < hoje,
+            ),
+            "ix_parcelas_contas_em_aberto",
+        ),
+    ]
+
+
+def verificar(session: Session) -> List[Tuple[str, str, set[str]]]:
+    """Retorna ``(descrição, índice esperado, índices usados)`` das consultas que falharam."""
+
+    falhas = []
+    for descricao, consulta, esperado in consultas_quentes(session):
+        usados = used_indexes(session, consulta)
+        if esperado not in usados:
+            falhas.append((descricao, esperado, usados))
+    return falhas
+
+
+def main() -> int:
+    from database.connection import SessionLocal
+
+    with SessionLocal() as session:
+        falhas = verificar(session)
+        total = len(consultas_quentes(session))
+        session.rollback()
+
+    for descricao, esperado, usados in falhas:
+        print(f"FALHOU  {descricao}: esperado {esperado}, usados {sorted(usados) or 'nenhum'}")
+    print(f"{total - len(falhas)} de {total} consultas usam o índice esperado.")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -83,6 +83,7 @@ call :ensure_env_var DB_PORT 5433
 call :ensure_env_var DB_NAME notas
 
 call :ensure_database_running
+if defined MIGRACOES_FALHARAM exit /b 1
 
 echo ==^> Garantindo diretorio uploads\
 if not exist uploads (
@@ -169,7 +170,8 @@ if errorlevel 1 (
 echo ==^> Aplicando migracoes/tabelas (database.init_db)...
 python -m database.init_db
 if errorlevel 1 (
-  echo AVISO: nao foi possivel criar as tabelas automaticamente.
+  echo ERRO: as migracoes do banco falharam; corrija o erro acima antes de iniciar a aplicacao.
+  set "MIGRACOES_FALHARAM=1"
 )
 goto :eof
 
@@ -185,7 +185,8 @@ ensure_database_running() {
   if wait_for_database; then
     echo "==> Aplicando migrações/tabelas (database.init_db)..."
     if ! python -m database.init_db; then
-      echo "AVISO: não foi possível criar as tabelas automaticamente."
+      echo "ERRO: as migrações do banco falharam; corrija o erro acima antes de iniciar a aplicação."
+      exit 1
     fi
   else
     echo "AVISO: prosseguindo sem aplicar database.init_db porque o banco não respondeu a tempo."
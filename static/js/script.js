@@ -9,9 +9,12 @@ const mensagemLancamento = document.getElementById("lancarMensagem");
 
 let dadosExtraidos = null;
 
-form.addEventListener("submit", async (e) => {
+form.addEventListener("submit", (e) => {
   e.preventDefault();
+  extrair(false);
+});
 
+async function extrair(reextrair) {
   limparResultado();
 
   const fileInput = document.getElementById("file");
@@ -22,6 +25,9 @@ form.addEventListener("submit", async (e) => {
 
   const formData = new FormData();
   formData.append("file", fileInput.files[0]);
+  if (reextrair) {
+    formData.append("reextrair", "1");
+  }
 
   try {
     const response = await fetch("/extrair", {
@@ -41,7 +47,7 @@ form.addEventListener("submit", async (e) => {
     mensagemLancamento.textContent = "Erro inesperado durante a extração.";
     console.error(error);
   }
-});
+}
 
 botaoLancar.addEventListener("click", async () => {
   if (!dadosExtraidos) {
@@ -95,7 +101,18 @@ function preencherResultados(data) {
       `).join("")}</ul>`
     : "<p>Não há itens informados</p>";
 
-  const html = `
+  const extracao = data._extracao || {};
+  const avisoHtml = extracao.reaproveitada
+    ? `
+    <div class="card status-card">
+        <h2>Documento já processado</h2>
+        <p>Esta nota já foi extraída${extracao.criado_em ? ` em ${extracao.criado_em.slice(0, 10)}` : ""}; os dados abaixo foram reaproveitados sem nova chamada ao Gemini.</p>
+        <p>${extracao.movimento_id ? `Já lançada como movimento nº ${extracao.movimento_id}.` : "Ainda não lançada no sistema."}</p>
+        <button type="button" id="reextrair" class="link-button secondary">EXTRAIR NOVAMENTE</button>
+    </div>`
+    : "";
+
+  const html = `${avisoHtml}
     <div class="card">
         <h2>Nota Fiscal</h2>
         <p><b>Número da Nota:</b> ${data.numeroNotaFiscal || "N/A"}</p>
@@ -142,6 +159,10 @@ function preencherResultados(data) {
   `;
 
   formatado.innerHTML = html;
+  const botaoReextrair = document.getElementById("reextrair");
+  if (botaoReextrair) {
+    botaoReextrair.addEventListener("click", () => extrair(true));
+  }
   renderizarVerificacao(data._verificacao, data);
 }
 
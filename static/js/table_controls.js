@@ -28,4 +28,46 @@ document.addEventListener('DOMContentLoaded', () => {
       form.submit();
     });
   });
+
+  document.querySelectorAll('.bulk-bar').forEach((bulkForm) => {
+    const formId = bulkForm.id;
+    const boxes = () => Array.from(document.querySelectorAll(`input[name="ids"][form="${formId}"]`));
+    const selectAll = document.querySelector(`input[data-role="bulk-all"][form="${formId}"]`);
+    const counter = bulkForm.querySelector('[data-role="bulk-count"]');
+    const actionSelect = bulkForm.querySelector('[data-role="bulk-action"]');
+    const submit = bulkForm.querySelector('[data-role="bulk-submit"]');
+
+    const refresh = () => {
+      const selected = boxes().filter((box) => box.checked).length;
+      if (counter) {
+        counter.textContent = `${selected} selecionada(s)`;
+      }
+      if (selectAll) {
+        selectAll.checked = selected > 0 && selected === boxes().length;
+      }
+      const action = actionSelect ? actionSelect.value : '';
+      bulkForm.querySelectorAll('[data-bulk-for]').forEach((field) => {
+        const active = field.dataset.bulkFor === action;
+        field.hidden = !active;
+        field.disabled = !active;
+      });
+      if (submit) {
+        submit.disabled = selected === 0 || !action;
+      }
+    };
+
+    if (selectAll) {
+      selectAll.addEventListener('change', () => {
+        boxes().forEach((box) => {
+          box.checked = selectAll.checked;
+        });
+        refresh();
+      });
+    }
+    boxes().forEach((box) => box.addEventListener('change', refresh));
+    if (actionSelect) {
+      actionSelect.addEventListener('change', refresh);
+    }
+    refresh();
+  });
 });
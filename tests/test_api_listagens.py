@@ -0,0 +1,116 @@
+"""Testes da API JSON de listagens (paginação por cursor e ETag)."""
+
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import app  # noqa: E402
+from database.models import Base, MovimentoContas, Pessoas  # noqa: E402
+from database.versioning import table_versions  # noqa: E402
+
+
+@pytest.fixture()
+def api_client(monkeypatch):
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    with factory() as session:
+        fornecedor = Pessoas(tipo="FORNECEDOR", razaosocial="Cooperativa Sul", documento="1", status="ATIVO")
+        session.add(fornecedor)
+        for indice in range(5):
+            session.add(
+                MovimentoContas(
+                    descricao=f"Movimento {indice}",
+                    numero_nota_fiscal=f"NF-{indice}",
+                    data_emissao=date(2024, 1, 1 + (indice % 3)),
+                    valor_total=Decimal("100.00"),
+                    status="ATIVO",
+                    fornecedor=fornecedor,
+                )
+            )
+        session.add(MovimentoContas(descricao="Sem data", status="ATIVO"))
+        session.commit()
+
+    monkeypatch.setattr("app.SessionLocal", factory)
+    yield app.test_client()
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def test_api_contas_pagina_por_cursor_sem_repetir(api_client):
+    vistos = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "sort": "data", "dir": "desc"}
+        if cursor:
+            params["cursor"] = cursor
+        body = api_client.get("/api/contas", query_string=params).get_json()
+        vistos.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(vistos) == 6
+    assert len(set(vistos)) == 6
+    completa = api_client.get("/api/contas", query_string={"limit": 50}).get_json()
+    assert [item["id"] for item in completa["items"]] == vistos
+    assert completa["items"][-1]["descricao"] == "Sem data"
+
+
+def test_api_contas_selecao_de_campos(api_client):
+    body = api_client.get("/api/contas", query_string={"fields": "descricao,fornecedor_nome"}).get_json()
+
+    assert set(body["items"][0]) == {"id", "descricao", "fornecedor_nome"}
+    invalido = api_client.get("/api/contas", query_string={"fields": "inexistente"})
+    assert invalido.status_code == 400
+
+
+def test_api_etag_retorna_304_ate_haver_escrita(api_client):
+    primeira = api_client.get("/api/pessoas")
+    etag = primeira.headers["ETag"]
+
+    repetida = api_client.get("/api/pessoas", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.data == b""
+
+    api_client.post("/pessoas/salvar", data={"tipo": "CLIENTE", "razaosocial": "Nova Pessoa"})
+
+    alterada = api_client.get("/api/pessoas", headers={"If-None-Match": etag})
+    assert alterada.status_code == 200
+    assert alterada.headers["ETag"] != etag
+    assert "Nova Pessoa" in {item["razaosocial"] for item in alterada.get_json()["items"]}
+
+
+def test_versao_da_tabela_so_muda_depois_do_commit():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    with factory() as session:
+        session.add(Pessoas(tipo="CLIENTE", razaosocial="Primeira", status="ATIVO"))
+        session.flush()
+        # A transação de escrita não toca (nem trava) a linha compartilhada de tabela_versoes
+        assert table_versions(session, ["pessoas"]) == {"pessoas": 0}
+        session.commit()
+        assert table_versions(session, ["pessoas"]) == {"pessoas": 1}
+
+        session.add(Pessoas(tipo="CLIENTE", razaosocial="Descartada", status="ATIVO"))
+        session.flush()
+        session.rollback()
+        assert table_versions(session, ["pessoas"]) == {"pessoas": 1}
+    engine.dispose()
+
+
+def test_api_recurso_ou_cursor_invalido(api_client):
+    assert api_client.get("/api/inexistente").status_code == 404
+    assert api_client.get("/api/contas", query_string={"cursor": "lixo"}).status_code == 400
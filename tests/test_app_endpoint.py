@@ -5,6 +5,7 @@ from __future__ import annotations
 import io
 import json
 import sys
+import threading
 from pathlib import Path
 
 import pytest
@@ -16,6 +17,8 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from app import app  # noqa: E402
+from agents.AgentePersistencia.extracoes import RegistroExtracoes  # noqa: E402
+from agents.AgentePersistencia.fila_gravacao import FilaCheia, FilaGravacao  # noqa: E402
 from agents.AgentePersistencia.processador import PersistenciaAgent  # noqa: E402
 from database.models import Base, Classificacao, MovimentoContas, ParcelasContas, Pessoas  # noqa: E402
 
@@ -30,6 +33,7 @@ def app_client(monkeypatch):
     test_agent = PersistenciaAgent(session_factory=session_factory)
 
     monkeypatch.setattr("app.persistencia_agent", test_agent)
+    monkeypatch.setattr("app.registro_extracoes", RegistroExtracoes(session_factory=session_factory))
 
     sample_payload = {
         "fornecedor": {"razaoSocial": "Fazenda Modelo", "cnpj": "12.345.678/0001-00"},
@@ -146,6 +150,87 @@ def test_extrair_json_invalido_retorna_500(app_client, monkeypatch):
     assert body["resposta"] == "{invalido"
 
 
+def _enviar_pdf(client, conteudo: bytes, **extra):
+    return client.post(
+        "/extrair",
+        data={"file": (io.BytesIO(conteudo), "nota.pdf"), **extra},
+        content_type="multipart/form-data",
+    )
+
+
+def test_extrair_mesmo_arquivo_reaproveita_extracao_sem_llm(app_client, monkeypatch):
+    client, *_ = app_client
+    primeira = _enviar_pdf(client, b"pdf repetido").get_json()
+
+    chamadas = []
+    monkeypatch.setattr("app.extrair_dados_com_llm", lambda _texto, **_kw: chamadas.append(1))
+    segunda = _enviar_pdf(client, b"pdf repetido").get_json()
+
+    assert chamadas == []
+    assert primeira["_extracao"]["reaproveitada"] is False
+    assert segunda["_extracao"]["reaproveitada"] is True
+    assert segunda["_extracao"]["id"] == primeira["_extracao"]["id"]
+    assert segunda["numeroNotaFiscal"] == primeira["numeroNotaFiscal"]
+    assert segunda["_verificacao"]["fornecedor"]["status"] == "NÃO EXISTE"
+
+
+def test_extrair_reconhece_chave_de_acesso_e_retorna_movimento_lancado(app_client, monkeypatch):
+    client, _, payload = app_client
+    chave = "3524 0512 3456 7800 0100 5500 1000 0001 2310 0000 1234"
+    monkeypatch.setattr("app.extrair_texto_pdf", lambda _stream: f"DANFE\nCHAVE DE ACESSO\n{chave}")
+
+    extraido = _enviar_pdf(client, b"primeira impressao").get_json()
+    lancamento = client.post("/lancar_conta", json={**payload, "_extracao": extraido["_extracao"]}).get_json()
+    monkeypatch.setattr("app.extrair_dados_com_llm", lambda _texto, **_kw: pytest.fail("LLM não deveria ser chamado"))
+    reenviado = _enviar_pdf(client, b"segunda impressao").get_json()
+
+    assert reenviado["_extracao"]["reaproveitada"] is True
+    assert reenviado["_extracao"]["movimento_id"] == lancamento["resultado"]["movimento_id"]
+
+
+def test_lancar_conta_so_vincula_extracao_entregue_a_sessao_e_sem_movimento(app_client):
+    client, session_factory, payload = app_client
+    extraido = _enviar_pdf(client, b"pdf original").get_json()["_extracao"]
+    primeiro = client.post("/lancar_conta", json={**payload, "_extracao": extraido}).get_json()
+
+    # Outro navegador não recebeu essa extração e não pode trocar o movimento vinculado
+    intruso = app.test_client()
+    intruso.post("/lancar_conta", json={**payload, "numeroNotaFiscal": "NF-777", "_extracao": extraido})
+    # Nem a mesma sessão reaproveita o id depois do vínculo
+    client.post("/lancar_conta", json={**payload, "numeroNotaFiscal": "NF-888", "_extracao": extraido})
+
+    with session_factory() as session:
+        assert session.scalar(select(MovimentoContas).where(MovimentoContas.numero_nota_fiscal == "NF-888"))
+    reenviado = _enviar_pdf(client, b"pdf original").get_json()["_extracao"]
+    assert reenviado["movimento_id"] == primeiro["resultado"]["movimento_id"]
+
+
+def test_extrair_com_reextrair_chama_llm_e_substitui_registro(app_client, monkeypatch):
+    client, _, payload = app_client
+    primeira = _enviar_pdf(client, b"pdf revisado").get_json()
+    monkeypatch.setattr("app.extrair_dados_com_llm",
+                        lambda _texto, **_kw: json.dumps({**payload, "numeroNotaFiscal": "NF-999"}))
+
+    reextraida = _enviar_pdf(client, b"pdf revisado", reextrair="1").get_json()
+    novamente = _enviar_pdf(client, b"pdf revisado").get_json()
+
+    assert reextraida["_extracao"]["reaproveitada"] is False
+    assert reextraida["_extracao"]["id"] == primeira["_extracao"]["id"]
+    assert novamente["numeroNotaFiscal"] == "NF-999"
+
+
+def test_reextrair_documento_lancado_mantem_o_movimento_vinculado(app_client):
+    client, _, payload = app_client
+    extraido = _enviar_pdf(client, b"pdf lancado").get_json()["_extracao"]
+    lancamento = client.post("/lancar_conta", json={**payload, "_extracao": extraido}).get_json()
+
+    reextraida = _enviar_pdf(client, b"pdf lancado", reextrair="1").get_json()["_extracao"]
+
+    assert reextraida["id"] == extraido["id"]
+    assert reextraida["reaproveitada"] is False
+    assert reextraida["movimento_id"] == lancamento["resultado"]["movimento_id"]
+
+
 def test_lancar_conta_persistencia_sucesso(app_client):
     client, session_factory, payload = app_client
 
@@ -189,3 +274,42 @@ def test_lancar_conta_falha_persistencia_retorna_500(app_client, monkeypatch):
     body = response.get_json()
     assert body["error"] == "Falha ao persistir dados"
     assert "falha test" in body["detalhes"]
+
+
+def test_lancar_conta_com_fila_de_gravacao_cheia_retorna_503(app_client, monkeypatch):
+    client, _, payload = app_client
+
+    class FilaLotada:
+        def lancar(self, _dados, timeout=None):
+            raise FilaCheia("fila de gravação cheia (1 notas)")
+
+    monkeypatch.setattr("app._FILA_GRAVACAO", True)
+    monkeypatch.setattr("app.fila_gravacao", FilaLotada())
+
+    response = client.post("/lancar_conta", json=payload)
+
+    assert response.status_code == 503
+    assert "Fila de gravação cheia" in response.get_json()["error"]
+
+
+def test_lancar_conta_com_fila_demorada_retorna_202_pendente(app_client, monkeypatch):
+    client, _, payload = app_client
+    liberar = threading.Event()
+
+    class AgenteLento:
+        def lancar_conta_pagar(self, _dados):
+            liberar.wait(5)
+            return {"movimento_id": 1}
+
+    fila = FilaGravacao(AgenteLento(), janela=0)
+    monkeypatch.setattr("app._FILA_GRAVACAO", True)
+    monkeypatch.setattr("app._FILA_GRAVACAO_TIMEOUT", 0.05)
+    monkeypatch.setattr("app.fila_gravacao", fila)
+    try:
+        response = client.post("/lancar_conta", json={"numeroNotaFiscal": "NF-LENTA"})
+    finally:
+        liberar.set()
+        fila.encerrar(5)
+
+    assert response.status_code == 202
+    assert response.get_json()["status"] == "pendente"
@@ -0,0 +1,64 @@
+"""Testes do pipeline de assets estáticos (URLs com hash e pré-compressão)."""
+
+from __future__ import annotations
+
+import gzip
+from pathlib import Path
+import sys
+
+import pytest
+from flask import Flask, render_template_string
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import app  # noqa: E402
+from assets import init_assets  # noqa: E402
+
+
+@pytest.fixture()
+def assets_app(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: #222; }\n" * 100)
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG fake")
+    teste = Flask(__name__, static_folder=str(tmp_path), static_url_path="/static")
+    init_assets(teste)
+    return teste
+
+
+def test_asset_url_usa_hash_do_conteudo(assets_app):
+    with assets_app.test_request_context():
+        url = render_template_string("{{ asset_url('css/site.css') }}")
+        assert url.startswith("/assets/css/site.") and url.endswith(".css")
+        assert render_template_string("{{ asset_url('nao/existe.js') }}") == "/static/nao/existe.js"
+
+    (Path(assets_app.static_folder) / "css" / "site.css").write_text("body { color: #000; }\n")
+    assets_app.extensions["asset_manifest"].reload()
+    with assets_app.test_request_context():
+        assert render_template_string("{{ asset_url('css/site.css') }}") != url
+
+
+def test_asset_servido_pre_comprimido_e_imutavel(assets_app):
+    client = assets_app.test_client()
+    with assets_app.test_request_context():
+        url = render_template_string("{{ asset_url('css/site.css') }}")
+
+    comprimido = client.get(url, headers={"Accept-Encoding": "gzip"})
+    simples = client.get(url, headers={"Accept-Encoding": "identity"})
+
+    assert comprimido.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(comprimido.data) == simples.data
+    assert "immutable" in comprimido.headers["Cache-Control"]
+    assert "Accept-Encoding" in comprimido.headers["Vary"]
+    assert "Content-Encoding" not in simples.headers
+    assert client.get(url, headers={"If-None-Match": simples.headers["ETag"]}).status_code == 304
+    assert client.get("/assets/css/site.000000000000.css").status_code == 404
+
+
+def test_layout_referencia_assets_com_hash():
+    response = app.test_client().get("/")
+
+    html = response.get_data(as_text=True)
+    assert "/assets/css/style." in html
+    assert "/static/css/style.css" not in html
@@ -0,0 +1,175 @@
+"""Testes do cache de IDs de pessoas e classificações do PersistenciaAgent."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from agents.AgentePersistencia.cache import CacheIdentidades  # noqa: E402
+from agents.AgentePersistencia.processador import PersistenciaAgent  # noqa: E402
+from database.models import Base, Pessoas  # noqa: E402
+from database.versioning import rows_changed_key  # noqa: E402
+
+PAYLOAD = {
+    "fornecedor": {"razaoSocial": "Fazenda Modelo", "cnpj": "12.345.678/0001-00"},
+    "faturado": {"nomeCompleto": "João da Silva", "cpf": "123.456.789-00"},
+    "numeroNotaFiscal": "NF-001",
+    "valorTotal": 100,
+    "classificacaoDespesa": ["Insumos", "Frete"],
+}
+
+
+@pytest.fixture()
+def ambiente():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    instrucoes = []
+    event.listen(engine, "before_cursor_execute", lambda *args: instrucoes.append(args[2]))
+    yield PersistenciaAgent(session_factory=factory), factory, instrucoes
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def test_verificacao_repetida_so_le_as_versoes(ambiente):
+    agent, _, instrucoes = ambiente
+    agent.lancar_conta_pagar(PAYLOAD)
+
+    agent.verificar_entidades(PAYLOAD)
+    instrucoes.clear()
+    verificacao = agent.verificar_entidades(PAYLOAD)
+
+    assert len(instrucoes) == 1 and "tabela_versoes" in instrucoes[0]
+    assert verificacao["fornecedor"]["status"] == "EXISTE"
+    assert [item["status"] for item in verificacao["classificacoes"]] == ["EXISTE", "EXISTE"]
+    estatisticas = agent.cache.estatisticas()
+    assert estatisticas["pessoas"]["hit"] >= 2
+    assert estatisticas["classificacao"]["taxa_acerto"] > 0
+
+
+def test_ausencia_em_cache_e_invalidada_pelo_lancamento(ambiente):
+    agent, _, instrucoes = ambiente
+
+    assert agent.verificar_entidades(PAYLOAD)["fornecedor"]["status"] == "NÃO EXISTE"
+    instrucoes.clear()
+    assert agent.verificar_entidades(PAYLOAD)["fornecedor"]["status"] == "NÃO EXISTE"
+    # As quatro ausências são conferidas com uma única leitura das versões das tabelas
+    assert len(instrucoes) == 1 and "tabela_versoes" in instrucoes[0]
+    assert agent.cache.estatisticas()["pessoas"]["negativo"] == 2
+
+    # A ausência em cache não impede a criação, e o commit do lançamento a invalida
+    resultado = agent.lancar_conta_pagar(PAYLOAD)
+    verificacao = agent.verificar_entidades(PAYLOAD)
+
+    assert verificacao["fornecedor"]["status"] == "EXISTE"
+    assert verificacao["fornecedor"]["id"] == resultado["fornecedor_id"]
+
+
+def test_ausencia_em_cache_nao_esconde_cadastro_de_outro_worker(ambiente):
+    agent, factory, _ = ambiente
+
+    assert agent.verificar_entidades(PAYLOAD)["fornecedor"]["status"] == "NÃO EXISTE"
+    # Outro processo cadastra o fornecedor: nada passa pelo cache deste, só a versão da tabela muda
+    with factory() as session:
+        session.execute(text("INSERT INTO pessoas (documento) VALUES ('12345678000100')"))
+        session.execute(text("INSERT INTO tabela_versoes (tabela, versao) VALUES ('pessoas', 1)"))
+        session.commit()
+    verificacao = agent.verificar_entidades(PAYLOAD)
+
+    assert verificacao["fornecedor"]["status"] == "EXISTE"
+    assert verificacao["faturado"]["status"] == "NÃO EXISTE"
+
+
+def _alterar_em_outro_worker(factory, sql):
+    # Como o flush de outro processo: a alteração e os dois contadores da tabela, sem passar por este cache
+    with factory() as session:
+        session.execute(text(sql))
+        for nome in ("pessoas", rows_changed_key("pessoas")):
+            session.execute(
+                text(
+                    "INSERT INTO tabela_versoes (tabela, versao) VALUES (:nome, 1) "
+                    "ON CONFLICT (tabela) DO UPDATE SET versao = tabela_versoes.versao + 1"
+                ),
+                {"nome": nome},
+            )
+        session.commit()
+
+
+def test_id_em_cache_nao_sobrevive_a_edicao_ou_exclusao_em_outro_worker(ambiente):
+    agent, factory, _ = ambiente
+    resultado = agent.lancar_conta_pagar(PAYLOAD)
+    assert agent.verificar_entidades(PAYLOAD)["fornecedor"]["id"] == resultado["fornecedor_id"]
+
+    _alterar_em_outro_worker(
+        factory, "UPDATE pessoas SET documento = '11111111000111' WHERE documento = '12345678000100'"
+    )
+
+    assert agent.verificar_entidades(PAYLOAD)["fornecedor"]["status"] == "NÃO EXISTE"
+    assert agent.verificar_entidades({"fornecedor": {"cnpj": "11111111000111"}})["fornecedor"]["id"] == (
+        resultado["fornecedor_id"]
+    )
+
+    pessoa_id = agent.get_or_create_pessoa({"cnpj": "55"})
+    assert agent.get_or_create_pessoa({"cnpj": "55"}, criar_se_ausente=False) == pessoa_id
+    _alterar_em_outro_worker(factory, "DELETE FROM pessoas WHERE documento = '55'")
+    assert agent.get_or_create_pessoa({"cnpj": "55"}, criar_se_ausente=False) is None
+
+
+def test_cadastro_novo_nao_esvazia_o_cache(ambiente):
+    agent, _, instrucoes = ambiente
+    agent.lancar_conta_pagar(PAYLOAD)
+    agent.verificar_entidades(PAYLOAD)
+
+    agent.get_or_create_pessoa({"cnpj": "99.999.999/0001-99"})
+    instrucoes.clear()
+    verificacao = agent.verificar_entidades(PAYLOAD)
+
+    assert verificacao["fornecedor"]["status"] == "EXISTE"
+    assert len(instrucoes) == 1 and "tabela_versoes" in instrucoes[0]
+
+
+def test_exclusao_e_rollback_nao_deixam_ids_invalidos_no_cache(ambiente):
+    agent, factory, _ = ambiente
+    pessoa_id = agent.get_or_create_pessoa({"cnpj": "99"})
+    assert agent.get_or_create_pessoa({"cnpj": "99"}, criar_se_ausente=False) == pessoa_id
+
+    with factory() as session:
+        session.delete(session.get(Pessoas, pessoa_id))
+        session.commit()
+    assert agent.get_or_create_pessoa({"cnpj": "99"}, criar_se_ausente=False) is None
+
+    with factory() as session:
+        agent.get_or_create_pessoa({"cnpj": "77"}, session=session)
+        session.rollback()
+    assert all(chave != "77" for _, chave in agent.cache._entradas)
+
+
+def test_cache_respeita_ttl_e_limite_de_tamanho():
+    agora = [0.0]
+    cache = CacheIdentidades(tamanho=2, ttl=10, relogio=lambda: agora[0])
+
+    versoes = {"pessoas": 1, rows_changed_key("pessoas"): 1}
+    cache.guardar("pessoas", "1", 1, versoes)
+    cache.guardar("pessoas", "2", None, versoes)
+    # Um cadastro novo invalida só a ausência
+    cadastro = {**versoes, "pessoas": 2}
+    assert cache.obter("pessoas", "1", cadastro) == (True, 1)
+    assert cache.obter("pessoas", "2", cadastro) == (False, None)
+    cache.guardar("pessoas", "2", None, versoes)
+    assert cache.obter("pessoas", "1", versoes) == (True, 1)
+    cache.guardar("pessoas", "3", 3, versoes)
+
+    assert cache.obter("pessoas", "2", versoes) == (False, None)
+    assert cache.obter("pessoas", "1", versoes) == (True, 1)
+    assert cache.obter("pessoas", "1", {**versoes, rows_changed_key("pessoas"): 2}) == (False, None)
+    cache.guardar("pessoas", "1", 1, versoes)
+    agora[0] = 11
+    assert cache.obter("pessoas", "1", versoes) == (False, None)
@@ -0,0 +1,99 @@
+"""Testes das ações em lote da tela de contas."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import app  # noqa: E402
+from database.models import Base, Classificacao, MovimentoContas, Pessoas  # noqa: E402
+
+
+@pytest.fixture()
+def lote(monkeypatch):
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    with factory() as session:
+        antigo = Pessoas(tipo="FORNECEDOR", razaosocial="Antigo", documento="1", status="ATIVO")
+        novo = Pessoas(tipo="FORNECEDOR", razaosocial="Novo", documento="2", status="ATIVO")
+        insumos = Classificacao(tipo="DESPESA", descricao="INSUMOS", status="ATIVO")
+        frete = Classificacao(tipo="DESPESA", descricao="FRETE", status="ATIVO")
+        session.add_all([antigo, novo, insumos, frete])
+        session.flush()
+        for indice in range(4):
+            session.add(MovimentoContas(descricao=f"Conta {indice}", status="ATIVO",
+                                        fornecedor=antigo, classificacoes=[insumos] if indice == 0 else []))
+        session.commit()
+
+    monkeypatch.setattr("app.SessionLocal", factory)
+    yield app.test_client(), factory, engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def _contar_instrucoes(engine):
+    instrucoes = []
+    event.listen(engine, "before_cursor_execute", lambda *args: instrucoes.append(args[2]))
+    return instrucoes
+
+
+def test_inativar_em_lote_usa_um_unico_update(lote):
+    client, factory, engine = lote
+    instrucoes = _contar_instrucoes(engine)
+
+    response = client.post("/contas/lote", data={"acao": "status", "status": "INATIVO", "ids": ["1", "2", "3"]})
+
+    assert response.status_code == 302
+    updates = [sql for sql in instrucoes if sql.startswith("UPDATE movimento_contas")]
+    assert len(updates) == 1
+    with factory() as session:
+        status = dict(session.execute(select(MovimentoContas.id, MovimentoContas.status)).all())
+    assert status == {1: "INATIVO", 2: "INATIVO", 3: "INATIVO", 4: "ATIVO"}
+
+
+def test_classificar_em_lote_nao_duplica_vinculos(lote):
+    client, factory, _ = lote
+
+    client.post("/contas/lote", data={"acao": "classificar", "classificacao_id": "2", "ids": ["1", "2"]})
+    client.post("/contas/lote", data={"acao": "classificar", "classificacao_id": "2", "ids": ["1", "2"]})
+
+    with factory() as session:
+        conta = session.get(MovimentoContas, 1)
+        assert sorted(c.descricao for c in conta.classificacoes) == ["FRETE", "INSUMOS"]
+        assert [c.descricao for c in session.get(MovimentoContas, 2).classificacoes] == ["FRETE"]
+
+    client.post("/contas/lote", data={"acao": "classificar", "classificacao_id": "2", "modo": "substituir", "ids": ["1"]})
+    with factory() as session:
+        assert [c.descricao for c in session.get(MovimentoContas, 1).classificacoes] == ["FRETE"]
+
+
+def test_trocar_fornecedor_em_lote_e_rejeita_fornecedor_inexistente(lote):
+    client, factory, _ = lote
+
+    client.post("/contas/lote", data={"acao": "fornecedor", "fornecedor_id": "2", "ids": ["2", "4"]})
+    client.post("/contas/lote", data={"acao": "fornecedor", "fornecedor_id": "99", "ids": ["1"]})
+
+    with factory() as session:
+        fornecedores = dict(session.execute(select(MovimentoContas.id, MovimentoContas.fornecedor_id)).all())
+    assert fornecedores == {1: 1, 2: 2, 3: 1, 4: 2}
+
+
+def test_classificar_em_lote_muda_o_etag_da_api_de_contas(lote):
+    client, _, _ = lote
+    etag = client.get("/api/contas").headers["ETag"]
+
+    client.post("/contas/lote", data={"acao": "classificar", "classificacao_id": "2", "ids": ["3"]})
+
+    # O lote só grava a tabela de vínculos, que também compõe o ETag de /api/contas
+    resposta = client.get("/api/contas", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
@@ -0,0 +1,96 @@
+"""Testes da exportação CSV de movimentos."""
+
+from __future__ import annotations
+
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import app  # noqa: E402
+from database.models import Base, Classificacao, MovimentoContas, ParcelasContas, Pessoas  # noqa: E402
+
+
+@pytest.fixture()
+def export_client(monkeypatch):
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    with factory() as session:
+        fornecedor = Pessoas(tipo="FORNECEDOR", razaosocial="Cooperativa Sul", documento="1", status="ATIVO")
+        faturado = Pessoas(tipo="FATURADO", fantasia="Fazenda Norte", documento="2", status="ATIVO")
+        insumos = Classificacao(tipo="DESPESA", descricao="INSUMOS", status="ATIVO")
+        frete = Classificacao(tipo="DESPESA", descricao="FRETE", status="ATIVO")
+        for indice in range(5):
+            movimento = MovimentoContas(
+                tipo="PAGAR",
+                descricao=f"Compra {indice}",
+                numero_nota_fiscal=f"NF-{indice}",
+                data_emissao=date(2024, 3, indice + 1),
+                valor_total=Decimal("300.00"),
+                status="ATIVO" if indice else "INATIVO",
+                fornecedor=fornecedor,
+                faturado=faturado,
+                classificacoes=[insumos, frete],
+            )
+            movimento.parcelas = [
+                ParcelasContas(identificacao="P1", data_vencimento=date(2024, 4, 1),
+                               valor_parcela=Decimal("100.00"), valor_saldo=Decimal("100.00"), status_parcela="ABERTA"),
+                ParcelasContas(identificacao="P2", data_vencimento=date(2024, 5, 1),
+                               valor_parcela=Decimal("200.00"), valor_saldo=Decimal("0.00"), status_parcela="LIQUIDADA"),
+            ]
+            session.add(movimento)
+        session.commit()
+
+    monkeypatch.setattr("app.SessionLocal", factory)
+    monkeypatch.setattr("app._EXPORTACAO_LOTE", 2)
+    yield app.test_client()
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def _ler_csv(response) -> list[dict]:
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_exportacao_inclui_nomes_classificacoes_e_parcelas(export_client):
+    response = export_client.get("/contas/exportar.csv", query_string={"sort": "data", "dir": "asc"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.is_streamed
+    linhas = _ler_csv(response)
+    assert [linha["numero_nota_fiscal"] for linha in linhas] == ["NF-1", "NF-2", "NF-3", "NF-4"]
+    primeira = linhas[0]
+    assert primeira["fornecedor_nome"] == "Cooperativa Sul"
+    assert primeira["faturado_nome"] == "Fazenda Norte"
+    assert primeira["classificacoes"] == "FRETE, INSUMOS"
+    assert primeira["parcelas"] == "P1|2024-04-01|100.00|100.00|ABERTA; P2|2024-05-01|200.00|0.00|LIQUIDADA"
+
+
+def test_exportacao_filtra_periodo_e_inclui_inativas_quando_pedido(export_client):
+    response = export_client.get(
+        "/contas/exportar.csv",
+        query_string={"status": "TODOS", "inicio": "2024-03-01", "fim": "2024-03-02"},
+    )
+
+    assert sorted(linha["numero_nota_fiscal"] for linha in _ler_csv(response)) == ["NF-0", "NF-1"]
+
+
+def test_exportacao_vazia_retorna_apenas_cabecalho(export_client):
+    response = export_client.get("/contas/exportar.csv", query_string={"q": "inexistente"})
+
+    assert response.get_data(as_text=True).splitlines() == [
+        "id,tipo,numero_nota_fiscal,data_emissao,descricao,status,valor_total,fornecedor_id,"
+        "fornecedor_nome,faturado_id,faturado_nome,classificacoes,parcelas"
+    ]
@@ -0,0 +1,156 @@
+"""Testes da fila de gravação com commit em grupo."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from agents.AgentePersistencia.fila_gravacao import FilaCheia, FilaEncerrada, FilaGravacao  # noqa: E402
+from agents.AgentePersistencia.processador import PersistenciaAgent  # noqa: E402
+from database.models import Base, MovimentoContas  # noqa: E402
+
+
+def _nota(numero: int, cnpj: str = "12345678000100") -> dict:
+    return {
+        "fornecedor": {"razaoSocial": "Fazenda Modelo", "cnpj": cnpj},
+        "numeroNotaFiscal": f"NF-{numero}",
+        "valorTotal": 100,
+        "classificacaoDespesa": ["Insumos"],
+        "parcelas": [{"dataVencimento": "2024-01-10", "valorParcela": 100}],
+    }
+
+
+@pytest.fixture()
+def ambiente():
+    engine = create_engine(
+        "sqlite+pysqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    commits = []
+    event.listen(engine, "commit", lambda _conexao: commits.append(1))
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    yield PersistenciaAgent(session_factory=factory), factory, commits
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def test_lancamentos_simultaneos_sao_gravados_em_poucos_commits(ambiente):
+    agent, factory, commits = ambiente
+    grupos = []
+    fila = FilaGravacao(agent, lote=50, janela=0.2, capacidade=100)
+    fila.observador = lambda notas, _duracao, _pendentes: grupos.append(notas)
+
+    with fila:
+        futures = [fila.enviar(_nota(numero)) for numero in range(40)]
+        resultados = [future.result(timeout=10) for future in futures]
+
+    assert len({resultado["movimento_id"] for resultado in resultados}) == 40
+    assert all(resultado["parcelas_ids"] and resultado["fornecedor_id"] for resultado in resultados)
+    assert sum(grupos) == 40
+    assert len(commits) <= 3
+    estatisticas = fila.estatisticas()
+    assert estatisticas["notas"] == 40 and estatisticas["notas_por_segundo"] > 0
+    with factory() as session:
+        assert session.scalar(select(func.count()).select_from(MovimentoContas)) == 40
+
+
+def test_nota_repetida_e_nota_invalida_nao_afetam_as_demais(ambiente):
+    agent, _, _ = ambiente
+
+    with FilaGravacao(agent, lote=50, janela=0.2) as fila:
+        primeira = fila.enviar(_nota(1))
+        repetida = fila.enviar({**_nota(1), "valorTotal": 250})
+        invalida = fila.enviar({**_nota(2), "numeroNotaFiscal": "X" * 100})
+        outra = fila.enviar(_nota(3))
+
+        assert primeira.result(timeout=10)["movimento_id"] == repetida.result(timeout=10)["movimento_id"]
+        with pytest.raises(ValueError, match="numero_nota_fiscal"):
+            invalida.result(timeout=10)
+        assert outra.result(timeout=10)["movimento_id"]
+
+
+def test_fila_limitada_recusa_excesso_e_encerramento_grava_o_que_foi_aceito(ambiente):
+    agent, factory, _ = ambiente
+    liberar = threading.Event()
+    lancar_em_lote = agent.lancar_contas_em_lote
+
+    def lancar_devagar(notas):
+        liberar.wait(timeout=10)
+        return lancar_em_lote(notas)
+
+    agent.lancar_contas_em_lote = lancar_devagar
+    fila = FilaGravacao(agent, lote=1, janela=0, capacidade=1)
+    em_gravacao = fila.enviar(_nota(1))
+    # Espera a thread de gravação tirar a primeira nota da fila
+    while fila.estatisticas()["pendentes"]:
+        time.sleep(0.001)
+    na_fila = fila.enviar(_nota(2))
+
+    with pytest.raises(FilaCheia):
+        fila.enviar(_nota(3), timeout=0.05)
+
+    liberar.set()
+    fila.encerrar(timeout=10)
+    assert em_gravacao.result(timeout=0)["movimento_id"]
+    assert na_fila.result(timeout=0)["movimento_id"]
+    with pytest.raises(FilaEncerrada):
+        fila.enviar(_nota(4))
+    with factory() as session:
+        assert session.scalar(select(func.count()).select_from(MovimentoContas)) == 2
+
+
+def test_nota_sem_fornecedor_na_fila_atualiza_o_movimento_como_o_lancamento_direto(ambiente):
+    agent, factory, _ = ambiente
+    sem_fornecedor = {key: valor for key, valor in _nota(9).items() if key != "fornecedor"}
+    original = agent.lancar_conta_pagar(sem_fornecedor)
+
+    with FilaGravacao(agent, lote=50, janela=0.2) as fila:
+        relancada = fila.enviar({**sem_fornecedor, "valorTotal": 250})
+        outra = fila.enviar(_nota(10))
+
+        # Como em lancar_conta_pagar, a nota é encontrada pelo número em vez de virar um movimento novo
+        assert relancada.result(timeout=10)["movimento_id"] == original["movimento_id"]
+        assert outra.result(timeout=10)["movimento_id"] != original["movimento_id"]
+    with factory() as session:
+        assert session.scalar(select(func.count()).select_from(MovimentoContas)) == 2
+        assert session.get(MovimentoContas, original["movimento_id"]).valor_total == 250
+
+
+def test_erro_fora_do_lancamento_falha_o_grupo_sem_derrubar_a_thread(ambiente):
+    agent, _, _ = ambiente
+    fila = FilaGravacao(agent, lote=1, janela=0)
+    gravar = fila._gravar
+    falhas = iter([RuntimeError("falha inesperada")])
+
+    def gravar_com_falha(grupo):
+        erro = next(falhas, None)
+        if erro is not None:
+            raise erro
+        gravar(grupo)
+
+    def observador_com_erro(*_args):
+        raise RuntimeError("observador com erro")
+
+    fila._gravar = gravar_com_falha
+    fila.observador = observador_com_erro
+
+    with fila:
+        with pytest.raises(RuntimeError, match="falha inesperada"):
+            fila.lancar(_nota(1), timeout=10)
+        # O erro do observador vem depois de a nota estar gravada: o resultado é entregue mesmo assim
+        assert fila.lancar(_nota(2), timeout=10)["movimento_id"]
+        assert fila.lancar(_nota(3), timeout=10)["movimento_id"]
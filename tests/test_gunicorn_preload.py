@@ -0,0 +1,51 @@
+"""Testes do modo preload do Gunicorn (modelo compartilhado entre workers)."""
+
+from __future__ import annotations
+
+import runpy
+from pathlib import Path
+from types import SimpleNamespace
+import sys
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import app as aplicacao  # noqa: E402
+from agents.consulta_rag import processador  # noqa: E402
+
+
+def test_modelo_de_embeddings_carregado_uma_vez_por_processo(monkeypatch):
+    carregados = []
+
+    class FakeSentenceTransformer:
+        def __init__(self, nome):
+            carregados.append(nome)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        SimpleNamespace(SentenceTransformer=FakeSentenceTransformer))
+    monkeypatch.setattr(processador, "_EMBED_MODELS", {})
+
+    primeiro = processador.carregar_modelo_embeddings()
+    segundo = processador.carregar_modelo_embeddings()
+
+    assert primeiro is segundo
+    assert carregados == [processador.EMBED_MODEL_NAME]
+
+
+def test_post_fork_recria_conexoes_e_agente_rag(monkeypatch):
+    config = runpy.run_path(str(ROOT_DIR / "gunicorn.conf.py"))
+    descartes = []
+    monkeypatch.setattr("database.connection.engine", SimpleNamespace(dispose=lambda close: descartes.append(close)))
+    monkeypatch.setattr(
+        "database.connection.replica_engine", SimpleNamespace(dispose=lambda close: descartes.append(close))
+    )
+    monkeypatch.setattr(aplicacao, "consulta_agent", object())
+    monkeypatch.setattr(aplicacao, "fila_gravacao", object())
+    servidor = SimpleNamespace(cfg=SimpleNamespace(preload_app=True))
+
+    config["post_fork"](servidor, SimpleNamespace(pid=123))
+
+    assert descartes == [False, False]
+    assert aplicacao.consulta_agent is None
+    assert aplicacao.fila_gravacao is None
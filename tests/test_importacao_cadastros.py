@@ -0,0 +1,129 @@
+"""Testes da importação em massa de pessoas e classificações."""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from agents.AgentePersistencia.importacao import ImportadorCadastros  # noqa: E402
+from app import app  # noqa: E402
+from database.models import Base, Classificacao, Pessoas  # noqa: E402
+
+
+@pytest.fixture()
+def session_factory():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    with factory() as session:
+        session.add(Pessoas(tipo="FORNECEDOR", razaosocial="Antiga", fantasia="Mantida",
+                            documento="12345678000100", status="ATIVO"))
+        session.add(Classificacao(tipo="DESPESA", descricao="Insumos", status="ATIVO"))
+        session.commit()
+    yield factory
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def test_importar_pessoas_normaliza_documento_e_mescla(session_factory):
+    csv_texto = (
+        "tipo;razao_social;fantasia;cnpj\n"
+        "fornecedor;Cooperativa Atualizada;;12.345.678/0001-00\n"
+        "cliente;Fazenda Nova;Nova;98.765.432/0001-11\n"
+        "cliente;Sem Documento;;\n"
+        "cliente;Fazenda Nova Corrigida;;98765432000111\n"
+    )
+
+    resultado = ImportadorCadastros(session_factory).importar_pessoas(io.StringIO(csv_texto))
+
+    assert resultado["inseridos"] == 1
+    assert resultado["atualizados"] == 1
+    assert resultado["rejeitados"] == 2
+    assert {erro["linha"] for erro in resultado["erros"]} == {3, 4}
+
+    with session_factory() as session:
+        pessoas = {p.documento: p for p in session.execute(select(Pessoas)).scalars()}
+    assert set(pessoas) == {"12345678000100", "98765432000111"}
+    assert pessoas["12345678000100"].razaosocial == "Cooperativa Atualizada"
+    assert pessoas["12345678000100"].fantasia == "Mantida"
+    assert pessoas["98765432000111"].razaosocial == "Fazenda Nova Corrigida"
+    assert pessoas["98765432000111"].tipo == "CLIENTE"
+    assert pessoas["98765432000111"].status == "ATIVO"
+
+
+def test_importar_classificacoes_ignora_caixa(session_factory):
+    csv_texto = "descricao,tipo\nINSUMOS,despesa\nFrete,\n,receita\n"
+
+    resultado = ImportadorCadastros(session_factory).importar_classificacoes(io.StringIO(csv_texto))
+
+    assert (resultado["inseridos"], resultado["atualizados"], resultado["rejeitados"]) == (1, 1, 1)
+    with session_factory() as session:
+        descricoes = sorted(c.descricao for c in session.execute(select(Classificacao)).scalars())
+    assert descricoes == ["Frete", "Insumos"]
+
+
+def test_importacao_mantem_campos_gravados_quando_o_arquivo_vem_vazio(session_factory):
+    with session_factory() as session:
+        session.add(Classificacao(tipo="RECEITA", descricao="Venda de gado", status="INATIVO"))
+        session.commit()
+    csv_texto = "descricao,tipo,status\nvenda de gado,,\nSementes,,\n"
+
+    resultado = ImportadorCadastros(session_factory).importar_classificacoes(io.StringIO(csv_texto))
+
+    assert (resultado["inseridos"], resultado["atualizados"]) == (1, 1)
+    with session_factory() as session:
+        classificacoes = {c.descricao: c for c in session.execute(select(Classificacao)).scalars()}
+    # A linha existente mantém descrição, tipo e status; só a nova recebe os padrões
+    assert set(classificacoes) == {"Insumos", "Venda de gado", "Sementes"}
+    assert (classificacoes["Venda de gado"].tipo, classificacoes["Venda de gado"].status) == ("RECEITA", "INATIVO")
+    assert (classificacoes["Sementes"].tipo, classificacoes["Sementes"].status) == ("DESPESA", "ATIVO")
+
+
+def test_linha_com_campo_longo_demais_e_rejeitada_sem_perder_as_demais(session_factory):
+    importador = ImportadorCadastros(session_factory)
+    pessoas = (
+        "documento;razaosocial\n"
+        "111;Pessoa Curta\n"
+        f"{'9' * 46};Documento Longo\n"
+        f"222;{'R' * 151}\n"
+        "333;Outra Curta\n"
+    )
+    classificacoes = f"descricao\nAdubo\n{'D' * 151}\nCombustível\n"
+
+    resultado_pessoas = importador.importar_pessoas(io.StringIO(pessoas))
+    resultado_classificacoes = importador.importar_classificacoes(io.StringIO(classificacoes))
+
+    assert (resultado_pessoas["inseridos"], resultado_pessoas["rejeitados"]) == (2, 2)
+    assert resultado_pessoas["erros"] == [
+        {"linha": 3, "motivo": "campo 'documento' excede o tamanho permitido"},
+        {"linha": 4, "motivo": "campo 'razaosocial' excede o tamanho permitido"},
+    ]
+    assert (resultado_classificacoes["inseridos"], resultado_classificacoes["rejeitados"]) == (2, 1)
+    assert resultado_classificacoes["erros"] == [{"linha": 3, "motivo": "campo 'descricao' excede o tamanho permitido"}]
+    with session_factory() as session:
+        assert set(session.execute(select(Pessoas.documento)).scalars()) == {"12345678000100", "111", "333"}
+        assert set(session.execute(select(Classificacao.descricao)).scalars()) == {"Insumos", "Adubo", "Combustível"}
+
+
+def test_endpoint_importar_pessoas(session_factory, monkeypatch):
+    monkeypatch.setattr("app.importador_cadastros", ImportadorCadastros(session_factory))
+    client = app.test_client()
+
+    response = client.post(
+        "/pessoas/importar",
+        data={"arquivo": (io.BytesIO("documento,razaosocial\n111,Pessoa CSV\n".encode()), "pessoas.csv")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 302
+    with session_factory() as session:
+        assert session.execute(select(Pessoas.razaosocial).where(Pessoas.documento == "111")).scalar() == "Pessoa CSV"
@@ -0,0 +1,141 @@
+"""Testes da migração de índices e da verificação por EXPLAIN."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from database.migrations import HOT_QUERY_INDEXES, run_migrations  # noqa: E402
+from database.models import Base  # noqa: E402
+from scripts.verificar_indices import consultas_quentes, verificar  # noqa: E402
+
+
+def test_consultas_quentes_usam_os_indices_da_migracao(tmp_path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'indices.db'}", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        criados = set(
+            connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars()
+        )
+    substituidos = {"ix_pessoas_documento", "ix_classificacao_descricao_lower"}
+    assert set(HOT_QUERY_INDEXES) - substituidos <= criados
+    assert {"uq_pessoas_documento", "uq_classificacao_descricao_lower"} <= criados
+    assert not substituidos & criados
+
+    with sessionmaker(bind=engine, future=True)() as session:
+        assert len(consultas_quentes(session)) >= 10
+        assert verificar(session) == []
+    engine.dispose()
+
+
+def test_verificacao_aponta_consulta_sem_indice(tmp_path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'sem_indices.db'}", future=True)
+    Base.metadata.create_all(engine)
+
+    with sessionmaker(bind=engine, future=True)() as session:
+        falhas = {descricao for descricao, _, _ in verificar(session)}
+    assert "listagem de contas" in falhas
+    assert "movimentos do fornecedor" in falhas
+    # As chaves únicas dos upserts já vêm dos modelos
+    assert "pessoa por documento" not in falhas
+    assert "movimento por nota e fornecedor" not in falhas
+    engine.dispose()
+
+
+def test_migracao_das_chaves_unicas_unifica_pessoas_e_classificacoes_repetidas(tmp_path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'repetidos.db'}", future=True)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # Banco anterior à migração 0004, com a mesma pessoa e a mesma classificação cadastradas duas vezes
+        connection.exec_driver_sql("DROP INDEX uq_pessoas_documento")
+        connection.exec_driver_sql("DROP INDEX uq_classificacao_descricao_lower")
+        connection.exec_driver_sql(
+            "INSERT INTO pessoas (\"idPessoas\", documento, status) "
+            "VALUES (1, '12345678000100', 'ATIVO'), (2, '12345678000100', 'ATIVO'), (3, '99', 'ATIVO')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO classificacao (\"idClassificacao\", descricao) VALUES (1, 'Insumos'), (2, 'INSUMOS')"
+        )
+        # A mesma nota lançada uma vez com cada cadastro do fornecedor; a 12 é faturada ao repetido
+        connection.exec_driver_sql(
+            'INSERT INTO movimento_contas ("idMovimentoContas", numeronotafiscal, "Pessoas_idFornecedorCliente", '
+            '"Pessoas_idFaturado") VALUES (10, \'NF-1\', 1, 3), (11, \'NF-1\', 2, 3), (12, \'NF-2\', 3, 2)'
+        )
+        connection.exec_driver_sql(
+            'INSERT INTO "MovimentoContas_has_Classificacao" '
+            '("MovimentoContas_idMovimentoContas", "Classificacao_idClassificacao") '
+            "VALUES (11, 1), (11, 2), (12, 2)"
+        )
+
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        pessoas = connection.exec_driver_sql('SELECT "idPessoas" FROM pessoas ORDER BY 1').scalars().all()
+        classificacoes = connection.exec_driver_sql(
+            'SELECT "idClassificacao" FROM classificacao ORDER BY 1'
+        ).scalars().all()
+        movimentos = connection.exec_driver_sql(
+            'SELECT "idMovimentoContas", "Pessoas_idFornecedorCliente", "Pessoas_idFaturado" '
+            "FROM movimento_contas ORDER BY 1"
+        ).all()
+        vinculos = connection.exec_driver_sql(
+            'SELECT "MovimentoContas_idMovimentoContas", "Classificacao_idClassificacao" '
+            'FROM "MovimentoContas_has_Classificacao" ORDER BY 1, 2'
+        ).all()
+        indices = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+    # Os cadastros mais antigos sobrevivem; as notas que passaram a coincidir ficam com a mais recente
+    assert pessoas == [1, 3]
+    assert classificacoes == [1]
+    assert [tuple(linha) for linha in movimentos] == [(11, 1, 3), (12, 3, 1)]
+    assert [tuple(linha) for linha in vinculos] == [(11, 1), (12, 1)]
+    assert {"uq_pessoas_documento", "uq_classificacao_descricao_lower", "uq_movimento_contas_nota_fornecedor"} <= indices
+    engine.dispose()
+
+
+def test_migracao_da_chave_de_nota_unifica_movimentos_repetidos(tmp_path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'notas_repetidas.db'}", future=True)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # Banco anterior à migração 0002, com a mesma nota lançada duas vezes em paralelo
+        connection.exec_driver_sql("DROP INDEX uq_movimento_contas_nota_fornecedor")
+        connection.exec_driver_sql("INSERT INTO pessoas (\"idPessoas\", documento) VALUES (1, '12345678000100')")
+        connection.exec_driver_sql(
+            'INSERT INTO movimento_contas ("idMovimentoContas", numeronotafiscal, "Pessoas_idFornecedorCliente", valortotal) '
+            "VALUES (1, 'NF-1', 1, 100), (2, 'NF-1', 1, 120), (3, 'NF-2', 1, 50)"
+        )
+        connection.exec_driver_sql(
+            'INSERT INTO parcelas_contas ("MovimentoContas_idMovimentoContas", valorparcela) VALUES (1, 100), (2, 120), (3, 50)'
+        )
+        connection.exec_driver_sql(
+            'INSERT INTO extracao_documentos (hash_conteudo, dados, "MovimentoContas_idMovimentoContas") '
+            "VALUES ('abc', '{}', 1)"
+        )
+
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        movimentos = connection.exec_driver_sql(
+            'SELECT "idMovimentoContas" FROM movimento_contas ORDER BY 1'
+        ).scalars().all()
+        parcelas = connection.exec_driver_sql(
+            'SELECT "MovimentoContas_idMovimentoContas" FROM parcelas_contas ORDER BY 1'
+        ).scalars().all()
+        extracao = connection.exec_driver_sql(
+            'SELECT "MovimentoContas_idMovimentoContas" FROM extracao_documentos'
+        ).scalar_one()
+        indices = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+    # O relançamento mais recente sobrevive e a extração passa a apontar para ele
+    assert movimentos == [2, 3]
+    assert parcelas == [2, 3]
+    assert extracao == 2
+    assert "uq_movimento_contas_nota_fornecedor" in indices
+    engine.dispose()
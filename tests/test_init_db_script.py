@@ -54,4 +54,19 @@ def test_create_tables_trata_operational_error(monkeypatch, capsys):
 
     captured = capsys.readouterr()
     assert "Falha ao conectar ao banco de dados" in captured.out
-    assert "Verifique se o serviço PostgreSQL" in captured.out
\ No newline at end of file
+    assert "Verifique se o serviço PostgreSQL" in captured.out
+
+def test_main_sai_com_erro_quando_uma_migracao_falha(monkeypatch, temp_engine, capsys):
+    monkeypatch.setattr(init_db, "engine", temp_engine)
+
+    def _migracao_com_erro(_engine):
+        raise init_db.MigrationError("0004", ["0004", "0005"], RuntimeError("índice duplicado"))
+
+    monkeypatch.setattr(init_db, "run_migrations", _migracao_com_erro)
+
+    # Código diferente de zero faz o entrypoint e os scripts de setup pararem antes de subir o app
+    assert init_db.main() == 1
+    saida = capsys.readouterr().out
+    assert "Falha ao aplicar as migrações" in saida
+    assert "índice duplicado" in saida
+    assert "0005" in saida
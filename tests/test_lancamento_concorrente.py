@@ -0,0 +1,144 @@
+"""Teste de carga: lançamentos simultâneos de vários workers não duplicam cadastros.
+
+Roda sempre no SQLite e, com ``TEST_DATABASE_URL`` apontando para um PostgreSQL
+descartável (as tabelas são apagadas e recriadas), também no PostgreSQL, onde
+os workers disputam as mesmas linhas de fato em paralelo.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from agents.AgentePersistencia.processador import PersistenciaAgent  # noqa: E402
+from database.models import Base, Classificacao, MovimentoContas, ParcelasContas, Pessoas  # noqa: E402
+
+WORKERS = 8
+NOTAS = 1000  # cada nota é lançada duas vezes, por workers diferentes
+FORNECEDORES = 97
+FATURADOS = 13
+CATEGORIAS = 11
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def _nota(indice: int) -> dict:
+    return {
+        "fornecedor": {"razaoSocial": f"Fornecedor {indice % FORNECEDORES}", "cnpj": f"{indice % FORNECEDORES:014d}"},
+        "faturado": {"nomeCompleto": f"Faturado {indice % FATURADOS}", "cpf": f"{indice % FATURADOS:011d}"},
+        "numeroNotaFiscal": f"NF-{indice}",
+        "valorTotal": 100,
+        # A mesma categoria chega com grafias diferentes de notas diferentes
+        "classificacaoDespesa": [f"Categoria {indice % CATEGORIAS}", f"CATEGORIA {(indice + 1) % CATEGORIAS}"],
+        "parcelas": [{"dataVencimento": "2024-01-10", "valorParcela": 100}],
+    }
+
+
+def _engine_sqlite(tmp_path):
+    engine = create_engine(
+        f"sqlite+pysqlite:///{tmp_path / 'concorrente.db'}",
+        future=True,
+        connect_args={"timeout": 60, "check_same_thread": False},
+        pool_size=WORKERS,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_connection, _registro):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
+
+
+@pytest.fixture(
+    params=[
+        "sqlite",
+        pytest.param(
+            "postgresql",
+            marks=pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não definida"),
+        ),
+    ]
+)
+def session_factory(request, tmp_path):
+    if request.param == "sqlite":
+        engine = _engine_sqlite(tmp_path)
+    else:
+        engine = create_engine(TEST_DATABASE_URL, future=True, pool_size=WORKERS)
+        # Banco descartável: parte sempre de tabelas vazias
+        Base.metadata.drop_all(engine)
+
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    if request.param == "postgresql":
+        Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def _lancar(session_factory, lotes) -> tuple[float, list]:
+    """Lança cada lote num worker próprio (com o seu cache), todos partindo juntos."""
+
+    erros = []
+    largada = threading.Barrier(len(lotes))
+
+    def worker(notas):
+        agent = PersistenciaAgent(session_factory=session_factory)
+        largada.wait()
+        for nota in notas:
+            try:
+                agent.lancar_conta_pagar(nota)
+            except Exception as exc:
+                erros.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(notas,)) for notas in lotes]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - inicio, erros
+
+
+def _contar(session, modelo) -> int:
+    return session.scalar(select(func.count()).select_from(modelo))
+
+
+def test_lancamentos_simultaneos_nao_duplicam_cadastros(session_factory):
+    notas = [_nota(indice) for indice in range(NOTAS)]
+    # Cada nota vai para dois workers, em posições vizinhas das filas; pessoas e
+    # categorias ainda não existem, então os primeiros lançamentos disputam o cadastro
+    filas = [notas[worker::WORKERS] for worker in range(WORKERS)]
+    lotes = [
+        [nota for par in zip(filas[worker], filas[(worker + 1) % WORKERS]) for nota in par]
+        for worker in range(WORKERS)
+    ]
+    duracao, erros = _lancar(session_factory, lotes)
+    assert erros == []
+
+    with session_factory() as session:
+        assert _contar(session, Pessoas) == FORNECEDORES + FATURADOS
+        assert _contar(session, Classificacao) == CATEGORIAS
+        assert _contar(session, MovimentoContas) == NOTAS
+        assert _contar(session, ParcelasContas) == NOTAS
+        repetidos = session.execute(
+            select(Pessoas.documento).group_by(Pessoas.documento).having(func.count() > 1)
+        ).all()
+        assert repetidos == []
+
+    # No SQLite as escritas são serializadas; nos dois bancos, a concorrência não pode derrubar a vazão
+    referencia = [_nota(NOTAS + indice) for indice in range(200)]
+    duracao_sequencial, erros = _lancar(session_factory, [referencia])
+    assert erros == []
+    vazao = sum(len(lote) for lote in lotes) / duracao
+    assert vazao >= 0.5 * len(referencia) / duracao_sequencial
@@ -0,0 +1,87 @@
+"""Testes da renderização em streaming das telas de listagem."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import app  # noqa: E402
+from database.models import Base, Pessoas  # noqa: E402
+
+
+@pytest.fixture()
+def listagem(monkeypatch):
+    engine = create_engine(
+        "sqlite+pysqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    with factory() as session:
+        session.add_all(
+            Pessoas(tipo="FORNECEDOR", razaosocial=f"Fornecedor {indice:03d}", documento=str(indice), status="ATIVO")
+            for indice in range(25)
+        )
+        session.commit()
+
+    sessoes = []
+
+    def fabrica():
+        sessao = factory()
+        sessoes.append(sessao)
+        return sessao
+
+    monkeypatch.setattr("app.SessionLocal", fabrica)
+    monkeypatch.setattr("app._LISTAGEM_STREAMING", True)
+    monkeypatch.setattr("app._LISTAGEM_LOTE", 4)
+    yield app.test_client(), sessoes
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def test_listagem_e_enviada_em_streaming_com_todas_as_linhas(listagem):
+    client, sessoes = listagem
+
+    response = client.get("/pessoas")
+
+    assert "Content-Length" not in response.headers
+    html = response.get_data(as_text=True)
+    assert all(f"Fornecedor {indice:03d}" in html for indice in range(25))
+    assert html.rstrip().endswith("</html>")
+    # A sessão entregue ao corpo da resposta é fechada ao fim do envio
+    assert sessoes and all(not sessao.in_transaction() for sessao in sessoes)
+
+
+def test_mensagem_flash_nao_reaparece_apos_pagina_em_streaming(listagem):
+    client, _ = listagem
+    with client.session_transaction() as sessao_http:
+        sessao_http["_flashes"] = [("success", "Pessoa removida com sucesso.")]
+
+    primeira = client.get("/pessoas").get_data(as_text=True)
+    segunda = client.get("/pessoas").get_data(as_text=True)
+
+    assert "Pessoa removida com sucesso." in primeira
+    assert "Pessoa removida com sucesso." not in segunda
+
+
+def test_listagem_sem_streaming_renderiza_em_memoria(listagem, monkeypatch):
+    client, _ = listagem
+    monkeypatch.setattr("app._LISTAGEM_STREAMING", False)
+
+    response = client.get("/pessoas?q=Fornecedor 007")
+
+    assert "Content-Length" in response.headers
+    html = response.get_data(as_text=True)
+    assert "Fornecedor 007" in html
+    assert "Fornecedor 008" not in html
@@ -0,0 +1,72 @@
+"""Testes do orçamento de consultas por requisição (detecção de N+1)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import app  # noqa: E402
+from database.models import Base, Classificacao, MovimentoContas, Pessoas  # noqa: E402
+from database.request_session import init_request_session, request_session  # noqa: E402
+from monitoring.query_budget import QueryBudgetExceeded, fingerprint, init_query_budget  # noqa: E402
+
+
+@pytest.fixture()
+def session_factory():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    with factory() as session:
+        classificacoes = [Classificacao(tipo="DESPESA", descricao=f"Classe {i}", status="ATIVO") for i in range(3)]
+        for indice in range(20):
+            fornecedor = Pessoas(tipo="FORNECEDOR", razaosocial=f"Fornecedor {indice}",
+                                 documento=str(indice), status="ATIVO")
+            session.add(MovimentoContas(descricao=f"Conta {indice}", status="ATIVO", fornecedor=fornecedor,
+                                        faturado=fornecedor, classificacoes=classificacoes[: indice % 3 + 1]))
+        session.commit()
+    yield factory
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.mark.parametrize("rota", ["/contas", "/pessoas", "/classificacoes", "/api/contas", "/api/pessoas"])
+def test_listagens_cabem_no_orcamento_modo_estrito(session_factory, monkeypatch, rota):
+    monkeypatch.setattr("app.SessionLocal", session_factory)
+    monkeypatch.setitem(app.config, "QUERY_BUDGET_STRICT", True)
+    monkeypatch.setitem(app.config, "QUERY_BUDGET", 8)
+    monkeypatch.setitem(app.config, "QUERY_REPEAT_LIMIT", 3)
+
+    assert app.test_client().get(rota).status_code == 200
+
+
+def test_modo_estrito_falha_com_carga_lazy_em_loop(session_factory):
+    teste = Flask(__name__)
+    teste.config.update(TESTING=True, QUERY_BUDGET_STRICT=True, QUERY_REPEAT_LIMIT=5)
+    init_query_budget(teste)
+    init_request_session(teste)
+
+    @teste.route("/n-mais-um")
+    def n_mais_um():
+        session = request_session(session_factory)
+        contas = session.query(MovimentoContas).all()
+        return {"fornecedores": [conta.fornecedor.razaosocial for conta in contas]}
+
+    with pytest.raises(QueryBudgetExceeded, match="20x SELECT pessoas"):
+        teste.test_client().get("/n-mais-um")
+
+
+def test_fingerprint_ignora_valores_e_tamanho_de_listas():
+    assert fingerprint("SELECT * FROM t WHERE id = 10 AND nome = 'x'") == fingerprint(
+        "SELECT  *\n FROM t WHERE id = 99 AND nome = 'y''z'"
+    )
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (...)"
+    assert fingerprint("SELECT * FROM t WHERE id IN (%(id_1)s)") == "SELECT * FROM t WHERE id IN (...)"
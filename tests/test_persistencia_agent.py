@@ -7,7 +7,7 @@ from pathlib import Path
 import sys
 
 import pytest
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, event, select
 from sqlalchemy.orm import Session, sessionmaker
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -138,4 +138,155 @@ def test_verificar_entidades_retorna_status_sem_criar(
     status_posterior = agent.verificar_entidades(payload)
     assert status_posterior["fornecedor"]["status"] == "EXISTE"
     assert status_posterior["faturado"]["status"] == "EXISTE"
-    assert status_posterior["classificacoes"][0]["status"] == "EXISTE"
\ No newline at end of file
+    assert status_posterior["classificacoes"][0]["status"] == "EXISTE"
+
+def _nota(numero: str, cnpj: str, **extra):
+    return {
+        "fornecedor": {"razaoSocial": f"Fornecedor {cnpj}", "cnpj": cnpj},
+        "faturado": {"nomeCompleto": "João da Silva", "cpf": "123.456.789-00"},
+        "numeroNotaFiscal": numero,
+        "dataEmissao": "2024-02-10",
+        "valorTotal": "100,00",
+        "classificacaoDespesa": ["Insumos"],
+        "parcelas": [{"dataVencimento": "2024-03-10", "valorParcela": 100}],
+        **extra,
+    }
+
+
+def test_lancar_contas_em_lote_usa_poucas_instrucoes(
+    agent: PersistenciaAgent,
+    session_factory: sessionmaker,
+) -> None:
+    agent.get_or_create_classificacao("Insumos")
+    notas = [_nota(f"NF-{indice:03d}", f"11.111.111/0001-{indice:02d}") for indice in range(30)]
+    engine = session_factory.kw["bind"]
+    instrucoes = []
+    event.listen(engine, "before_cursor_execute", lambda *args: instrucoes.append(args[2]))
+
+    resultado = agent.lancar_contas_em_lote(notas)
+
+    assert resultado["erros"] == []
+    assert [item["indice"] for item in resultado["lancadas"]] == list(range(30))
+    # Independente do tamanho do lote: pessoas, classificações, movimentos, parcelas e vínculos,
+    # mais a leitura do estado final e um upsert por tabela de resumo do RAG
+    assert len(instrucoes) <= 12 + 4
+    with session_factory() as session:
+        assert len(_fetch_all(session, MovimentoContas)) == 30
+        assert len(_fetch_all(session, ParcelasContas)) == 30
+        assert len(_fetch_all(session, Pessoas)) == 31
+        assert len(_fetch_all(session, Classificacao)) == 1
+        movimento = session.get(MovimentoContas, resultado["lancadas"][7]["movimento_id"])
+        assert movimento.numero_nota_fiscal == "NF-007"
+        assert [cls.descricao for cls in movimento.classificacoes] == ["Insumos"]
+        assert [parcela.id for parcela in movimento.parcelas] == resultado["lancadas"][7]["parcelas_ids"]
+
+
+def test_lancar_contas_em_lote_atualiza_nota_existente(
+    agent: PersistenciaAgent,
+    session_factory: sessionmaker,
+) -> None:
+    existente = agent.lancar_conta_pagar(_nota("NF-001", "12.345.678/0001-00"))
+
+    resultado = agent.lancar_contas_em_lote(
+        [
+            _nota(
+                "NF-001",
+                "12.345.678/0001-00",
+                valorTotal="250,00",
+                classificacaoDespesa=["Frete"],
+                parcelas=[{"valorParcela": 125}, {"valorParcela": 125}],
+            )
+        ]
+    )
+
+    assert resultado["lancadas"][0]["movimento_id"] == existente["movimento_id"]
+    with session_factory() as session:
+        movimento = session.get(MovimentoContas, existente["movimento_id"])
+        assert movimento.valor_total == Decimal("250.00")
+        assert [cls.descricao for cls in movimento.classificacoes] == ["Frete"]
+        assert len(_fetch_all(session, ParcelasContas)) == 2
+        assert len(_fetch_all(session, MovimentoContas)) == 1
+
+
+def test_lancar_contas_em_lote_reporta_erros_por_nota(
+    agent: PersistenciaAgent,
+    session_factory: sessionmaker,
+) -> None:
+    notas = [
+        _nota("NF-001", "12.345.678/0001-00"),
+        {},
+        _nota("X" * 60, "12.345.678/0001-00"),
+        _nota("NF-001", "12.345.678/0001-00", valorTotal="300,00"),
+    ]
+
+    resultado = agent.lancar_contas_em_lote(notas)
+
+    assert [erro["indice"] for erro in resultado["erros"]] == [0, 1, 2]
+    assert resultado["erros"][0]["motivo"] == "nota repetida no lote"
+    assert "numero_nota_fiscal" in resultado["erros"][2]["motivo"]
+    assert [item["indice"] for item in resultado["lancadas"]] == [3]
+    with session_factory() as session:
+        movimentos = _fetch_all(session, MovimentoContas)
+        assert [(mov.numero_nota_fiscal, mov.valor_total) for mov in movimentos] == [("NF-001", Decimal("300.00"))]
+
+
+def test_relancar_nota_grava_apenas_vinculos_alterados(
+    agent: PersistenciaAgent,
+    session_factory: sessionmaker,
+) -> None:
+    nota = _nota("NF-001", "12.345.678/0001-00", classificacaoDespesa=["Insumos", "Frete", "Energia"])
+    primeiro = agent.lancar_conta_pagar(nota)
+    engine = session_factory.kw["bind"]
+    instrucoes = []
+    event.listen(engine, "before_cursor_execute", lambda *args: instrucoes.append(args[2]))
+
+    segundo = agent.lancar_conta_pagar({**nota, "classificacaoDespesa": ["insumos", "Frete", "Manutenção"]})
+
+    assert segundo["movimento_id"] == primeiro["movimento_id"]
+    assert segundo["classificacao_ids"][:2] == primeiro["classificacao_ids"][:2]
+    vinculos = [sql for sql in instrucoes if '"MovimentoContas_has_Classificacao"' in sql and not sql.startswith("SELECT")]
+    assert [sql.split()[0] for sql in vinculos] == ["DELETE", "INSERT"]
+    # Só a classificação nova é consultada; as demais vêm do cache
+    assert len([sql for sql in instrucoes if sql.startswith("SELECT lower(classificacao.descricao)")]) == 1
+    with session_factory() as session:
+        movimento = session.get(MovimentoContas, primeiro["movimento_id"])
+        assert sorted(cls.descricao for cls in movimento.classificacoes) == ["Frete", "Insumos", "Manutenção"]
+
+
+def test_relancar_nota_atualiza_so_as_parcelas_alteradas(
+    agent: PersistenciaAgent,
+    session_factory: sessionmaker,
+) -> None:
+    nota = _nota(
+        "NF-001",
+        "12.345.678/0001-00",
+        parcelas=[
+            {"identificacao": "1/3", "dataVencimento": "2024-03-10", "valorParcela": 100},
+            {"identificacao": "2/3", "dataVencimento": "2024-04-10", "valorParcela": 100},
+            {"identificacao": "3/3", "dataVencimento": "2024-05-10", "valorParcela": 100},
+        ],
+    )
+    primeiro = agent.lancar_conta_pagar(nota)
+    with session_factory() as session:
+        paga = session.get(ParcelasContas, primeiro["parcelas_ids"][0])
+        paga.valor_pago, paga.status_parcela = Decimal("100"), "PAGA"
+        session.commit()
+    engine = session_factory.kw["bind"]
+    instrucoes = []
+    event.listen(engine, "before_cursor_execute", lambda *args: instrucoes.append(args[2]))
+
+    agent.lancar_conta_pagar(nota)
+    assert [sql for sql in instrucoes if not sql.startswith("SELECT")] == []
+
+    nota["parcelas"][1]["dataVencimento"] = "2024-04-15"
+    nota["parcelas"].pop()
+    segundo = agent.lancar_conta_pagar(nota)
+
+    escritas = [sql.split()[0] for sql in instrucoes if "parcelas_contas" in sql and not sql.startswith("SELECT")]
+    assert sorted(escritas) == ["DELETE", "UPDATE"]
+    assert segundo["parcelas_ids"] == primeiro["parcelas_ids"][:2]
+    with session_factory() as session:
+        parcelas = {p.identificacao: p for p in _fetch_all(session, ParcelasContas)}
+        assert set(parcelas) == {"1/3", "2/3"}
+        assert (parcelas["1/3"].valor_pago, parcelas["1/3"].status_parcela) == (Decimal("100.00"), "PAGA")
+        assert parcelas["2/3"].data_vencimento.isoformat() == "2024-04-15"
@@ -24,6 +24,7 @@ def rag_client(monkeypatch):
         executar_consulta_semantica=lambda pergunta: f"semantico::{pergunta}",
     )
     monkeypatch.setattr("app.consulta_agent", fake_agent)
+    monkeypatch.setattr("app.GOOGLE_API_KEY", "chave-de-teste")
     client = app.test_client()
     yield client, fake_agent
 
@@ -0,0 +1,137 @@
+"""Testes do roteamento de leituras para a réplica (com leitura das próprias escritas)."""
+
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import app as aplicacao  # noqa: E402
+from agents.consulta_rag.processador import ConsultaRagAgent  # noqa: E402
+from database import request_session as sessao_requisicao  # noqa: E402
+from database.models import Base, MovimentoContas, Pessoas  # noqa: E402
+
+
+def _banco(**opcoes):
+    engine = create_engine(
+        "sqlite+pysqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True, **opcoes)
+
+
+@pytest.fixture()
+def bancos(monkeypatch):
+    """Primário e réplica separados; a réplica só recebe o que o teste copiar para ela."""
+
+    primario, fabrica_primario = _banco()
+    replica, fabrica_replica = _banco(info={"replica": True})
+    for fabrica in (fabrica_primario, fabrica_replica):
+        with fabrica() as session:
+            session.add(Pessoas(tipo="FORNECEDOR", razaosocial="Cooperativa Sul", documento="1", status="ATIVO"))
+            session.add(
+                MovimentoContas(
+                    descricao="Adubo replicado",
+                    numero_nota_fiscal="NF-1",
+                    data_emissao=date.today(),
+                    valor_total=Decimal("100.00"),
+                    status="ATIVO",
+                )
+            )
+            session.commit()
+
+    monkeypatch.setattr(aplicacao, "SessionLocal", fabrica_primario)
+    monkeypatch.setattr(aplicacao, "ReplicaSessionLocal", fabrica_replica)
+    yield fabrica_primario, fabrica_replica
+    primario.dispose()
+    replica.dispose()
+
+
+def _nomes(client) -> list[str]:
+    corpo = client.get("/api/pessoas", query_string={"sort": "nome"}).get_json()
+    return [item["razaosocial"] for item in corpo["items"]]
+
+
+def test_listagens_leem_da_replica_e_cliente_le_a_propria_escrita_no_primario(bancos, monkeypatch):
+    _, fabrica_replica = bancos
+    cliente = aplicacao.app.test_client()
+    outro_cliente = aplicacao.app.test_client()
+
+    with fabrica_replica() as session:
+        session.add(Pessoas(tipo="CLIENTE", razaosocial="Só na réplica", documento="2", status="ATIVO"))
+        session.commit()
+    assert _nomes(cliente) == ["Cooperativa Sul", "Só na réplica"]
+
+    resposta = cliente.post("/pessoas/salvar", data={"tipo": "CLIENTE", "razaosocial": "Armazém Novo", "documento": "3"})
+    assert resposta.status_code == 302
+
+    # A réplica ainda não recebeu a escrita: quem escreveu lê do primário, os demais da réplica
+    assert _nomes(cliente) == ["Armazém Novo", "Cooperativa Sul"]
+    assert _nomes(outro_cliente) == ["Cooperativa Sul", "Só na réplica"]
+    assert "Armazém Novo" in cliente.get("/pessoas").get_data(as_text=True)
+
+    monkeypatch.setattr(sessao_requisicao, "REPLICA_STICKY_SECONDS", 0)
+    assert _nomes(cliente) == ["Cooperativa Sul", "Só na réplica"]
+
+
+def test_lancamento_pela_fila_tambem_mantem_leituras_no_primario(bancos, monkeypatch):
+    _, fabrica_replica = bancos
+    with fabrica_replica() as session:
+        session.add(Pessoas(tipo="CLIENTE", razaosocial="Só na réplica", documento="2", status="ATIVO"))
+        session.commit()
+
+    class FilaFalsa:
+        # Grava em outra thread: o commit não acontece na requisição
+        def lancar(self, _dados, timeout=None):
+            return {"movimento_id": 1}
+
+    monkeypatch.setattr(aplicacao, "_FILA_GRAVACAO", True)
+    monkeypatch.setattr(aplicacao, "_get_fila_gravacao", FilaFalsa)
+    cliente = aplicacao.app.test_client()
+    assert _nomes(cliente) == ["Cooperativa Sul", "Só na réplica"]
+
+    resposta = cliente.post("/lancar_conta", json={"numeroNotaFiscal": "NF-9"})
+
+    assert resposta.status_code == 200
+    assert _nomes(cliente) == ["Cooperativa Sul"]
+
+
+def test_escrita_depois_de_leitura_na_mesma_requisicao_usa_o_primario(bancos):
+    fabrica_primario, fabrica_replica = bancos
+
+    with aplicacao.app.test_request_context():
+        leitura = aplicacao._sessao_leitura()
+        assert leitura.info.get("replica")
+        escrita = aplicacao._sessao()
+        assert escrita is not leitura and not escrita.info.get("replica")
+        assert aplicacao._sessao_leitura() is escrita
+
+
+def test_consultas_do_rag_usam_a_fabrica_de_leitura(bancos):
+    fabrica_primario, fabrica_replica = bancos
+    with fabrica_replica() as session:
+        session.add(MovimentoContas(descricao="Semente só na réplica", status="ATIVO", valor_total=Decimal("50.00")))
+        session.commit()
+
+    agent = ConsultaRagAgent(
+        session_factory=fabrica_primario,
+        leitura_session_factory=fabrica_replica,
+        llm_callable=lambda prompt, **_: prompt,
+        enable_chroma=False,
+    )
+
+    assert "Semente só na réplica" in agent._retrieve_data_simples("semente")
+    assert agent.persist_agent._session_factory is fabrica_primario
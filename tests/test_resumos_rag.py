@@ -0,0 +1,190 @@
+"""Testes das tabelas de resumo do RAG, mantidas a cada gravação."""
+
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import app as aplicacao  # noqa: E402
+from agents.AgentePersistencia.processador import PersistenciaAgent  # noqa: E402
+from agents.consulta_rag.processador import ConsultaRagAgent  # noqa: E402
+from database.models import (  # noqa: E402
+    Base,
+    Classificacao,
+    Pessoas,
+    ResumoDescricao,
+    ResumoDiarioClassificacao,
+    ResumoDiarioFornecedor,
+)
+from database.rollups import SEM_DATA, rebuild_rollups  # noqa: E402
+
+
+@pytest.fixture()
+def banco():
+    engine = create_engine(
+        "sqlite+pysqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    yield engine, sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    engine.dispose()
+
+
+def _resumos(factory) -> dict:
+    with factory() as session:
+        return {
+            modelo.__tablename__: sorted(
+                tuple(linha) for linha in session.execute(select(*modelo.__table__.columns))
+            )
+            for modelo in (ResumoDiarioClassificacao, ResumoDiarioFornecedor, ResumoDescricao)
+        }
+
+
+def _confere_com_reconstrucao(engine, factory) -> dict:
+    incremental = _resumos(factory)
+    rebuild_rollups(engine)
+    assert _resumos(factory) == incremental
+    return incremental
+
+
+def _nota(numero, cnpj, valor, classificacoes, emissao="2024-05-10", descricao="Adubo NPK"):
+    return {
+        "tipo": "PAGAR",
+        "fornecedor": {"razaoSocial": f"Fornecedor {cnpj}", "cnpj": cnpj},
+        "faturado": {"nomeCompleto": "Fazenda Modelo", "cpf": "12345678900"},
+        "numeroNotaFiscal": numero,
+        "dataEmissao": emissao,
+        "descricao": descricao,
+        "valorTotal": valor,
+        "classificacaoDespesa": classificacoes,
+        "parcelas": [{"dataVencimento": emissao, "valorParcela": valor}],
+    }
+
+
+def test_lancamentos_e_relancamentos_mantem_os_resumos(banco):
+    engine, factory = banco
+    agent = PersistenciaAgent(session_factory=factory)
+
+    agent.lancar_conta_pagar(_nota("NF-1", "11111111000101", 100, ["Insumos"]))
+    agent.lancar_contas_em_lote(
+        [
+            _nota("NF-2", "11111111000101", 50, ["Insumos", "Frete"]),
+            _nota("NF-3", "22222222000102", 30, ["Frete"], emissao=None, descricao=None),
+        ]
+    )
+    # Reenvios mudam valor, data, classificações e descrição de notas já gravadas
+    agent.lancar_conta_pagar(_nota("NF-1", "11111111000101", 120, ["Frete"], emissao="2024-05-11"))
+    agent.lancar_contas_em_lote(
+        [
+            _nota("NF-2", "11111111000101", 70, ["Insumos"]),
+            _nota("NF-4", "22222222000102", 10, ["Insumos"], descricao="Frete"),
+        ]
+    )
+
+    resumos = _confere_com_reconstrucao(engine, factory)
+    with factory() as session:
+        insumos = session.scalar(select(Classificacao.id).where(Classificacao.descricao == "Insumos"))
+        frete = session.scalar(select(Classificacao.id).where(Classificacao.descricao == "Frete"))
+    assert resumos["resumo_diario_classificacao"] == [
+        (SEM_DATA, "PAGAR", frete, 1, 30),
+        (date(2024, 5, 10), "PAGAR", insumos, 2, 80),
+        (date(2024, 5, 11), "PAGAR", frete, 1, 120),
+    ]
+    assert resumos["resumo_descricao"] == [("", 1, 30), ("Adubo NPK", 2, 190), ("Frete", 1, 10)]
+
+
+def test_edicoes_pela_tela_de_contas_mantem_os_resumos(banco, monkeypatch):
+    engine, factory = banco
+    with factory() as session:
+        session.add_all(
+            [
+                Pessoas(tipo="FORNECEDOR", razaosocial="Antigo", documento="1", status="ATIVO"),
+                Pessoas(tipo="FORNECEDOR", razaosocial="Novo", documento="2", status="ATIVO"),
+                Classificacao(tipo="DESPESA", descricao="INSUMOS", status="ATIVO"),
+                Classificacao(tipo="DESPESA", descricao="FRETE", status="ATIVO"),
+            ]
+        )
+        session.commit()
+    monkeypatch.setattr(aplicacao, "SessionLocal", factory)
+    client = aplicacao.app.test_client()
+
+    for indice in range(3):
+        client.post(
+            "/contas/salvar",
+            data={
+                "descricao": "Diesel",
+                "tipo": "PAGAR",
+                "data_emissao": f"2024-06-0{indice + 1}",
+                "valor_total": "100,00",
+                "fornecedor_id": "1",
+                "classificacao_ids": ["1"],
+            },
+        )
+    client.post(
+        "/contas/salvar",
+        data={"id": "1", "descricao": "Diesel", "tipo": "PAGAR", "data_emissao": "2024-06-02",
+              "valor_total": "40,00", "fornecedor_id": "2", "classificacao_ids": ["1", "2"]},
+    )
+    assert _confere_com_reconstrucao(engine, factory)["resumo_diario_fornecedor"] == [
+        (date(2024, 6, 2), "PAGAR", 1, 1, 100),
+        (date(2024, 6, 2), "PAGAR", 2, 1, 40),
+        (date(2024, 6, 3), "PAGAR", 1, 1, 100),
+    ]
+
+    client.post("/contas/lote", data={"acao": "fornecedor", "fornecedor_id": "2", "ids": ["2", "3"]})
+    client.post("/contas/lote", data={"acao": "classificar", "classificacao_id": "2", "modo": "substituir", "ids": ["1", "2"]})
+    resumos = _confere_com_reconstrucao(engine, factory)
+    assert resumos["resumo_diario_fornecedor"] == [
+        (date(2024, 6, 2), "PAGAR", 2, 2, 140),
+        (date(2024, 6, 3), "PAGAR", 2, 1, 100),
+    ]
+
+    # Excluir a classificação apaga os vínculos e o que eles somavam
+    with factory() as session:
+        session.delete(session.get(Classificacao, 2))
+        session.commit()
+    resumos = _confere_com_reconstrucao(engine, factory)
+    assert resumos["resumo_diario_classificacao"] == [(date(2024, 6, 3), "PAGAR", 1, 1, 100)]
+
+
+def test_resumo_do_rag_nao_varre_movimentos(banco):
+    engine, factory = banco
+    agent = PersistenciaAgent(session_factory=factory)
+    hoje = date.today().isoformat()
+    agent.lancar_contas_em_lote(
+        [
+            _nota(f"NF-{indice}", "11111111000101", 100, ["Insumos agrícolas"], emissao=hoje)
+            for indice in range(7)
+        ]
+        + [_nota("NF-9", "22222222000102", 10, ["Frete"], emissao=hoje, descricao="Frete avulso")]
+    )
+    rag = ConsultaRagAgent(session_factory=factory, llm_callable=lambda prompt, **_: prompt, enable_chroma=False)
+
+    instrucoes = []
+    event.listen(engine, "before_cursor_execute", lambda *args: instrucoes.append(args[2]))
+    with factory() as session:
+        resumo = rag._build_summary_context(session)
+        frequentes = rag._handle_fornecedores_freq_mes(
+            session, "fornecedores com mais de 5 lançamentos no mês", "fornecedores com mais de 5 lançamentos no mês"
+        )
+        insumos = rag._sem_evolucao_insumos(session, "insumos", "insumos")
+
+    assert instrucoes and not [sql for sql in instrucoes if "movimento_contas" in sql]
+    assert "- Insumos agrícolas: R$ 700,00" in resumo
+    assert "- Adubo NPK: 7 ocorrencias somando R$ 700,00" in resumo
+    assert "Frete avulso" not in resumo
+    assert "Fornecedor 11111111000101: 7 lançamentos" in frequentes
+    assert "Fornecedor 22222222000102" not in frequentes
+    assert "R$ 700,00 versus R$ 0,00" in insumos
@@ -0,0 +1,96 @@
+"""Testes do modo em massa do seed (lotes gravados sem objetos ORM)."""
+
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from database.models import (  # noqa: E402
+    MovimentoContas,
+    ParcelasContas,
+    ResumoDescricao,
+    movimento_classificacao_association,
+)
+from scripts import seed_database  # noqa: E402
+
+
+@pytest.fixture()
+def banco(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'seed.db'}", future=True)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    monkeypatch.setattr(seed_database, "engine", engine)
+    monkeypatch.setattr(seed_database, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def test_carga_em_massa_mantem_as_distribuicoes_do_seed(banco):
+    argumentos = ["--em-massa", "--movimentos", "250", "--lote", "100", "--seed", "7",
+                  "--fornecedores", "3", "--clientes", "3", "--faturados", "2", "--classificacoes", "4"]
+    assert seed_database.main(argumentos) == 0
+
+    with banco() as session:
+        movimentos = session.scalars(select(MovimentoContas)).all()
+        assert len(movimentos) == 250
+        assert {m.tipo for m in movimentos} == {"PAGAR", "RECEBER"}
+        assert len({m.numero_nota_fiscal for m in movimentos}) == 250
+        for movimento in movimentos:
+            assert 1 <= len(movimento.parcelas) <= 4
+            assert sum(p.valor_parcela for p in movimento.parcelas) == movimento.valor_total
+            assert all(p.valor_pago + p.valor_saldo == p.valor_parcela for p in movimento.parcelas)
+            alvo = "DESPESA" if movimento.tipo == "PAGAR" else "RECEITA"
+            assert 1 <= len(movimento.classificacoes) <= 3
+            assert {c.tipo for c in movimento.classificacoes} == {alvo}
+            assert movimento.fornecedor.tipo == ("FORNECEDOR" if movimento.tipo == "PAGAR" else "CLIENTE")
+            assert movimento.faturado.tipo == "FATURADO"
+
+        # Os resumos do RAG são reconstruídos ao final da carga
+        assert session.scalar(select(func.sum(ResumoDescricao.quantidade))) == 250
+        assert session.scalar(select(func.sum(ResumoDescricao.total))) == session.scalar(
+            select(func.sum(MovimentoContas.valor_total))
+        )
+        vinculos = session.scalar(select(func.count()).select_from(movimento_classificacao_association))
+        assert vinculos == sum(len(m.classificacoes) for m in movimentos)
+        assert set(session.scalars(select(ParcelasContas.status_parcela))) == {"ABERTA", "LIQUIDADA", "PARCIAL"}
+
+
+def test_lotes_sao_deterministicos_pela_semente():
+    referencias = {
+        "PAGAR": [1, 2],
+        "RECEBER": [3],
+        "FATURADO": [4],
+        "classificacoes": {"PAGAR": [10, 11, 12, 13], "RECEBER": [20]},
+    }
+    hoje = date(2024, 6, 30)
+
+    # Cada lote tem a própria semente: o resultado não depende da ordem nem do processo que o gera
+    segundo = seed_database.gerar_lote(referencias, 1, 50, 42, 365, hoje)
+    assert seed_database.gerar_lote(referencias, 0, 50, 42, 365, hoje) != segundo
+    assert seed_database.gerar_lote(referencias, 1, 50, 42, 365, hoje) == segundo
+    assert seed_database.gerar_lote(referencias, 1, 50, 43, 365, hoje) != segundo
+
+    movimentos, vinculos, parcelas = segundo
+    assert all(date(2023, 7, 1) <= m["dataemissao"] <= hoje for m in movimentos)
+    assert all(500 <= m["valortotal"] <= 20000 for m in movimentos)
+    assert {classificacao for _, classificacao in vinculos} <= {10, 11, 12, 13, 20}
+    assert {posicao for posicao, *_ in parcelas} == set(range(50))
+
+
+def test_parcelas_do_seed_orm_seguem_o_mesmo_rateio(monkeypatch):
+    monkeypatch.setattr(seed_database.random, "randint", lambda a, b: 3)
+    monkeypatch.setattr(seed_database.random, "choice", lambda opcoes: "PARCIAL")
+    parcelas = seed_database.distribuir_parcelas(seed_database.quantize(100), date(2024, 1, 1))
+
+    assert [p.valor_parcela for p in parcelas] == [seed_database._reais(c) for c in (3333, 3333, 3334)]
+    assert [p.valor_pago for p in parcelas] == [seed_database._reais(c) for c in (1667, 1667, 1667)]
+    assert [p.identificacao for p in parcelas] == ["PARC-01/03", "PARC-02/03", "PARC-03/03"]
+    assert parcelas[-1].data_vencimento == date(2024, 3, 31)
@@ -0,0 +1,104 @@
+"""Testes do modo embarcado em SQLite (arquivo único com WAL, sem Postgres)."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from agents.AgentePersistencia.processador import PersistenciaAgent  # noqa: E402
+from agents.consulta_rag.processador import ConsultaRagAgent  # noqa: E402
+from database.connection import _build_database_url, build_engine  # noqa: E402
+from database.migrations import MIGRATIONS, run_migrations  # noqa: E402
+from database.models import (  # noqa: E402
+    Base,
+    Classificacao,
+    MovimentoContas,
+    ParcelasContas,
+    movimento_classificacao_association,
+)
+
+
+@pytest.fixture()
+def banco_sqlite(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setenv("DB_SQLITE_PATH", str(tmp_path / "notas.db"))
+    engine = build_engine(_build_database_url())
+    Base.metadata.create_all(engine)
+    aplicadas = run_migrations(engine)
+    yield engine, sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True), aplicadas
+    engine.dispose()
+
+
+def test_esquema_e_pragmas_do_modo_embarcado(banco_sqlite, tmp_path):
+    engine, _, aplicadas = banco_sqlite
+
+    assert engine.dialect.name == "sqlite"
+    assert engine.url.database == str(tmp_path / "notas.db")
+    assert aplicadas == [item.versao for item in MIGRATIONS]
+    with engine.connect() as conexao:
+        assert conexao.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conexao.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conexao.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        indices = set(conexao.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    assert {"uq_pessoas_documento", "uq_classificacao_descricao_lower", "ix_movimento_contas_dataemissao"} <= indices
+
+
+def test_lancamento_exclusao_e_consultas_rag_sem_postgres(banco_sqlite):
+    _, factory, _ = banco_sqlite
+    agent = PersistenciaAgent(session_factory=factory)
+    recente = date.today() - timedelta(days=10)
+    notas = [
+        # Limites do mês pedido: 31/12 entra, 01/01 do ano seguinte não
+        ("NF-1", "RECEBER", "2023-12-31", "Venda de soja", ["Receita de grãos"]),
+        ("NF-2", "RECEBER", "2024-01-01", "Venda de milho", ["Receita de grãos"]),
+        ("NF-3", "PAGAR", recente.isoformat(), "FRETE da safra", ["Logística Agrícola"]),
+        ("NF-4", "PAGAR", recente.isoformat(), "Diesel", ["LOGISTICA interna"]),
+    ]
+    ids = []
+    for numero, tipo, emissao, descricao, classificacoes in notas:
+        resultado = agent.lancar_conta_pagar({
+            "tipo": tipo,
+            "fornecedor": {"razaoSocial": "Cooperativa Sul", "cnpj": "12345678000100"},
+            "faturado": {"nomeCompleto": "Fazenda Modelo", "cpf": "12345678900"},
+            "numeroNotaFiscal": numero,
+            "dataEmissao": emissao,
+            "descricaoProdutos": descricao,
+            "valorTotal": 100,
+            "classificacaoDespesa": classificacoes,
+            "parcelas": [{"dataVencimento": emissao, "valorParcela": 100}],
+        })
+        ids.append(resultado["movimento_id"])
+
+    rag = ConsultaRagAgent(session_factory=factory, llm_callable=lambda prompt, **_: prompt, enable_chroma=False)
+    with factory() as session:
+        assert session.get(MovimentoContas, ids[0]).tipo == "RECEBER"
+        receber = rag._handle_notas_receber_mes(session, "notas a receber", "Notas a receber de dezembro de 2023")
+        assert "NF-1" in receber and "NF-2" not in receber
+        # Acentos e caixa não impedem o casamento, como no ilike/unaccent do Postgres
+        logistica = rag._sem_custos_logisticos_semestre(session, "custos logísticos", "custos logísticos")
+        assert "Logística Agrícola" in logistica and "LOGISTICA interna" in logistica
+        assert "R$ 200,00" in logistica
+        assert session.scalar(select(func.count()).select_from(Classificacao)) == 3
+
+    # Com foreign_keys ligado, as chaves estrangeiras valem como no Postgres
+    movimentos = MovimentoContas.__table__
+    vinculos = movimento_classificacao_association
+    with factory() as session:
+        with pytest.raises(IntegrityError):
+            session.execute(movimentos.delete().where(movimentos.c.idMovimentoContas == ids[2]))
+        session.rollback()
+        session.execute(vinculos.delete().where(vinculos.c.MovimentoContas_idMovimentoContas == ids[2]))
+        session.execute(movimentos.delete().where(movimentos.c.idMovimentoContas == ids[2]))
+        session.commit()
+        # ON DELETE CASCADE removeu a parcela do movimento excluído
+        assert session.scalar(select(func.count()).select_from(ParcelasContas)) == 3
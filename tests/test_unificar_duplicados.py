@@ -0,0 +1,66 @@
+"""Testes do script que lista e unifica cadastros duplicados."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from database.models import Base, ResumoDiarioFornecedor  # noqa: E402
+from scripts import unificar_duplicados  # noqa: E402
+
+
+@pytest.fixture()
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'duplicados.db'}", future=True)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # Estado de um banco gravado antes das chaves únicas
+        for indice in ("uq_pessoas_documento", "uq_movimento_contas_nota_fornecedor"):
+            connection.exec_driver_sql(f"DROP INDEX {indice}")
+        connection.exec_driver_sql(
+            "INSERT INTO pessoas (\"idPessoas\", documento) VALUES (1, '111'), (2, '111')"
+        )
+        connection.exec_driver_sql(
+            'INSERT INTO movimento_contas ("idMovimentoContas", tipo, numeronotafiscal, dataemissao, '
+            '"Pessoas_idFornecedorCliente", valortotal) '
+            "VALUES (1, 'PAGAR', 'NF-1', '2024-01-10', 1, 100), (2, 'PAGAR', 'NF-2', '2024-01-10', 2, 40)"
+        )
+    monkeypatch.setattr(unificar_duplicados, "engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def test_listar_nao_altera_o_banco(engine, capsys):
+    assert unificar_duplicados.main(["--listar"]) == 0
+
+    assert "pessoas: 1 fica, 2 unificado(s)" in capsys.readouterr().out
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM pessoas").scalar_one() == 2
+
+
+def test_unificar_repontua_movimentos_e_recalcula_resumos(engine, capsys):
+    assert unificar_duplicados.main([]) == 0
+
+    assert "Resumos do RAG recalculados." in capsys.readouterr().out
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('SELECT "idPessoas" FROM pessoas').scalars().all() == [1]
+        fornecedores = connection.exec_driver_sql(
+            'SELECT DISTINCT "Pessoas_idFornecedorCliente" FROM movimento_contas'
+        ).scalars().all()
+        assert fornecedores == [1]
+        resumo = connection.execute(
+            select(ResumoDiarioFornecedor.fornecedor_id, func.sum(ResumoDiarioFornecedor.quantidade))
+            .group_by(ResumoDiarioFornecedor.fornecedor_id)
+        ).all()
+    assert [tuple(linha) for linha in resumo] == [(1, 2)]
+
+    # Sem duplicados, uma segunda execução não muda nada
+    assert unificar_duplicados.main([]) == 0
+    assert "Nenhum duplicado encontrado." in capsys.readouterr().out